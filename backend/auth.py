@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import jwt
@@ -5,8 +6,10 @@ from jwt import PyJWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 from models import User
 from db_utils import db_retry
 import os
@@ -84,6 +87,11 @@ def get_user_by_email(db: Session, email: str):
     """Get user by email"""
     return db.query(User).filter(User.email == email).first()
 
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    """Get user by email (async session)"""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 @db_retry(max_retries=3, delay=0.5)
 def get_user_by_username(db: Session, username: str):
     """Get user by username"""
@@ -101,6 +109,15 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    """authenticate_user on an AsyncSession; bcrypt runs off the event loop"""
+    user = await get_user_by_email_async(db, email)
+    if not user or not user.hashed_password:
+        return False
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
+        return False
+    return user
+
 @db_retry(max_retries=3, delay=0.5)
 def get_user_by_google_id(db: Session, google_id: str):
     """Get user by Google ID"""
@@ -181,47 +198,49 @@ def create_google_user(db: Session, google_info: dict):
     db.refresh(db_user)
     return db_user
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Get current authenticated user with real-time subscription checking"""
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def get_token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    """Email from a valid access token, else 401"""
     try:
-        token = credentials.credentials
-        email = verify_token(token, "access")
-        if email is None:
-            raise credentials_exception
+        email = verify_token(credentials.credentials, "access")
     except PyJWTError:
-        raise credentials_exception
+        email = None
+    if email is None:
+        raise credentials_exception()
+    return email
+
+def apply_entitlement(user: User) -> User:
+    """Real-time entitlement check against the materialized premium_until;
+    a lapsed user is downgraded here and persisted by the expiry sweep"""
+    from subscription_manager import subscription_manager
+    premium = subscription_manager.has_premium_access(user)
+    if premium != user.is_premium:
+        user.is_premium = premium
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Get current authenticated user with real-time subscription checking"""
+    email = get_token_subject(credentials)
     
-    user = get_user_by_email(db, email=email)
+    # Recently checked users skip the user lookup
+    from principal_cache import principal_cache
+    user = principal_cache.get(db, email)
     if user is None:
-        raise credentials_exception
+        user = get_user_by_email(db, email=email)
+        if user is None:
+            raise credentials_exception()
+        principal_cache.set(user)
     
-    # Real-time subscription expiration check
-    try:
-        from subscription_manager import subscription_manager
-        subscription_status = subscription_manager.check_user_subscription_status(user.id, db)
-        
-        # Update user's premium status if it changed
-        if subscription_status != user.is_premium:
-            user.is_premium = subscription_status
-            # Note: The subscription_manager already commits the changes
-            
-            # Refresh user object to get updated data
-            db.refresh(user)
-            
-    except Exception as e:
-        # Log the error but don't fail authentication
-        print(f"Warning: Subscription check failed for user {user.id}: {e}")
-    
-    return user
+    return apply_entitlement(user)
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Get current active user"""
@@ -229,6 +248,29 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """get_current_user for routes on the async engine; the user is attached to their AsyncSession"""
+    email = get_token_subject(credentials)
+    
+    from principal_cache import principal_cache
+    user = await principal_cache.get_async(db, email)
+    if user is None:
+        user = await get_user_by_email_async(db, email=email)
+        if user is None:
+            raise credentials_exception()
+        principal_cache.set(user)
+    
+    return apply_entitlement(user)
+
+async def get_current_active_user_async(current_user: User = Depends(get_current_user_async)):
+    """Get current active user (async session)"""
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
 @db_retry(max_retries=3, delay=0.5)
 def create_user(db: Session, email: str, username: str, password: str, full_name: str = None):
     """Create new user"""
@@ -253,16 +295,9 @@ def check_rate_limit(user: User, db: Session) -> bool:
     try:
         limit = 20 if user.is_premium else 2
         
-        # Check usage in last 24 hours
-        from datetime import datetime, timedelta, timezone
-        from models import UsageStats
-        
-        twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
-        recent_usage = db.query(UsageStats).filter(
-            UsageStats.user_id == user.id,
-            UsageStats.action == "generate",
-            UsageStats.created_at >= twenty_four_hours_ago
-        ).count()
+        # Usage in last 24 hours, from the quota ledger
+        from quota_ledger import quota_ledger
+        recent_usage = quota_ledger.used(db, user.id)
         
         return recent_usage < limit
         
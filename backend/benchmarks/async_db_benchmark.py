@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Async database benchmark
+Serves the same user lookup from two routes, one on the sync Session
+(get_db, blocking the event loop while the query runs) and one on the
+AsyncSession (get_async_db), and drives each with concurrent requests in
+which a share of them run a slow query. Reports requests/sec and the
+latency of the fast requests, which is what suffers when a slow query
+holds up the loop.
+
+Usage:
+    python benchmarks/async_db_benchmark.py [--requests N] [--concurrency C] [--slow-ratio R] [--slow-ms MS]
+
+Uses DATABASE_URL like the app. On PostgreSQL the slow query is
+pg_sleep; SQLite gets an equivalent sleep_ms() SQL function, so the slow
+query waits inside the driver call the way a remote query would instead
+of burning this process's CPU.
+
+Keep --concurrency below the sync pool size (15 on SQLite, 30 on
+PostgreSQL): past it the sync route waits for a free connection on the
+event loop itself, so nothing can hand one back and it stalls until
+pool_timeout.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import event, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from database import DATABASE_URL, async_engine, create_tables, engine, get_async_db, get_db  # noqa: E402
+from models import User  # noqa: E402
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def sqlite_sleep_ms(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+if IS_SQLITE:
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "connect", lambda conn, _: conn.create_function("sleep_ms", 1, sqlite_sleep_ms))
+
+
+def slow_statement(slow_ms: float):
+    if IS_SQLITE:
+        return text("SELECT sleep_ms(:ms)").bindparams(ms=slow_ms)
+    return text("SELECT pg_sleep(:s)").bindparams(s=slow_ms / 1000)
+
+
+def build_app(slow_ms: float) -> FastAPI:
+    app = FastAPI()
+    lookup = select(User.id).where(User.email == "benchmark@example.com")
+    slow = slow_statement(slow_ms)
+
+    # Same shape as the routes before the port: async def on a sync Session
+    @app.get("/sync")
+    async def sync_route(slow_query: bool = False, db: Session = Depends(get_db)):
+        db.execute(slow if slow_query else lookup).all()
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route(slow_query: bool = False, db: AsyncSession = Depends(get_async_db)):
+        (await db.execute(slow if slow_query else lookup)).all()
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, total: int, concurrency: int, slow_every: int):
+    fast_latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int):
+            slow_query = slow_every > 0 and i % slow_every == 0
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, params={"slow_query": slow_query})
+                response.raise_for_status()
+                if not slow_query:
+                    fast_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    fast_latencies = sorted(fast_latencies) or [float("nan")]  # --slow-ratio 1 has no fast requests
+    return (
+        total / elapsed,
+        statistics.median(fast_latencies) * 1000,
+        fast_latencies[max(0, int(len(fast_latencies) * 0.95) - 1)] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async database sessions under concurrency")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow-ratio", type=float, default=0.1, help="share of requests that run the slow query")
+    parser.add_argument("--slow-ms", type=float, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    create_tables()
+    slow_every = round(1 / args.slow_ratio) if args.slow_ratio > 0 else 0
+    app = build_app(args.slow_ms)
+
+    print(f"🗄️  {DATABASE_URL.split('://')[0]}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"1 in {slow_every or '∞'} slow (~{args.slow_ms:.0f} ms)\n")
+
+    async def run_all():
+        rows = []
+        for label, path in (("sync", "/sync"), ("async", "/async")):
+            await drive(app, path, min(args.requests, 50), args.concurrency, slow_every)  # warm the pool
+            results = [await drive(app, path, args.requests, args.concurrency, slow_every) for _ in range(args.runs)]
+            rows.append((label, *(statistics.median(r[i] for r in results) for i in range(3))))
+        return rows
+
+    rows = asyncio.run(run_all())
+
+    print(f"{'session':<10}{'req/s':>10}{'fast p50 ms':>14}{'fast p95 ms':>14}")
+    for label, rps, p50, p95 in rows:
+        print(f"{label:<10}{rps:>10.1f}{p50:>14.1f}{p95:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Prompt compression benchmark
+Measures text_compressor latency and token savings on a fixed corpus and
+compares quality against plain lead truncation at the same budget.
+
+Usage:
+    python benchmarks/compression_benchmark.py [corpus_dir] [--budgets 300,500,800] [--iterations N]
+
+Quality is measured offline, without calling the LLM:
+  - rouge1: unigram recall of a reference summary ("<doc>.summary.txt")
+  - keywords: share of the document's 20 most frequent content words kept
+  - numbers: share of the document's figures (counts, %, $) kept
+Saved .html pages are accepted too and run through content_extractor first.
+"""
+import re
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from text_compressor import STOPWORDS, WORD_RE, compress_text, estimate_tokens, strip_noise  # noqa: E402
+from long_content import truncate_at_boundary  # noqa: E402
+
+NUMBER_RE = re.compile(r'\$?\d+(?:[.,:]\d+)*%?')
+
+
+def load_corpus(corpus: Path):
+    docs = {}
+    for path in sorted(corpus.iterdir()):
+        if path.name.endswith(".summary.txt"):
+            continue
+        if path.suffix in (".md", ".txt"):
+            docs[path.stem] = path.read_text(encoding="utf-8")
+        elif path.suffix == ".html":
+            from content_extractor import extract_main_text
+            docs[path.stem] = extract_main_text(path.read_text(encoding="utf-8", errors="replace"), 50000)
+
+    summaries = {}
+    for name in docs:
+        summary = corpus / f"{name}.summary.txt"
+        if summary.exists():
+            summaries[name] = summary.read_text(encoding="utf-8")
+    return docs, summaries
+
+
+def content_words(text: str):
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def rouge1_recall(candidate: str, reference: str) -> float:
+    cand = Counter(content_words(candidate))
+    ref = Counter(content_words(reference))
+    if not ref:
+        return 0.0
+    return sum(min(count, cand[w]) for w, count in ref.items()) / sum(ref.values())
+
+
+def keyword_coverage(candidate: str, original: str, top: int = 20) -> float:
+    keywords = [w for w, _ in Counter(content_words(original)).most_common(top)]
+    kept = set(content_words(candidate))
+    return sum(1 for w in keywords if w in kept) / len(keywords) if keywords else 0.0
+
+
+def number_coverage(candidate: str, original: str) -> float:
+    numbers = set(NUMBER_RE.findall(strip_noise(original)))
+    if not numbers:
+        return 1.0
+    kept = set(NUMBER_RE.findall(candidate))
+    return len(numbers & kept) / len(numbers)
+
+
+def lead_truncate(text: str, budget: int) -> str:
+    """Baseline: de-noise, then keep the beginning up to the budget"""
+    return truncate_at_boundary(strip_noise(text), budget * 4)
+
+
+def textrank(text: str, budget: int) -> str:
+    return compress_text(text, budget)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extractive prompt compression")
+    parser.add_argument("corpus", nargs="?", default=str(Path(__file__).parent / "text_corpus"))
+    parser.add_argument("--budgets", default="300,500,800", help="Comma-separated token budgets")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    docs, summaries = load_corpus(Path(args.corpus))
+    if not docs:
+        print(f"❌ No .md/.txt/.html documents found in {args.corpus}")
+        sys.exit(1)
+
+    total_tokens = sum(estimate_tokens(d) for d in docs.values())
+    print(f"📚 Corpus: {len(docs)} documents, ~{total_tokens} tokens, "
+          f"{len(summaries)} reference summaries, {args.iterations} iterations\n")
+
+    methods = [("lead", lead_truncate), ("textrank", textrank)]
+    budgets = [int(b) for b in args.budgets.split(",")]
+
+    print(f"{'budget':>7} {'method':<10}{'ms/doc':>8}{'tokens':>9}{'saved':>8}{'rouge1':>9}{'keywords':>10}{'numbers':>9}")
+    for budget in budgets:
+        for name, fn in methods:
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                outputs = {doc: fn(text, budget) for doc, text in docs.items()}
+            ms_per_doc = (time.perf_counter() - start) * 1000 / (args.iterations * len(docs))
+
+            out_tokens = sum(estimate_tokens(o) for o in outputs.values())
+            rouge = [rouge1_recall(outputs[d], summaries[d]) for d in summaries]
+            keywords = [keyword_coverage(outputs[d], docs[d]) for d in docs]
+            numbers = [number_coverage(outputs[d], docs[d]) for d in docs]
+
+            print(
+                f"{budget:>7} {name:<10}{ms_per_doc:>8.2f}{out_tokens:>9}"
+                f"{1 - out_tokens / total_tokens:>7.0%} "
+                f"{(sum(rouge) / len(rouge)) if rouge else float('nan'):>8.3f}"
+                f"{sum(keywords) / len(keywords):>10.3f}{sum(numbers) / len(numbers):>9.3f}"
+            )
+        print()
+
+    print("Token savings apply three times per generation (one prompt per platform).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+HTML extraction benchmark
+Compares content_extractor engines against the original BeautifulSoup
+html.parser extraction on a corpus of saved HTML pages.
+
+Usage:
+    python benchmarks/extraction_benchmark.py [corpus_dir] [--iterations N] [--max-chars N]
+
+Quality is reported as word-level precision/recall against a gold
+"<page>.txt" next to the HTML when one exists, otherwise against the
+original extraction's output.
+"""
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from content_extractor import available_engines, extract_main_text  # noqa: E402
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def original_extract(html: str, max_chars: int) -> str:
+    """The pre-content_extractor code path from fetch_content_from_url"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
+        tag.decompose()
+
+    main = soup.find("article") or soup.find("main") or soup.find("div", class_="content")
+
+    text = main.get_text(" ", strip=True) if main else soup.get_text(" ", strip=True)
+
+    return text[:max_chars]
+
+
+def word_scores(candidate: str, reference: str):
+    """Bag-of-words precision and recall of candidate against reference"""
+    cand = WORD_RE.findall(candidate.lower())
+    ref = WORD_RE.findall(reference.lower())
+    if not cand or not ref:
+        return 0.0, 0.0
+
+    ref_counts = {}
+    for w in ref:
+        ref_counts[w] = ref_counts.get(w, 0) + 1
+    overlap = 0
+    for w in cand:
+        if ref_counts.get(w, 0) > 0:
+            ref_counts[w] -= 1
+            overlap += 1
+    return overlap / len(cand), overlap / len(ref)
+
+
+def time_engine(fn, pages, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for html in pages.values():
+            fn(html)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML main-content extraction")
+    parser.add_argument("corpus", nargs="?", default=str(Path(__file__).parent / "html_corpus"))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--max-chars", type=int, default=15000)
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.corpus).glob("*.html"))
+    if not paths:
+        print(f"❌ No .html files found in {args.corpus}")
+        sys.exit(1)
+
+    pages = {p.name: p.read_text(encoding="utf-8", errors="replace") for p in paths}
+    total_mb = sum(len(h.encode("utf-8")) for h in pages.values()) / (1024 * 1024)
+    print(f"📚 Corpus: {len(pages)} pages, {total_mb:.2f} MB, {args.iterations} iterations, budget {args.max_chars} chars\n")
+
+    references = {}
+    for p in paths:
+        gold = p.with_suffix(".txt")
+        if gold.exists():
+            references[p.name] = gold.read_text(encoding="utf-8")[:args.max_chars]
+        else:
+            references[p.name] = original_extract(pages[p.name], args.max_chars)
+
+    candidates = [("original", lambda h: original_extract(h, args.max_chars))]
+    for engine in available_engines():
+        candidates.append((engine, lambda h, e=engine: extract_main_text(h, args.max_chars, engine=e)))
+
+    baseline = None
+    print(f"{'engine':<14}{'pages/s':>10}{'MB/s':>9}{'speedup':>10}{'precision':>11}{'recall':>9}")
+    for name, fn in candidates:
+        elapsed = time_engine(fn, pages, args.iterations)
+        pages_per_sec = len(pages) * args.iterations / elapsed
+        baseline = baseline or pages_per_sec
+
+        precisions, recalls = [], []
+        for page_name, html in pages.items():
+            precision, recall = word_scores(fn(html), references[page_name])
+            precisions.append(precision)
+            recalls.append(recall)
+
+        print(
+            f"{name:<14}{pages_per_sec:>10.1f}{total_mb * args.iterations / elapsed:>9.2f}"
+            f"{pages_per_sec / baseline:>9.1f}x"
+            f"{sum(precisions) / len(precisions):>11.3f}{sum(recalls) / len(recalls):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
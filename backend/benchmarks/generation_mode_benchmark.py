@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Generation mode benchmark
+Runs the same documents through the per-platform fan-out (one LLM call per
+platform) and the combined single-call JSON mode, against the configured
+LLM provider, and reports latency, token usage and failure rate.
+
+Usage:
+    python benchmarks/generation_mode_benchmark.py [corpus_dir] [--runs N] [--modes fanout,combined]
+
+Tokens are estimated at ~4 characters per token for every call made,
+including repair prompts and combined-mode fallbacks. A run counts as
+failed if any platform came back as an error marker; "fallbacks" are
+platforms the combined reply didn't contain and that needed their own call.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import routes.snippetstream_routes as ss  # noqa: E402
+from combined_generation import counters as combined_counters  # noqa: E402
+from text_compressor import compress_text, estimate_tokens  # noqa: E402
+
+PLATFORMS = ["twitter", "linkedin", "instagram"]
+
+usage = {"calls": 0, "tokens_in": 0, "tokens_out": 0}
+_safe_completion_async = ss.safe_completion_async
+
+
+async def counting_completion(messages, max_tokens=2000):
+    usage["calls"] += 1
+    usage["tokens_in"] += sum(estimate_tokens(m["content"]) for m in messages)
+    result = await _safe_completion_async(messages, max_tokens=max_tokens)
+    usage["tokens_out"] += estimate_tokens(result or "")
+    return result
+
+
+async def run_fanout(content: str):
+    results = await asyncio.gather(*(ss.PLATFORM_GENERATORS[p](content, None) for p in PLATFORMS))
+    return dict(zip(PLATFORMS, results))
+
+
+async def run_combined(content: str):
+    combined = asyncio.ensure_future(ss.generate_combined_async(content, None, PLATFORMS))
+    results = await asyncio.gather(*(ss.finish_combined_platform(combined, p, content, None) for p in PLATFORMS))
+    return dict(zip(PLATFORMS, results))
+
+
+async def benchmark(docs, modes, runs):
+    runners = {"fanout": run_fanout, "combined": run_combined}
+    rows = []
+    for mode in modes:
+        latencies, calls, tokens_in, tokens_out, failures = [], [], [], [], 0
+        fallbacks_before = combined_counters["platform_fallbacks"]
+        for _ in range(runs):
+            for name, text in docs.items():
+                content = compress_text(text)[0]
+                for key in usage:
+                    usage[key] = 0
+                start = time.perf_counter()
+                outputs = await runners[mode](content)
+                latencies.append(time.perf_counter() - start)
+                calls.append(usage["calls"])
+                tokens_in.append(usage["tokens_in"])
+                tokens_out.append(usage["tokens_out"])
+                if any(ss.is_failed_output(o) for o in outputs.values()):
+                    failures += 1
+                    print(f"  ❌ {mode} failed on {name}")
+        total = len(latencies)
+        rows.append((
+            mode,
+            statistics.median(latencies),
+            max(latencies),
+            statistics.mean(calls),
+            statistics.mean(tokens_in),
+            statistics.mean(tokens_out),
+            failures / total,
+            combined_counters["platform_fallbacks"] - fallbacks_before,
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fan-out vs combined generation")
+    parser.add_argument("corpus", nargs="?", default=str(Path(__file__).parent / "text_corpus"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="fanout,combined")
+    args = parser.parse_args()
+
+    docs = {p.stem: p.read_text(encoding="utf-8") for p in sorted(Path(args.corpus).glob("*.md"))}
+    if not docs:
+        print(f"❌ No .md documents found in {args.corpus}")
+        sys.exit(1)
+
+    ss.safe_completion_async = counting_completion
+    modes = [m for m in args.modes.split(",") if m]
+    print(f"📚 {len(docs)} documents x {args.runs} runs per mode\n")
+
+    rows = asyncio.run(benchmark(docs, modes, args.runs))
+
+    print(f"\n{'mode':<10}{'p50 s':>8}{'max s':>8}{'calls':>7}{'tok in':>9}{'tok out':>9}{'fail':>7}{'fallbk':>8}")
+    for mode, p50, worst, calls, t_in, t_out, fail, fallbacks in rows:
+        print(f"{mode:<10}{p50:>8.2f}{worst:>8.2f}{calls:>7.1f}{t_in:>9.0f}{t_out:>9.0f}{fail:>7.0%}{fallbacks:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Combined Multi-Platform Generation
+One prompt returns a JSON object with every requested platform, so the
+source content is sent once instead of once per platform. The reply is read
+with a tolerant incremental parser: each platform's field is taken as soon
+as it closes, and a reply cut off mid-way still yields the fields (and the
+array items) that were complete. Platforms missing from the reply fall back
+to their own per-platform call.
+"""
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional
+
+# "instant" skips the LLM and uses the offline generator
+GENERATION_MODES = ("fanout", "combined", "instant")
+# Tiers that use the combined call when a request doesn't choose, e.g. "free,pro"
+COMBINED_MODE_TIERS = {t.strip() for t in os.getenv("COMBINED_MODE_TIERS", "").split(",") if t.strip()}
+COMBINED_MAX_TOKENS = int(os.getenv("COMBINED_MAX_TOKENS", "3500"))
+
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+counters = {"calls": 0, "failed_calls": 0, "platforms_parsed": 0, "platform_fallbacks": 0, "truncated_replies": 0}
+
+
+def resolve_generation_mode(requested: Optional[str], tier: str) -> str:
+    """The request's own choice wins; otherwise the tier default"""
+    if requested in GENERATION_MODES:
+        return requested
+    return "combined" if tier in COMBINED_MODE_TIERS else "fanout"
+
+
+# ----------------------------------------------------
+# Tolerant Incremental JSON Parser
+# ----------------------------------------------------
+def loads_tolerant(text: str) -> Any:
+    """json.loads that accepts raw newlines in strings and trailing commas"""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return json.loads(TRAILING_COMMA_RE.sub(r'\1', text), strict=False)
+
+
+class IncrementalJSONParser:
+    """
+    Scans a JSON object as it arrives and records each top-level field once
+    its value is complete. Text before the first "{" (prose, code fences) is
+    ignored, and close() salvages what it can from a truncated reply.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume more text; return the names of fields completed by it"""
+        completed = []
+        self.buffer += chunk
+        for i in range(self._pos, len(self.buffer)):
+            if self.complete:
+                break
+            ch = self.buffer[i]
+            top_level = len(self._stack) == 1
+
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append(ch)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if top_level and self._key is None:
+                        self._key = loads_tolerant(self.buffer[self._string_start:i + 1])
+                    elif top_level and self._value_start is not None:
+                        completed += self._finish_value(i + 1)
+                continue
+
+            expecting_value = top_level and self._key is not None and self._value_start is None
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if expecting_value:
+                    self._value_start = i
+            elif ch in "{[":
+                if expecting_value:
+                    self._value_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if len(self._stack) == 1 and self._value_start is not None:
+                    completed += self._finish_value(i + 1)
+                elif not self._stack:
+                    if self._value_start is not None:
+                        completed += self._finish_value(i)  # Scalar before the closing brace
+                    self.complete = True
+            elif ch == "," and top_level:
+                if self._value_start is not None:
+                    completed += self._finish_value(i)
+                self._key = None
+            elif expecting_value and not ch.isspace() and ch != ":":
+                self._value_start = i  # true/false/null/number
+        self._pos = len(self.buffer)
+        return completed
+
+    def _finish_value(self, end: int) -> List[str]:
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        try:
+            self.fields[key] = loads_tolerant(self.buffer[start:end].strip())
+            return [key]
+        except ValueError:
+            return []
+
+    def close(self) -> Dict[str, Any]:
+        """Return every complete field, plus the finished items of a truncated array"""
+        if not self.complete and self._key is not None and self._value_start is not None:
+            partial = self.buffer[self._value_start:self._string_start if self._in_string else None]
+            partial = partial.rstrip().rstrip(",")
+            if partial.startswith("[") or partial.startswith("{"):
+                # Close whatever containers were still open inside the field
+                closers = "".join("]" if c == "[" else "}" for c in reversed(self._stack[1:]))
+                try:
+                    self.fields[self._key] = loads_tolerant(partial + closers)
+                except ValueError:
+                    pass
+        return self.fields
+
+
+# ----------------------------------------------------
+# Prompt
+# ----------------------------------------------------
+PLATFORM_SCHEMAS = {
+    "twitter": '''"twitter": [10 strings, tweet i starts with "i/10 ", each under 240 characters]''',
+    "linkedin": '''"linkedin": "one LinkedIn post as a single string"''',
+    "instagram": '''"instagram": [8 strings, each "EMOJI TITLE\\nshort description"]''',
+}
+
+PLATFORM_RULES = {
+    "twitter": """X (Twitter) thread:
+- EXACTLY 10 tweets: hook, problem, why it matters, what was built, highlight #1, highlight #2, role, lesson, takeaway, call-to-action + question
+- Max 1 emoji per tweet; 2-3 hashtags only in the final tweet""",
+    "linkedin": """LinkedIn post:
+- Hook, context, 2-4 "- " bullet highlights, role, lessons, closing reflection
+- Ends with an engagement question, then 3-5 hashtags
+- Short paragraphs separated by a blank line (use \\n\\n), 2-3 emojis total, under 180 words
+- No headings or numbering""",
+    "instagram": """Instagram carousel:
+- EXACTLY 8 slides: hook, problem, why it matters, achievement, highlight #1, highlight #2, lesson, call-to-action
+- Each slide is 2 lines: Emoji + TITLE (uppercase, max 3 words), then a description (max 6 words)
+- No numbering, no hashtags""",
+}
+
+
+def build_combined_messages(content: str, context: Optional[Dict], platforms: List[str]) -> List[Dict]:
+    schema = ",\n  ".join(PLATFORM_SCHEMAS[p] for p in platforms)
+    rules = "\n\n".join(PLATFORM_RULES[p] for p in platforms)
+
+    system_prompt = f"""
+You are a social media content strategist. Repurpose the content for several platforms at once.
+
+Return ONLY a JSON object, no code fences and no commentary, with exactly these keys in this order:
+{{
+  {schema}
+}}
+
+{rules}
+
+Do NOT invent fake details. Skip any missing context gracefully.
+"""
+
+    if context:
+        keys = ("audience", "tone", "mood", "goal", "cta", "event", "importance", "highlights", "role", "lessons", "shoutouts", "instaVibe")
+        lines = [f"- {k}: {context[k]}" for k in keys if context.get(k)]
+        if lines:
+            system_prompt += "\nPersonalization Context:\n" + "\n".join(lines) + "\n"
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content},
+    ]
+
+
+def to_platform_text(platform: str, value: Any) -> Optional[str]:
+    """Convert a parsed field into the raw text format the per-platform finishers expect"""
+    if platform == "linkedin":
+        return value.strip() if isinstance(value, str) and value.strip() else None
+    if not isinstance(value, list):
+        return None
+    items = [item.strip() for item in value if isinstance(item, str) and item.strip()]
+    if not items:
+        return None
+    return ("\n" if platform == "twitter" else "\n\n").join(items)
+
+
+def parse_combined_reply(reply: Optional[str], platforms: List[str]) -> Dict[str, Optional[str]]:
+    """Return {platform: raw text or None}; None means the platform needs its own call"""
+    counters["calls"] += 1
+    if not reply:
+        counters["failed_calls"] += 1
+        return {p: None for p in platforms}
+
+    parser = IncrementalJSONParser()
+    parser.feed(reply)
+    if not parser.complete:
+        counters["truncated_replies"] += 1
+    fields = parser.close()
+
+    texts = {p: to_platform_text(p, fields.get(p)) for p in platforms}
+    parsed = sum(1 for text in texts.values() if text)
+    counters["platforms_parsed"] += parsed
+    counters["platform_fallbacks"] += len(platforms) - parsed
+    return texts
+
+
+def combined_stats() -> Dict:
+    return {
+        **counters,
+        "default_tiers": sorted(COMBINED_MODE_TIERS),
+        "max_tokens": COMBINED_MAX_TOKENS,
+    }
@@ -0,0 +1,149 @@
+"""
+HTML Main-Content Extraction
+Runs off the event loop in a worker pool, prefers the fastest parser that is
+installed (selectolax, then BeautifulSoup with lxml, then html.parser) and
+stops collecting text once the character budget is reached
+"""
+import os
+import re
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+JUNK_TAGS = ["script", "style", "nav", "footer", "header", "aside"]
+DEFAULT_MAX_CHARS = 15000
+
+EXTRACTION_ENGINE = os.getenv("EXTRACTION_ENGINE", "auto")
+EXTRACTION_POOL = os.getenv("EXTRACTION_POOL", "process")  # 'process' or 'thread'
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        # selectolax < 1.0 only ships the Modest backend
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup backend
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+def available_engines():
+    """Engines usable in this process, fastest first"""
+    engines = []
+    if HTMLParser is not None:
+        engines.append("selectolax")
+    if BeautifulSoup is not None:
+        if HAS_LXML:
+            engines.append("lxml")
+        engines.append("html.parser")
+    engines.append("regex")
+    return engines
+
+
+def _join_until(strings: Iterable[str], max_chars: int) -> str:
+    """Join stripped text nodes, stopping as soon as the budget is filled"""
+    parts = []
+    total = 0
+    for text in strings:
+        parts.append(text)
+        total += len(text) + 1
+        if total >= max_chars:
+            break
+    return " ".join(parts)[:max_chars]
+
+
+def _extract_selectolax(html: str, max_chars: int) -> str:
+    tree = HTMLParser(html)
+    tree.strip_tags(JUNK_TAGS)
+
+    main = tree.css_first("article") or tree.css_first("main") or tree.css_first("div.content")
+    node = main or tree.body or tree.root
+    if node is None:
+        return ""
+
+    strings = (
+        child.text(deep=False, strip=True)
+        for child in node.traverse(include_text=True)
+        if child.tag == "-text"
+    )
+    return _join_until((text for text in strings if text), max_chars)
+
+
+def _extract_bs4(html: str, max_chars: int, parser: str) -> str:
+    soup = BeautifulSoup(html, parser)
+
+    # Remove junk
+    for tag in soup(JUNK_TAGS):
+        tag.decompose()
+
+    main = soup.find("article") or soup.find("main") or soup.find("div", class_="content")
+    return _join_until((main or soup).stripped_strings, max_chars)
+
+
+def _extract_regex(html: str, max_chars: int) -> str:
+    content = re.sub(r'<(script|style)[^>]*>.*?</\1>', ' ', html, flags=re.DOTALL | re.IGNORECASE)
+    content = re.sub(r'<[^>]+>', ' ', content)
+    content = re.sub(r'\s+', ' ', content).strip()
+    return content[:max_chars]
+
+
+def extract_main_text(html: str, max_chars: int = DEFAULT_MAX_CHARS, engine: Optional[str] = None) -> str:
+    """Extract readable main-content text from an HTML page (CPU-bound)"""
+    engine = engine or EXTRACTION_ENGINE
+    if engine == "auto" or engine not in available_engines():
+        engine = available_engines()[0]
+
+    try:
+        if engine == "selectolax":
+            return _extract_selectolax(html, max_chars)
+        if engine in ("lxml", "html.parser"):
+            return _extract_bs4(html, max_chars, engine)
+    except Exception as e:
+        print(f"⚠️ {engine} extraction failed, falling back to regex: {e}")
+
+    return _extract_regex(html, max_chars)
+
+
+# ----------------------------------------------------
+# Worker Pool
+# ----------------------------------------------------
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if EXTRACTION_POOL == "process":
+            try:
+                _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+            except (OSError, NotImplementedError) as e:
+                # Some serverless sandboxes can't fork or lack /dev/shm
+                print(f"⚠️ Process pool unavailable for extraction, using threads: {e}")
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extract")
+        print(f"🔧 HTML extraction pool: {type(_executor).__name__} x{EXTRACTION_WORKERS} ({available_engines()[0]})")
+    return _executor
+
+
+async def extract_main_text_async(html: str, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """Run extract_main_text in the worker pool so parsing never blocks the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), extract_main_text, html, max_chars)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
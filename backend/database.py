@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.pool import QueuePool
 import os
@@ -38,6 +40,51 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ----------------------------------------------------
+# Async engine (asyncpg / aiosqlite) for the request path
+# ----------------------------------------------------
+def get_async_database_url(url: str = DATABASE_URL) -> str:
+    """Map the sync DATABASE_URL onto the matching async driver"""
+    parsed = make_url(url)
+    if parsed.drivername.startswith("sqlite"):
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    # asyncpg takes SSL and timeouts as connect args, not libpq query params
+    query = {k: v for k, v in parsed.query.items() if k not in ("sslmode", "channel_binding", "connect_timeout")}
+    return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url()
+
+if DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20")),
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args={
+            "ssl": "require",
+            "timeout": 10,
+            "server_settings": {"application_name": "SnippetStream"}
+        }
+    )
+
+if DATABASE_URL.startswith("sqlite"):
+    # Both engines share the file. WAL lets a read transaction on one (e.g. a
+    # sync session left open across an await) coexist with a commit on the other
+    def enable_sqlite_wal(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+    for sqlite_engine in (engine, async_engine.sync_engine):
+        event.listen(sqlite_engine, "connect", enable_sqlite_wal)
+
+# expire_on_commit=False so returned ORM objects stay readable after commit
+# without an implicit (and, under asyncio, forbidden) lazy refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Enhanced dependency to get DB session with retry logic
@@ -48,6 +95,11 @@ def get_db():
     finally:
         db.close()
 
+# Async counterpart of get_db for routes that never block the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Create tables
 def create_tables():
     from models import Base
@@ -2,9 +2,11 @@
 Database utility functions with retry logic for handling connection issues
 """
 import time
+import asyncio
 import functools
 from sqlalchemy.exc import OperationalError, DisconnectionError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Callable, Any
 
 def db_retry(max_retries: int = 3, delay: float = 1.0):
@@ -12,6 +14,9 @@ def db_retry(max_retries: int = 3, delay: float = 1.0):
     Decorator to retry database operations on connection failures
     """
     def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            return _async_retry(func, max_retries, delay)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             last_exception = None
@@ -50,6 +55,32 @@ def db_retry(max_retries: int = 3, delay: float = 1.0):
         return wrapper
     return decorator
 
+def _async_retry(func: Callable, max_retries: int, delay: float) -> Callable:
+    """db_retry for coroutines on an AsyncSession; backs off without blocking the loop"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> Any:
+        for attempt in range(max_retries):
+            try:
+                return await func(*args, **kwargs)
+            except (OperationalError, DisconnectionError) as e:
+                print(f"🔄 Database connection error (attempt {attempt + 1}/{max_retries}): {e}")
+                if attempt == max_retries - 1:
+                    print(f"❌ All database retry attempts failed")
+                    raise
+
+                for arg in args:
+                    if isinstance(arg, AsyncSession):
+                        try:
+                            await arg.rollback()
+                        except Exception:
+                            pass
+
+                wait_time = delay * (2 ** attempt)
+                print(f"⏳ Waiting {wait_time}s before retry...")
+                await asyncio.sleep(wait_time)
+
+    return wrapper
+
 def safe_db_operation(db: Session, operation: Callable, *args, **kwargs):
     """
     Safely execute a database operation with automatic retry
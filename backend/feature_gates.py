@@ -1,10 +1,10 @@
 """
 Feature gate system for tiered access control
 """
-from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from models import User, UsageStats, ContentGeneration
+from models import User
+from quota_ledger import QuotaReservation, quota_ledger
 
 
 class FeatureGate:
@@ -100,22 +100,48 @@ class FeatureGate:
             return 20  # Market standard for Pro tier
         return 2
     
+    def get_regeneration_limit(self) -> int:
+        """Get single-platform regenerations allowed per generation"""
+        if not self.user:
+            return 0
+        if self.user.is_premium:
+            return 20
+        return 3
+    
+    def get_variant_limit(self) -> int:
+        """Get alternatives per platform allowed in one generation"""
+        if self.user and self.user.is_premium:
+            return 3
+        return 1
+    
     def get_remaining_generations(self, db: Session) -> int:
         """Get remaining generations for today (24h sliding window)"""
         if not self.user:
             return 0
         
         limit = self.get_generation_limit()
+        return max(0, limit - quota_ledger.used(db, self.user.id))
+    
+    def reserve_generation(self) -> Optional[QuotaReservation]:
+        """Atomically hold one generation against the daily limit; None if it's used up"""
+        if not self.user:
+            return None
         
-        # Count usage in last 24 hours
-        twenty_four_hours_ago = datetime.now(timezone.utc) - timedelta(hours=24)
-        recent_usage = db.query(UsageStats).filter(
-            UsageStats.user_id == self.user.id,
-            UsageStats.action == "generate",
-            UsageStats.created_at >= twenty_four_hours_ago
-        ).count()
+        # Pro generations aren't capped, but still go through the ledger
+        limit = None if self.user.is_premium else self.get_generation_limit()
+        return quota_ledger.reserve(self.user.id, limit)
+    
+    async def reserve_generation_async(self) -> Optional[QuotaReservation]:
+        """reserve_generation on the async engine"""
+        if not self.user:
+            return None
         
-        return max(0, limit - recent_usage)
+        limit = None if self.user.is_premium else self.get_generation_limit()
+        return await quota_ledger.reserve_async(self.user.id, limit)
+    
+    def get_max_content_length(self) -> int:
+        """Get longest input accepted before truncation"""
+        return 50000 if self.user and self.user.is_premium else 10000
     
     def get_supported_platforms(self) -> List[str]:
         """Get list of supported social platforms"""
@@ -145,11 +171,13 @@ class FeatureGate:
             "can_browse_templates": self.can_browse_community_templates(),
             "generation_limit": self.get_generation_limit(),
             "remaining_generations": self.get_remaining_generations(db),
+            "regenerations_per_generation": self.get_regeneration_limit(),
+            "max_variants": self.get_variant_limit(),
             "history_limit": self.get_history_limit(),
             "supported_platforms": self.get_supported_platforms(),
             "export_formats": self.get_export_formats(),
             "max_bulk_items": 50 if self.user and self.user.is_premium else 1,
-            "max_content_length": 50000 if self.user and self.user.is_premium else 10000
+            "max_content_length": self.get_max_content_length()
         }
     
     def get_upgrade_prompt(self, feature: str) -> Dict:
@@ -0,0 +1,188 @@
+"""
+Generation Cache for repurpose results
+Two tiers: an in-process LRU with TTL in front of a shared DB-backed table
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from database import AsyncSessionLocal
+from models import GenerationCacheEntry
+
+
+def normalize_content(content: str) -> str:
+    """Normalize content so whitespace-only differences share a cache entry"""
+    return re.sub(r'\s+', ' ', (content or "").strip())
+
+
+def make_cache_key(content: str, context: Optional[Dict], platform: str, prompt_version: str) -> str:
+    """Build the content-addressed key for one platform's output"""
+    payload = json.dumps(
+        {
+            "content": normalize_content(content),
+            "context": context or {},
+            "platform": platform,
+            "prompt_version": prompt_version,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self):
+        self.max_entries = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "512"))
+        self.memory_ttl_seconds = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", "3600"))
+        self.db_ttl_hours = int(os.getenv("GENERATION_CACHE_DB_TTL_HOURS", "72"))
+        self.purge_every_writes = 100
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "bypassed": 0,
+        }
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.memory_ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Session, key: str) -> Optional[Any]:
+        """Look up a cached platform output, memory first then DB"""
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            return value
+
+        try:
+            entry = db.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.cache_key == key,
+                GenerationCacheEntry.expires_at > datetime.now(timezone.utc)
+            ).first()
+        except Exception as e:
+            print(f"⚠️ Generation cache DB lookup failed: {e}")
+            db.rollback()
+            entry = None
+
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+
+        value = json.loads(entry.payload)
+        self._memory_set(key, value)
+        self.counters["db_hits"] += 1
+        return value
+
+    def set(self, db: Session, key: str, platform: str, prompt_version: str, value: Any):
+        """Store a platform output in both tiers"""
+        self._memory_set(key, value)
+        self.counters["writes"] += 1
+
+        try:
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=self.db_ttl_hours)
+            entry = db.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.cache_key == key
+            ).first()
+            if entry:
+                entry.payload = json.dumps(value)
+                entry.expires_at = expires_at
+            else:
+                db.add(GenerationCacheEntry(
+                    cache_key=key,
+                    platform=platform,
+                    prompt_version=prompt_version,
+                    payload=json.dumps(value),
+                    expires_at=expires_at,
+                ))
+            db.commit()
+
+            if self.counters["writes"] % self.purge_every_writes == 0:
+                self.purge_expired(db)
+        except Exception as e:
+            print(f"⚠️ Generation cache DB write failed: {e}")
+            db.rollback()
+
+    # ----------------------------------------------------
+    # Async engine
+    # ----------------------------------------------------
+    # Each DB round trip gets its own short AsyncSession, so concurrent
+    # callers (e.g. digests of several chunks) never share one
+    async def get_many_async(self, keys: List[str]) -> Dict[str, Any]:
+        """{key: value} for the keys that are cached; one DB round trip for all memory misses"""
+        found, missing = {}, []
+        for key in keys:
+            value = self._memory_get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                self.counters["memory_hits"] += 1
+                found[key] = value
+
+        if missing:
+            async with AsyncSessionLocal() as db:
+                values = await db.run_sync(lambda session: [self.get(session, key) for key in missing])
+            found.update((key, value) for key, value in zip(missing, values) if value is not None)
+        return found
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return (await self.get_many_async([key])).get(key)
+
+    async def set_async(self, key: str, platform: str, prompt_version: str, value: Any):
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(self.set, key, platform, prompt_version, value)
+
+    def purge_expired(self, db: Session) -> int:
+        """Delete expired rows from the DB tier"""
+        deleted = db.query(GenerationCacheEntry).filter(
+            GenerationCacheEntry.expires_at <= datetime.now(timezone.utc)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            print(f"🧹 Purged {deleted} expired generation cache entries")
+        return deleted
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["db_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_ttl_seconds": self.memory_ttl_seconds,
+            "db_ttl_hours": self.db_ttl_hours,
+        }
+
+
+# Global generation cache instance
+generation_cache = GenerationCache()
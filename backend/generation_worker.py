@@ -0,0 +1,179 @@
+"""
+Generation Worker
+Claims jobs from the durable job queue and runs them through the same
+prepare/generate/save path as /repurpose. Run it with start-worker.py, or
+in-process with JOB_QUEUE_INLINE_WORKER=true for single-process deployments.
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+from typing import Optional
+
+from fastapi import HTTPException
+
+from database import SessionLocal
+from models import User, GenerationJob
+from feature_gates import get_feature_gate
+from quota_ledger import quota_ledger
+from job_queue import job_queue
+from combined_generation import resolve_generation_mode
+
+from routes.snippetstream_routes import (
+    ContentRequest,
+    SocialMediaResponse,
+    prepare_content,
+    resolve_platforms,
+    resolve_variants,
+    generate_platforms,
+    failed_platforms,
+    save_generation,
+)
+
+
+class GenerationWorker:
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = int(os.getenv("JOB_WORKER_CONCURRENCY", "3"))
+        self.poll_seconds = float(os.getenv("JOB_WORKER_POLL_SECONDS", "1"))
+        self.heartbeat_seconds = max(1, job_queue.visibility_timeout // 3)
+
+        self._tasks = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _heartbeat(self, job_pk: int, job_task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            db = SessionLocal()
+            try:
+                if not job_queue.heartbeat(db, job_pk, self.worker_id):
+                    # Another worker owns the job now; stop spending LLM calls on it
+                    print(f"⚠️ Lost lease on job {job_pk}, cancelling it")
+                    job_task.cancel()
+                    return
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed for job {job_pk}: {e}")
+            finally:
+                db.close()
+
+    async def process_job(self, job_pk: int):
+        db = SessionLocal()
+        heartbeat = asyncio.create_task(self._heartbeat(job_pk, asyncio.current_task()))
+        reservation = None
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_pk).first()
+            user = db.query(User).filter(User.id == job.user_id).first()
+            print(f"⚙️ Worker {self.worker_id} running {job.job_id} (attempt {job.attempts}/{job.max_attempts})")
+
+            try:
+                payload = json.loads(job.payload)
+                request = ContentRequest(**payload)
+                start_time = time.time()
+
+                feature_gate = get_feature_gate(user)
+                content, source, reservation = await prepare_content(request, feature_gate)
+                platforms = resolve_platforms(request.enabled_platforms)
+                metrics = {"job_id": job.job_id}
+                variant_outputs = {}
+                outputs, cached_platforms = await generate_platforms(
+                    content, request.context, platforms,
+                    bypass_cache=request.bypass_cache, metrics=metrics,
+                    mode=resolve_generation_mode(request.generation_mode, feature_gate.get_tier()),
+                    variants=resolve_variants(request.variants), variant_outputs=variant_outputs,
+                )
+
+                # Every platform failing means the LLM is down; retry later
+                # instead of saving (and charging quota for) an error result
+                failed = failed_platforms(outputs)
+                if failed and len(failed) == len(outputs):
+                    raise Exception(f"All platforms failed: {', '.join(failed)}")
+
+                processing_time = time.time() - start_time
+                # Saved and completed in one transaction, so a worker that lost
+                # its lease leaves neither the generation nor the charge behind
+                generation = save_generation(
+                    db, user.id, content, source, outputs, request.context,
+                    processing_time, cached_platforms,
+                    usage_extra=metrics, variants=variant_outputs, reservation=reservation,
+                    commit=False,
+                )
+                if generation is None:
+                    raise Exception("Failed to save generation")
+
+                preview = content[:200] + "..." if len(content) > 200 else content
+                response = SocialMediaResponse(
+                    twitter_thread=outputs.get("twitter", []),
+                    linkedin_post=outputs.get("linkedin", ""),
+                    instagram_carousel=outputs.get("instagram", []),
+                    original_content_preview=preview,
+                    cached_platforms=cached_platforms,
+                    generation_id=generation.id,
+                    offline_platforms=metrics.get("offline_platforms", []),
+                    variants=variant_outputs,
+                )
+                if not job_queue.complete(
+                    db, job_pk, self.worker_id, response.dict(), generation.id, processing_time, commit=False,
+                ):
+                    return  # Rolled back; the worker holding the lease produces it
+                db.commit()
+                print(f"✅ Job {job.job_id} succeeded in {processing_time:.2f}s")
+
+            except HTTPException as e:
+                # Quota, tier and input errors won't change on retry
+                retryable = e.status_code >= 500
+                status = job_queue.fail(db, job_pk, self.worker_id, str(e.detail), retryable=retryable)
+                print(f"❌ Job {job.job_id} rejected ({e.status_code}): {e.detail} -> {status}")
+            except Exception as e:
+                db.rollback()
+                status = job_queue.fail(db, job_pk, self.worker_id, str(e) or type(e).__name__)
+                print(f"❌ Job {job.job_id} failed: {e} -> {status}")
+
+        except asyncio.CancelledError:
+            print(f"🛑 Job {job_pk} cancelled (lease lost or shutting down)")
+            raise
+        except Exception as e:
+            print(f"❌ Worker error on job {job_pk}: {e}")
+        finally:
+            heartbeat.cancel()
+            db.close()
+            # Retried or failed jobs give their reserved generation back
+            quota_ledger.release(reservation)
+
+    async def run(self):
+        """Poll for jobs until stop() is called, then drain in-flight jobs"""
+        self._stopping = asyncio.Event()
+        print(f"👷 Generation worker {self.worker_id} started (concurrency {self.concurrency})")
+
+        while not self._stopping.is_set():
+            claimed = []
+            free = self.concurrency - len(self._tasks)
+            if free > 0:
+                db = SessionLocal()
+                try:
+                    job_queue.reap_expired(db)
+                    claimed = job_queue.claim(db, self.worker_id, limit=free)
+                except Exception as e:
+                    print(f"⚠️ Worker poll failed: {e}")
+                finally:
+                    db.close()
+
+            for job_pk in claimed:
+                task = asyncio.create_task(self.process_job(job_pk))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+        if self._tasks:
+            print(f"⏳ Waiting for {len(self._tasks)} in-flight jobs...")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        print(f"👋 Generation worker {self.worker_id} stopped")
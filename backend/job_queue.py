@@ -0,0 +1,232 @@
+"""
+Durable Generation Job Queue
+Repurpose jobs are stored in the generation_jobs table and claimed by worker
+processes with SELECT ... FOR UPDATE SKIP LOCKED (Postgres) or a conditional
+UPDATE (SQLite). A claimed job is leased until its visibility timeout; if the
+worker dies the lease expires and another worker picks the job up again.
+"""
+import os
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from models import GenerationJob, GenerationJobResult
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    def __init__(self):
+        # How long a claimed job stays invisible to other workers without a heartbeat
+        self.visibility_timeout = int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "180"))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        # Retry delay doubles per attempt: base, 2*base, 4*base...
+        self.retry_base_seconds = int(os.getenv("JOB_RETRY_BASE_SECONDS", "15"))
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(GenerationJob.status == QUEUED, GenerationJob.available_at <= now),
+            # Lease expired: the worker holding it crashed or stalled
+            and_(
+                GenerationJob.status == RUNNING,
+                GenerationJob.locked_until < now,
+                GenerationJob.attempts < GenerationJob.max_attempts,
+            ),
+        )
+
+    def enqueue(self, db: Session, user_id: int, payload: Dict[str, Any], kind: str = "repurpose") -> GenerationJob:
+        job = GenerationJob(
+            job_id=f"job_{uuid.uuid4().hex[:16]}",
+            user_id=user_id,
+            kind=kind,
+            payload=json.dumps(payload),
+            status=QUEUED,
+            attempts=0,
+            max_attempts=self.max_attempts,
+            available_at=utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def claim(self, db: Session, worker_id: str, limit: int = 1) -> List[int]:
+        """Lease up to `limit` jobs for this worker and return their primary keys"""
+        if limit <= 0:
+            return []
+
+        now = utcnow()
+        lease = {
+            GenerationJob.status: RUNNING,
+            GenerationJob.locked_by: worker_id,
+            GenerationJob.locked_until: now + timedelta(seconds=self.visibility_timeout),
+            GenerationJob.attempts: GenerationJob.attempts + 1,
+            GenerationJob.updated_at: now,
+        }
+        query = db.query(GenerationJob.id).filter(self._claimable(now)).order_by(
+            GenerationJob.available_at, GenerationJob.id
+        ).limit(limit)
+
+        try:
+            if db.bind.dialect.name == "postgresql":
+                # Rows locked by another worker's open claim are skipped, not waited on
+                claimed = [row.id for row in query.with_for_update(skip_locked=True).all()]
+                if claimed:
+                    db.query(GenerationJob).filter(GenerationJob.id.in_(claimed)).update(
+                        lease, synchronize_session=False
+                    )
+            else:
+                # SQLite has no row locks; writes are serialized, so a conditional
+                # UPDATE that re-checks claimability lets exactly one worker win
+                claimed = []
+                for row in query.all():
+                    updated = db.query(GenerationJob).filter(
+                        GenerationJob.id == row.id, self._claimable(now)
+                    ).update(lease, synchronize_session=False)
+                    if updated:
+                        claimed.append(row.id)
+            db.commit()
+            return claimed
+        except Exception as e:
+            print(f"⚠️ Job claim failed: {e}")
+            db.rollback()
+            return []
+
+    def heartbeat(self, db: Session, job_pk: int, worker_id: str) -> bool:
+        """Extend the lease; False means another worker has taken the job over"""
+        now = utcnow()
+        updated = db.query(GenerationJob).filter(
+            GenerationJob.id == job_pk,
+            GenerationJob.status == RUNNING,
+            GenerationJob.locked_by == worker_id,
+        ).update(
+            {
+                GenerationJob.locked_until: now + timedelta(seconds=self.visibility_timeout),
+                GenerationJob.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        return bool(updated)
+
+    def complete(
+        self,
+        db: Session,
+        job_pk: int,
+        worker_id: str,
+        response: Dict[str, Any],
+        generation_id: Optional[int],
+        processing_time: float,
+        commit: bool = True,
+    ) -> bool:
+        """
+        Mark the job succeeded if this worker still holds its lease. False
+        (and the whole transaction rolled back) when it doesn't. With
+        commit=False the caller commits, e.g. together with the generation.
+        """
+        now = utcnow()
+        updated = db.query(GenerationJob).filter(
+            GenerationJob.id == job_pk,
+            GenerationJob.status == RUNNING,
+            GenerationJob.locked_by == worker_id,
+        ).update(
+            {
+                GenerationJob.status: SUCCEEDED,
+                GenerationJob.locked_by: None,
+                GenerationJob.locked_until: None,
+                GenerationJob.last_error: None,
+                GenerationJob.finished_at: now,
+                GenerationJob.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+        if not updated:
+            db.rollback()
+            print(f"⚠️ Job {job_pk} lease lost before completion, discarding result")
+            return False
+
+        db.add(GenerationJobResult(
+            generation_job_id=job_pk,
+            generation_id=generation_id,
+            response=json.dumps(response),
+            processing_time=processing_time,
+        ))
+        if commit:
+            db.commit()
+        return True
+
+    def fail(self, db: Session, job_pk: int, worker_id: str, error: str, retryable: bool = True) -> str:
+        """Requeue with backoff while attempts remain, otherwise mark failed. Returns the new status."""
+        job = db.query(GenerationJob).filter(
+            GenerationJob.id == job_pk,
+            GenerationJob.locked_by == worker_id,
+        ).first()
+        if not job or job.status != RUNNING:
+            db.rollback()
+            return job.status if job else FAILED
+
+        now = utcnow()
+        job.locked_by = None
+        job.locked_until = None
+        job.last_error = error[:2000]
+        job.updated_at = now
+
+        if retryable and job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.available_at = now + timedelta(seconds=self.retry_base_seconds * 2 ** (job.attempts - 1))
+        else:
+            job.status = FAILED
+            job.finished_at = now
+
+        db.commit()
+        return job.status
+
+    def reap_expired(self, db: Session) -> int:
+        """Fail jobs whose lease expired after their last allowed attempt"""
+        now = utcnow()
+        reaped = db.query(GenerationJob).filter(
+            GenerationJob.status == RUNNING,
+            GenerationJob.locked_until < now,
+            GenerationJob.attempts >= GenerationJob.max_attempts,
+        ).update(
+            {
+                GenerationJob.status: FAILED,
+                GenerationJob.locked_by: None,
+                GenerationJob.locked_until: None,
+                GenerationJob.last_error: "Visibility timeout expired on final attempt",
+                GenerationJob.finished_at: now,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        return reaped
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        counts = dict(
+            db.query(GenerationJob.status, func.count(GenerationJob.id)).group_by(GenerationJob.status).all()
+        )
+        oldest_queued = db.query(func.min(GenerationJob.created_at)).filter(
+            GenerationJob.status == QUEUED
+        ).scalar()
+        return {
+            "counts": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+            "oldest_queued_at": oldest_queued.isoformat() if oldest_queued else None,
+            "visibility_timeout_seconds": self.visibility_timeout,
+            "max_attempts": self.max_attempts,
+            "retry_base_seconds": self.retry_base_seconds,
+        }
+
+
+# Global job queue instance
+job_queue = JobQueue()
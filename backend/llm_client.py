@@ -0,0 +1,184 @@
+"""
+LLM Provider HTTP Client
+One pooled httpx.AsyncClient (wrapped in AsyncOpenAI) owned by the app
+lifespan: created and warmed up at startup so the first user doesn't pay for
+DNS/TCP/TLS setup, and closed on shutdown. Pool usage and the time requests
+spend waiting for a free connection are tracked for the admin endpoint.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+try:
+    import h2  # noqa: F401  (optional; enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+WAIT_SAMPLES = 500
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the pooled transport to measure pool wait: the time from handing a
+    request to the pool until the first connection event (a new TCP connect
+    or headers sent on a reused connection)
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, metrics: Dict):
+        self.transport = transport
+        self.metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        waited = []
+        inner_trace = request.extensions.get("trace")
+
+        async def trace(event_name, info):
+            if not waited:
+                waited.append(time.monotonic() - started)
+            if event_name == "connection.connect_tcp.complete":
+                self.metrics["connections_opened"] += 1
+            if inner_trace is not None:
+                await inner_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        self.metrics["requests"] += 1
+        self.metrics["in_flight"] += 1
+        try:
+            return await self.transport.handle_async_request(request)
+        except httpx.PoolTimeout:
+            self.metrics["pool_timeouts"] += 1
+            raise
+        finally:
+            self.metrics["in_flight"] -= 1
+            if waited:
+                self.metrics["wait_samples"].append(waited[0])
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class LLMClientPool:
+    def __init__(self):
+        self.base_url = os.getenv("LLM_BASE_URL", "https://gen.pollinations.ai/v1")
+        self.http2 = os.getenv("LLM_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+        self.verify_tls = os.getenv("LLM_VERIFY_TLS", "false").lower() == "true"
+
+        # Connect fails fast so hedging can move on; reads wait for long generations
+        self.timeout = httpx.Timeout(
+            connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            read=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+            write=float(os.getenv("LLM_WRITE_TIMEOUT", "10")),
+            pool=float(os.getenv("LLM_POOL_TIMEOUT", "10")),
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "32")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "16")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "90")),
+        )
+        self.warmup_connections = int(os.getenv("LLM_WARMUP_CONNECTIONS", "2"))
+
+        self.metrics = {
+            "requests": 0,
+            "in_flight": 0,
+            "connections_opened": 0,
+            "pool_timeouts": 0,
+            "wait_samples": deque(maxlen=WAIT_SAMPLES),
+        }
+        self.warmed_up_at: Optional[float] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncOpenAI] = None
+
+    def _create(self):
+        api_key = os.getenv("POLLINATIONS_API_KEY")
+        if not api_key:
+            raise Exception("❌ POLLINATIONS_API_KEY missing in environment")
+
+        self._transport = httpx.AsyncHTTPTransport(
+            verify=self.verify_tls, http2=self.http2, limits=self.limits
+        )
+        self._http = httpx.AsyncClient(
+            transport=InstrumentedTransport(self._transport, self.metrics),
+            timeout=self.timeout,
+        )
+        self._client = AsyncOpenAI(api_key=api_key, base_url=self.base_url, http_client=self._http)
+        print(f"🔧 LLM client ready ({'HTTP/2' if self.http2 else 'HTTP/1.1'}, "
+              f"{self.limits.max_connections} connections, {self.limits.keepalive_expiry:.0f}s keep-alive)")
+
+    async def start(self):
+        """Create the client and open warm connections; called from the app lifespan"""
+        if self._client is None:
+            self._create()
+        await self.warm_up()
+
+    async def warm_up(self):
+        """Open pooled connections (DNS, TCP, TLS) before the first real request"""
+        if self._http is None:
+            return
+        started = time.monotonic()
+        count = 1 if self.http2 else self.warmup_connections  # HTTP/2 multiplexes one connection
+        try:
+            await asyncio.gather(*(self._http.head(self.base_url) for _ in range(count)))
+            self.warmed_up_at = time.time()
+            print(f"🔥 LLM connections warmed up in {(time.monotonic() - started) * 1000:.0f}ms")
+        except Exception as e:
+            # Not fatal: the first request will connect on its own
+            print(f"⚠️ LLM warm-up failed: {e}")
+
+    def get(self) -> AsyncOpenAI:
+        """The shared client; created on demand where no lifespan runs (scripts, benchmarks)"""
+        if self._client is None:
+            self._create()
+        return self._client
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._transport = None
+        self._client = None
+
+    def stats(self) -> Dict:
+        pool = getattr(self._transport, "_pool", None)  # httpcore pool; not public API
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+
+        waits = sorted(self.metrics["wait_samples"])
+        return {
+            "base_url": self.base_url,
+            "started": self._client is not None,
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            "timeouts": {
+                "connect": self.timeout.connect,
+                "read": self.timeout.read,
+                "write": self.timeout.write,
+                "pool": self.timeout.pool,
+            },
+            "connections": {"open": len(connections), "in_use": len(connections) - idle, "idle": idle},
+            "requests": self.metrics["requests"],
+            "in_flight": self.metrics["in_flight"],
+            "connections_opened": self.metrics["connections_opened"],
+            "pool_timeouts": self.metrics["pool_timeouts"],
+            "pool_wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 2) if waits else None,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else None,
+                "max": round(waits[-1] * 1000, 2) if waits else None,
+            },
+            "warmed_up_at": self.warmed_up_at,
+        }
+
+
+# Global LLM client instance
+llm_client = LLMClientPool()
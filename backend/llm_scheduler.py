@@ -0,0 +1,258 @@
+"""
+Upstream LLM Concurrency Scheduler
+Every call to the LLM provider waits for a slot on its model's lane. A lane
+caps concurrent calls and paces them with a token bucket; when the lane is
+saturated, waiters are served by weighted fair queuing so Pro users get a
+larger share and no single user can monopolize the upstream.
+
+The caller is identified through a context variable bound once per request
+(bind_llm_principal), so the completion helpers don't need extra arguments.
+"""
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+PROVIDER = "pollinations"
+
+# (user key, tier) of whoever the current request is generating for
+llm_principal: ContextVar[Tuple[str, str]] = ContextVar("llm_principal", default=("anonymous", "free"))
+
+
+def bind_llm_principal(user_id, tier: str):
+    """Attribute LLM calls made from this request (and tasks it spawns) to a user"""
+    llm_principal.set((str(user_id), tier))
+
+
+class _Waiter:
+    __slots__ = ("future", "flow", "tier", "cost", "enqueued_at", "cancelled")
+
+    def __init__(self, future, flow, tier, cost):
+        self.future = future
+        self.flow = flow
+        self.tier = tier
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+
+class SchedulerLane:
+    """Concurrency limit + token bucket + WFQ queue for one provider/model"""
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: float, weights: Dict[str, float]):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate  # calls per second; 0 disables pacing
+        self.burst = burst
+        self.weights = weights
+
+        self.active = 0
+        self.tokens = burst
+        self._refilled_at = time.monotonic()
+
+        # Self-clocked fair queuing: each flow (user) carries the finish tag of
+        # its last request; a new request starts at max(virtual time, that tag)
+        self.virtual_time = 0.0
+        self._flow_finish: Dict[str, float] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = 0
+        self._queued_by_tier: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_at = 0.0
+
+        self.granted = 0
+        self.waited = 0
+        self.waits: deque = deque(maxlen=500)
+        self.max_wait = 0.0
+
+    def _refill(self, now: float):
+        if self.rate <= 0:
+            self.tokens = self.burst
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _can_start(self, now: float) -> bool:
+        if self.active >= self.concurrency:
+            return False
+        self._refill(now)
+        return self.tokens >= 1
+
+    def _start(self, now: float):
+        self.active += 1
+        if self.rate > 0:
+            self.tokens -= 1
+        self.granted += 1
+
+    def _finish_tag(self, flow: str, tier: str, cost: float) -> float:
+        start = max(self.virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + cost / self.weights.get(tier, 1.0)
+        self._flow_finish[flow] = finish
+        return finish
+
+    def _dequeue(self, waiter: _Waiter):
+        self._queued -= 1
+        self._queued_by_tier[waiter.tier] -= 1
+
+    async def acquire(self, cost: float = 1.0):
+        flow, tier = llm_principal.get()
+        now = time.monotonic()
+
+        # Fast path: nobody waiting and capacity available
+        if not self._queued and self._can_start(now):
+            self.virtual_time = self._finish_tag(flow, tier, cost)
+            self._start(now)
+            self.waits.append(0.0)
+            return
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), flow, tier, cost)
+        heapq.heappush(self._heap, (self._finish_tag(flow, tier, cost), next(self._seq), waiter))
+        self._queued += 1
+        self._queued_by_tier[tier] = self._queued_by_tier.get(tier, 0) + 1
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release()
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._dequeue(waiter)
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant slots to the waiters with the smallest finish tags"""
+        now = time.monotonic()
+        while self._heap:
+            finish, _, waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if not self._can_start(now):
+                break
+
+            heapq.heappop(self._heap)
+            self._dequeue(waiter)
+            waiter.cancelled = True  # No longer in the queue
+            self.virtual_time = max(self.virtual_time, finish)
+            self._start(now)
+
+            wait = now - waiter.enqueued_at
+            self.waited += 1
+            self.waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+            waiter.future.set_result(None)
+
+        if not self._heap:
+            # Idle flows can't be behind the virtual clock any more; forget them
+            self._flow_finish = {
+                flow: tag for flow, tag in self._flow_finish.items() if tag > self.virtual_time
+            }
+        elif self.active < self.concurrency and (self._wakeup is None or now > self._wakeup_at + 1):
+            # Blocked on the token bucket: come back when the next token lands
+            # (a wakeup long overdue belonged to a loop that is gone)
+            delay = max(0.01, (1 - self.tokens) / self.rate) if self.rate > 0 else 0.01
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+            self._wakeup_at = now + delay
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+
+        def pct(p):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(round(p * (len(waits) - 1))))], 3)
+
+        return {
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "queue_depth": self._queued,
+            "queue_depth_by_tier": {t: n for t, n in self._queued_by_tier.items() if n},
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "granted": self.granted,
+            "queued_grants": self.waited,
+            "wait_p50_seconds": pct(0.5),
+            "wait_p95_seconds": pct(0.95),
+            "wait_max_seconds": round(self.max_wait, 3),
+        }
+
+
+class LLMScheduler:
+    def __init__(self):
+        self.enabled = os.getenv("LLM_SCHEDULER_ENABLED", "true").lower() == "true"
+        self.default_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.default_rate = float(os.getenv("LLM_RATE_PER_SECOND", "4"))
+        self.default_burst = float(os.getenv("LLM_RATE_BURST", "8"))
+        self.weights = {
+            "pro": float(os.getenv("LLM_PRO_WEIGHT", "4")),
+            "free": float(os.getenv("LLM_FREE_WEIGHT", "1")),
+        }
+
+        # Per-provider or per-model overrides, e.g.
+        # {"pollinations/openai": {"concurrency": 4, "rate": 2, "burst": 4}}
+        try:
+            self.overrides = json.loads(os.getenv("LLM_SCHEDULER_OVERRIDES", "{}"))
+        except ValueError:
+            print("⚠️ LLM_SCHEDULER_OVERRIDES is not valid JSON, ignoring")
+            self.overrides = {}
+
+        self._lanes: Dict[str, SchedulerLane] = {}
+
+    def lane(self, model: str, provider: str = PROVIDER) -> SchedulerLane:
+        name = f"{provider}/{model}"
+        if name not in self._lanes:
+            config = {**self.overrides.get(provider, {}), **self.overrides.get(name, {})}
+            self._lanes[name] = SchedulerLane(
+                name,
+                concurrency=int(config.get("concurrency", self.default_concurrency)),
+                rate=float(config.get("rate", self.default_rate)),
+                burst=float(config.get("burst", self.default_burst)),
+                weights=self.weights,
+            )
+        return self._lanes[name]
+
+    @asynccontextmanager
+    async def slot(self, model: str, max_tokens: int = 2000):
+        """Hold an upstream slot for the duration of one LLM call"""
+        if not self.enabled:
+            yield
+            return
+
+        lane = self.lane(model)
+        # Longer generations occupy the upstream longer, so they cost more
+        await lane.acquire(cost=max(1.0, max_tokens / 1000))
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "weights": self.weights,
+            "lanes": {name: lane.stats() for name, lane in self._lanes.items()},
+        }
+
+
+# Global LLM scheduler instance
+llm_scheduler = LLMScheduler()
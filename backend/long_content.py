@@ -0,0 +1,167 @@
+"""
+Long Content Map-Reduce
+Inputs too long to send whole to every platform generator are split on
+section, paragraph and sentence boundaries, each chunk is summarized
+concurrently, and the generators receive the merged digest. Chunk digests
+are cached by chunk hash, so editing one part of a long document only
+re-summarizes the chunks that changed.
+"""
+import os
+import re
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from generation_cache import generation_cache, make_cache_key
+
+LONG_CONTENT_THRESHOLD = int(os.getenv("LONG_CONTENT_THRESHOLD", "12000"))
+CHUNK_TARGET_CHARS = int(os.getenv("LONG_CONTENT_CHUNK_CHARS", "6000"))
+DIGEST_MAX_TOKENS = int(os.getenv("LONG_CONTENT_DIGEST_MAX_TOKENS", "700"))
+MAX_REDUCE_ROUNDS = 2
+
+# Bump whenever the digest prompt changes so cached digests are not reused
+DIGEST_PROMPT_VERSION = "1"
+
+HEADING_RE = re.compile(r'\n(?=#{1,6}\s)|\n(?=[^\n]{1,120}\n[=-]{3,}\s*\n)')
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+counters = {"long_inputs": 0, "chunks": 0, "digest_cache_hits": 0, "digests_generated": 0, "digest_failures": 0}
+
+
+# ----------------------------------------------------
+# Chunking
+# ----------------------------------------------------
+# Coarsest boundary first; each level only splits pieces still over target
+SPLITTERS = [
+    (HEADING_RE, "\n\n"),
+    (PARAGRAPH_RE, "\n\n"),
+    (SENTENCE_RE, " "),
+    (re.compile(r'\s+'), " "),
+]
+
+
+def _pack(pieces: List[str], target: int, joiner: str) -> List[str]:
+    """Greedily merge consecutive pieces into chunks of up to target chars"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(joiner) + len(piece) > target:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{joiner}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_content(text: str, target: int = CHUNK_TARGET_CHARS, level: int = 0) -> List[str]:
+    text = text.strip()
+    if len(text) <= target:
+        return [text] if text else []
+    if level >= len(SPLITTERS):
+        return [text[i:i + target] for i in range(0, len(text), target)]
+
+    pattern, joiner = SPLITTERS[level]
+    parts = [part.strip() for part in pattern.split(text) if part.strip()]
+    if len(parts) <= 1:
+        return chunk_content(text, target, level + 1)
+
+    pieces = []
+    for part in parts:
+        pieces.extend(chunk_content(part, target, level + 1) if len(part) > target else [part])
+    return _pack(pieces, target, joiner)
+
+
+def truncate_at_boundary(content: str, max_length: int) -> str:
+    """Cut to max_length at the last paragraph or sentence end rather than mid-word"""
+    if len(content) <= max_length:
+        return content
+
+    head = content[:max_length]
+    for pattern in (PARAGRAPH_RE, SENTENCE_RE):
+        ends = [m.start() for m in pattern.finditer(head)]
+        # Only if that doesn't throw away more than a fifth of the allowance
+        if ends and ends[-1] >= max_length * 0.8:
+            return head[:ends[-1]].rstrip() + "..."
+    return head + "..."
+
+
+# ----------------------------------------------------
+# Map: chunk digests
+# ----------------------------------------------------
+def build_digest_messages(chunk: str, index: int, total: int) -> List[Dict]:
+    system_prompt = """
+You condense one part of a longer article so a social media writer can work from the digest.
+
+Rules:
+- Keep every key claim, number, name, example and quotable line
+- Drop repetition, filler and navigation text
+- Plain prose or short bullet lines, no headings, no commentary about the text
+- About a quarter of the original length
+"""
+
+    user_prompt = f"""
+Part {index + 1} of {total}:
+
+{chunk}
+"""
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+async def summarize_chunk(
+    chunk: str,
+    index: int,
+    total: int,
+    complete: Callable[..., Awaitable[Optional[str]]],
+) -> str:
+    key = make_cache_key(chunk, None, "digest", DIGEST_PROMPT_VERSION)
+    cached = await generation_cache.get_async(key)
+    if cached is not None:
+        counters["digest_cache_hits"] += 1
+        return cached
+
+    digest = await complete(build_digest_messages(chunk, index, total), max_tokens=DIGEST_MAX_TOKENS)
+    if not digest:
+        # Keep the chunk's lead rather than losing that part of the article
+        counters["digest_failures"] += 1
+        print(f"⚠️ Digest failed for chunk {index + 1}/{total}, using its lead")
+        return truncate_at_boundary(chunk, max(500, len(chunk) // 4))
+
+    counters["digests_generated"] += 1
+    await generation_cache.set_async(key, "digest", DIGEST_PROMPT_VERSION, digest)
+    return digest
+
+
+# ----------------------------------------------------
+# Reduce: merged digest
+# ----------------------------------------------------
+async def condense_long_content(
+    content: str,
+    complete: Callable[..., Awaitable[Optional[str]]],
+    threshold: int = LONG_CONTENT_THRESHOLD,
+) -> str:
+    """Return content unchanged if short enough, otherwise the merged chunk digest"""
+    if len(content) <= threshold:
+        return content
+
+    counters["long_inputs"] += 1
+    for round_number in range(MAX_REDUCE_ROUNDS):
+        chunks = chunk_content(content)
+        counters["chunks"] += len(chunks)
+        print(f"🧩 Condensing {len(content)} chars in {len(chunks)} chunks (round {round_number + 1})")
+
+        digests = await asyncio.gather(
+            *(summarize_chunk(chunk, i, len(chunks), complete) for i, chunk in enumerate(chunks))
+        )
+        content = "\n\n".join(digest.strip() for digest in digests if digest)
+
+        if len(content) <= threshold:
+            break
+
+    print(f"🧩 Digest ready: {len(content)} chars")
+    return truncate_at_boundary(content, threshold)
@@ -11,6 +11,7 @@ from fastapi.responses import JSONResponse
 
 from routes import register_routes
 from database import create_tables, get_db
+from rate_limiter import rate_limiter
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from dotenv import load_dotenv
@@ -52,6 +53,20 @@ async def lifespan(app: FastAPI):
         except Exception as mig_error:
             print(f"⚠️ Migration warning: {mig_error}")
         
+        # Materialized entitlement column on users
+        try:
+            from subscription_manager import migrate_premium_until
+            migrate_premium_until()
+        except Exception as mig_error:
+            print(f"⚠️ premium_until migration warning: {mig_error}")
+        
+        # Bulk job columns for resuming jobs after a restart
+        try:
+            from routes.bulk_routes import migrate_bulk_jobs
+            migrate_bulk_jobs()
+        except Exception as mig_error:
+            print(f"⚠️ bulk_jobs migration warning: {mig_error}")
+        
         # Seed public templates
         try:
             from seed_public_templates import seed_public_templates
@@ -62,7 +77,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Database initialization warning: {e}")
 
-    # 2. Start subscription background task
+    # 2. Open warm, pooled connections to the LLM provider
+    try:
+        from llm_client import llm_client
+        await llm_client.start()
+    except Exception as e:
+        print(f"⚠️ Could not start LLM client: {e}")
+
+    # 3. Start subscription background task
     try:
         from subscription_manager import subscription_background_task
         task = asyncio.create_task(subscription_background_task())
@@ -71,17 +93,67 @@ async def lifespan(app: FastAPI):
         print("✅ Subscription background task started")
     except Exception as e:
         print(f"⚠️ Could not start subscription background task: {e}")
-    
+
+    # 4. Start quota ledger reconciliation
+    try:
+        from quota_ledger import quota_reconcile_background_task
+        task = asyncio.create_task(quota_reconcile_background_task())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        print("✅ Quota reconciliation task started")
+    except Exception as e:
+        print(f"⚠️ Could not start quota reconciliation task: {e}")
+
+    # 5. Resume bulk jobs whose process stopped mid-job
+    try:
+        from routes.bulk_routes import bulk_recovery_background_task
+        task = asyncio.create_task(bulk_recovery_background_task())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        print("✅ Bulk job recovery task started")
+    except Exception as e:
+        print(f"⚠️ Could not start bulk job recovery task: {e}")
+
+    # 6. Optionally run a generation worker in-process (single-process deployments)
+    inline_worker = None
+    if os.getenv("JOB_QUEUE_INLINE_WORKER", "false").lower() == "true":
+        try:
+            from generation_worker import GenerationWorker
+            inline_worker = GenerationWorker()
+            task = asyncio.create_task(inline_worker.run())
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+            print("✅ Inline generation worker started")
+        except Exception as e:
+            print(f"⚠️ Could not start inline generation worker: {e}")
+
     yield
     
     # --- Shutdown ---
     print("🛑 Shutting down SnippetStream API...")
+    if inline_worker is not None:
+        inline_worker.stop()
     for task in background_tasks:
         task.cancel()
     if background_tasks:
         await asyncio.gather(*background_tasks, return_exceptions=True)
         print("✅ Background tasks stopped")
 
+    try:
+        from url_fetcher import url_fetcher
+        await url_fetcher.aclose()
+    except Exception as e:
+        print(f"⚠️ Could not close URL fetcher client: {e}")
+
+    try:
+        from llm_client import llm_client
+        await llm_client.aclose()
+    except Exception as e:
+        print(f"⚠️ Could not close LLM client: {e}")
+
+    from content_extractor import shutdown_executor
+    shutdown_executor()
+
 app = FastAPI(
     title="SnippetStream API", 
     version="2.0.0",
@@ -138,40 +210,24 @@ async def health_check(db: Session = Depends(get_db)):
             }
         )
 
-# Simple rate limiting middleware
-request_times = {}
-
+# Rate limiting middleware (sliding window per user, IP and API key)
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    client_ip = request.client.host
-    current_time = time.time()
-    
     # Skip rate limiting for health checks and static files
     if request.url.path in ["/health", "/docs", "/openapi.json"] or request.url.path.startswith("/static"):
         response = await call_next(request)
         return response
     
-    # Clean old entries (older than 1 minute)
-    if client_ip in request_times:
-        request_times[client_ip] = [t for t in request_times[client_ip] if current_time - t < 60]
-    else:
-        request_times[client_ip] = []
-    
-    # Check rate limit (max 100 requests per minute for general API - increased for payment flows)
-    # Higher limit for authenticated users (check Authorization header)
-    auth_header = request.headers.get("Authorization")
-    rate_limit = 200 if auth_header else 100
-    
-    if len(request_times[client_ip]) >= rate_limit:
+    decision = await rate_limiter.check(request)
+    if not decision.allowed:
         return JSONResponse(
             status_code=429,
-            content={"detail": "Too many requests. Please slow down and try again in a minute."}
+            content={"detail": "Too many requests. Please slow down and try again in a minute."},
+            headers=decision.headers()
         )
     
-    # Add current request time
-    request_times[client_ip].append(current_time)
-    
     response = await call_next(request)
+    response.headers.update(decision.headers())
     return response
 
 # Add path-normalization middleware to handle double slashes, etc.
@@ -0,0 +1,241 @@
+"""
+Model Health Tracking for the Pollinations client
+Rolling per-model latency samples (for hedge delays), a circuit breaker per
+model name and a health score used to order models for each request
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ModelCircuit:
+    """Breaker state for a single model"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.probe_started_at: Optional[float] = None
+        self.times_opened = 0
+        # (timestamp, ok, latency) for the rolling error-rate window
+        self.outcomes: deque = deque()
+
+
+class ModelHealthRegistry:
+    def __init__(self):
+        self.window_size = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+        self.min_samples = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+
+        # Circuit breaker tuning
+        self.breaker_window_seconds = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "120"))
+        self.breaker_min_requests = int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "5"))
+        self.breaker_error_rate = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+        self.breaker_slow_seconds = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "30"))
+        self.breaker_cooldown_seconds = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+        # Latency at which a model's health score is halved
+        self.health_latency_scale = float(os.getenv("LLM_HEALTH_LATENCY_SCALE_SECONDS", "10"))
+
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._circuits: Dict[str, ModelCircuit] = {}
+        self._lock = threading.Lock()
+
+    def _ensure(self, model: str):
+        if model not in self._latencies:
+            self._latencies[model] = deque(maxlen=self.window_size)
+            self._counters[model] = {"successes": 0, "failures": 0, "cancelled": 0, "skipped": 0}
+            self._circuits[model] = ModelCircuit()
+
+    def _trim(self, circuit: ModelCircuit, now: float):
+        cutoff = now - self.breaker_window_seconds
+        while circuit.outcomes and circuit.outcomes[0][0] < cutoff:
+            circuit.outcomes.popleft()
+
+    def _error_rate(self, circuit: ModelCircuit) -> float:
+        if not circuit.outcomes:
+            return 0.0
+        # Calls slower than the slow threshold count against the model too
+        bad = sum(
+            1 for _, ok, latency in circuit.outcomes
+            if not ok or (latency is not None and latency >= self.breaker_slow_seconds)
+        )
+        return bad / len(circuit.outcomes)
+
+    def _open(self, model: str, circuit: ModelCircuit, now: float):
+        circuit.state = OPEN
+        circuit.opened_at = now
+        circuit.probe_in_flight = False
+        circuit.times_opened += 1
+        print(f"🔌 Circuit OPEN for model {model} (error rate {self._error_rate(circuit):.0%})")
+
+    def _record_outcome(self, model: str, ok: bool, latency: Optional[float]):
+        now = time.monotonic()
+        circuit = self._circuits[model]
+
+        if circuit.state == HALF_OPEN:
+            circuit.probe_in_flight = False
+            if ok:
+                circuit.state = CLOSED
+                circuit.opened_at = None
+                circuit.outcomes.clear()
+                print(f"🔌 Circuit CLOSED for model {model} (probe succeeded)")
+            else:
+                self._open(model, circuit, now)
+            return
+
+        circuit.outcomes.append((now, ok, latency))
+        self._trim(circuit, now)
+
+        if (
+            circuit.state == CLOSED
+            and len(circuit.outcomes) >= self.breaker_min_requests
+            and self._error_rate(circuit) >= self.breaker_error_rate
+        ):
+            self._open(model, circuit, now)
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            self._ensure(model)
+            self._latencies[model].append(latency)
+            self._counters[model]["successes"] += 1
+            self._record_outcome(model, True, latency)
+
+    def record_failure(self, model: str, latency: Optional[float] = None):
+        with self._lock:
+            self._ensure(model)
+            self._counters[model]["failures"] += 1
+            self._record_outcome(model, False, latency)
+
+    def record_cancelled(self, model: str, elapsed: Optional[float] = None):
+        """A hedge loser; not a failure, but worth seeing in the stats.
+        elapsed is how long it had been running: the call would have taken at
+        least that long, so it counts as a latency sample too (otherwise only
+        winners are sampled and the p95 that sets the hedge delay reads low)"""
+        with self._lock:
+            self._ensure(model)
+            self._counters[model]["cancelled"] += 1
+            if elapsed is not None:
+                self._latencies[model].append(elapsed)
+            circuit = self._circuits[model]
+            if circuit.state == HALF_OPEN:
+                # Probe never finished, let the next request probe again
+                circuit.probe_in_flight = False
+
+    def allow_request(self, model: str) -> bool:
+        """Whether a call to this model may go out now (claims the half-open probe)"""
+        with self._lock:
+            self._ensure(model)
+            circuit = self._circuits[model]
+
+            if circuit.state == OPEN:
+                if time.monotonic() - circuit.opened_at < self.breaker_cooldown_seconds:
+                    self._counters[model]["skipped"] += 1
+                    return False
+                circuit.state = HALF_OPEN
+                circuit.probe_in_flight = False
+                print(f"🔌 Circuit HALF-OPEN for model {model}")
+
+            if circuit.state == HALF_OPEN:
+                # A probe that never reported back (e.g. cancelled before it
+                # ran) must not hold the circuit half-open forever
+                now = time.monotonic()
+                probe_stale = (
+                    circuit.probe_started_at is not None
+                    and now - circuit.probe_started_at >= self.breaker_cooldown_seconds
+                )
+                if circuit.probe_in_flight and not probe_stale:
+                    self._counters[model]["skipped"] += 1
+                    return False
+                circuit.probe_in_flight = True
+                circuit.probe_started_at = now
+
+            return True
+
+    def _is_available(self, model: str) -> bool:
+        circuit = self._circuits.get(model)
+        if circuit is None or circuit.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if circuit.state == OPEN:
+            return now - circuit.opened_at >= self.breaker_cooldown_seconds
+        return (
+            not circuit.probe_in_flight
+            or now - circuit.probe_started_at >= self.breaker_cooldown_seconds
+        )
+
+    def health_score(self, model: str) -> float:
+        """
+        0..1 score: smoothed success rate over the breaker window, discounted
+        by median latency. Unseen models score 0.5 on success rate.
+        """
+        with self._lock:
+            circuit = self._circuits.get(model)
+            if circuit is None:
+                return 0.5
+            self._trim(circuit, time.monotonic())
+            outcomes = list(circuit.outcomes)
+
+        successes = sum(1 for _, ok, _ in outcomes if ok)
+        success_rate = (successes + 1) / (len(outcomes) + 2)
+
+        p50 = self.latency_percentile(model, 0.5)
+        if p50 is None:
+            return success_rate
+        return success_rate / (1 + p50 / self.health_latency_scale)
+
+    def rank_models(self, models: List[str]) -> List[str]:
+        """Order models by health score, dropping those behind an open circuit"""
+        with self._lock:
+            available = [m for m in models if self._is_available(m)]
+        # Configured order breaks ties, so cold start keeps the old priority
+        return sorted(available, key=lambda m: (-round(self.health_score(m), 3), models.index(m)))
+
+    def reset(self, model: str):
+        with self._lock:
+            self._ensure(model)
+            self._circuits[model] = ModelCircuit()
+
+    def latency_percentile(self, model: str, percentile: float = 0.95) -> Optional[float]:
+        """Observed latency percentile, or None until enough samples exist"""
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = {}
+        for model in list(self._latencies.keys()):
+            p50 = self.latency_percentile(model, 0.5)
+            p95 = self.latency_percentile(model, 0.95)
+            score = self.health_score(model)
+            with self._lock:
+                circuit = self._circuits[model]
+                result[model] = {
+                    **self._counters[model],
+                    "state": circuit.state,
+                    "times_opened": circuit.times_opened,
+                    "window_requests": len(circuit.outcomes),
+                    "window_error_rate": round(self._error_rate(circuit), 3),
+                    "open_for_seconds": (
+                        round(time.monotonic() - circuit.opened_at, 1)
+                        if circuit.state == OPEN else None
+                    ),
+                    "health_score": round(score, 3),
+                    "samples": len(self._latencies[model]),
+                    "p50_seconds": round(p50, 3) if p50 is not None else None,
+                    "p95_seconds": round(p95, 3) if p95 is not None else None,
+                }
+        return result
+
+
+# Global model health instance
+model_health = ModelHealthRegistry()
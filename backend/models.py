@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,7 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     verification_token = Column(String, nullable=True)
     is_premium = Column(Boolean, default=False)
+    premium_until = Column(DateTime(timezone=True), nullable=True)  # Active period end + grace; kept by subscription_manager
     
     # User preferences
     auto_save_enabled = Column(Boolean, default=True)
@@ -204,4 +205,172 @@ class GuestUsage(Base):
     
     # Additional tracking fields to prevent abuse
     session_id = Column(String, nullable=True)
-    device_info = Column(Text, nullable=True)  # JSON string with device details
\ No newline at end of file
+    device_info = Column(Text, nullable=True)  # JSON string with device details
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True, nullable=False)  # sha256 of content + context + platform + prompt version
+    platform = Column(String, nullable=False)  # 'twitter', 'linkedin', 'instagram'
+    prompt_version = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON string of the cleaned platform output
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class BulkJob(Base):
+    __tablename__ = "bulk_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True, nullable=False)  # Public job identifier
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # 'queued', 'running', 'completed', 'failed'
+    total_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, default=0)
+    failed_items = Column(Integer, default=0)
+    skipped_items = Column(Integer, default=0)  # Not run because the daily limit ran out
+    enabled_platforms = Column(Text, nullable=True)  # JSON list
+    context = Column(Text, nullable=True)  # JSON string for personalization context
+    bypass_cache = Column(Boolean, default=False)
+    generation_mode = Column(String, nullable=True)  # As requested; resolved per tier when run
+    locked_by = Column(String, nullable=True)  # Process running the job
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Resumed elsewhere after this
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    items = relationship("BulkJobItem", back_populates="job", order_by="BulkJobItem.position")
+
+class BulkJobItem(Base):
+    __tablename__ = "bulk_job_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    bulk_job_id = Column(Integer, ForeignKey("bulk_jobs.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    source = Column(String, nullable=False)  # 'text' or 'url'
+    input = Column(Text, nullable=False)  # Raw text or URL
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'running', 'completed', 'failed', 'skipped'
+    generation_id = Column(Integer, ForeignKey("content_generations.id"), nullable=True)
+    error = Column(String, nullable=True)
+    processing_time = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    job = relationship("BulkJob", back_populates="items")
+    generation = relationship("ContentGeneration")
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True, nullable=False)  # Public job identifier
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False, default="repurpose")
+    payload = Column(Text, nullable=False)  # JSON request payload
+    status = Column(String, nullable=False, default="queued", index=True)  # 'queued', 'running', 'succeeded', 'failed'
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Retry backoff
+    locked_by = Column(String, nullable=True)  # Worker id holding the job
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Visibility timeout
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    result = relationship("GenerationJobResult", back_populates="job", uselist=False)
+
+class GenerationJobResult(Base):
+    __tablename__ = "generation_job_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    generation_job_id = Column(Integer, ForeignKey("generation_jobs.id"), unique=True, nullable=False)
+    generation_id = Column(Integer, ForeignKey("content_generations.id"), nullable=True)
+    response = Column(Text, nullable=False)  # JSON SocialMediaResponse
+    processing_time = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    job = relationship("GenerationJob", back_populates="result")
+    generation = relationship("ContentGeneration")
+
+class CoalescedResult(Base):
+    __tablename__ = "coalesced_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    request_key = Column(String, index=True, nullable=False)  # sha256 of user + input + context + platforms
+    response = Column(Text, nullable=False)  # JSON SocialMediaResponse
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class CoalesceLock(Base):
+    __tablename__ = "coalesce_locks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    request_key = Column(String, unique=True, index=True, nullable=False)  # One leader per in-flight request
+    locked_by = Column(String, nullable=False)  # Token of the worker generating it
+    locked_until = Column(DateTime(timezone=True), nullable=False)  # Taken over after this if the leader died
+
+class GenerationPlatformStatus(Base):
+    __tablename__ = "generation_platform_status"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("content_generations.id"), nullable=False, index=True)
+    platform = Column(String, nullable=False)  # 'twitter', 'linkedin', 'instagram'
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'completed', 'failed'
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class GenerationSource(Base):
+    __tablename__ = "generation_sources"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("content_generations.id"), unique=True, nullable=False)
+    content = Column(Text, nullable=False)  # Full prepared source; original_content keeps only a preview
+    regenerations = Column(Integer, default=0)  # Single-platform regenerations used
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    generation = relationship("ContentGeneration")
+
+class GenerationVariant(Base):
+    __tablename__ = "generation_variants"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("content_generations.id"), nullable=False, index=True)
+    platform = Column(String, nullable=False)  # 'twitter', 'linkedin', 'instagram'
+    position = Column(Integer, nullable=False)  # 0 is the output stored on the generation itself
+    content = Column(Text, nullable=False)  # JSON list for twitter/instagram, text for linkedin
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PrincipalInvalidation(Base):
+    __tablename__ = "principal_invalidations"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, nullable=False)  # Token subject whose cached principal is stale
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class QuotaLedger(Base):
+    __tablename__ = "quota_ledger"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    buckets = Column(Text, nullable=False, default="{}")  # JSON {bucket start epoch: charged generations}
+    reservations = Column(Text, nullable=False, default="{}")  # JSON {token: reserved at epoch} for in-flight generations
+    version = Column(Integer, nullable=False, default=0)  # Optimistic concurrency for reserve/commit/release
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = (UniqueConstraint("key", "window", name="uq_rate_limit_key_window"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False)  # "ip:...", "user:..." or "apikey:..."
+    window = Column(Integer, nullable=False, index=True)  # Window number since epoch
+    count = Column(Integer, nullable=False, default=0)
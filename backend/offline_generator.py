@@ -0,0 +1,170 @@
+"""
+Deterministic Offline Generator
+Builds all three formats locally from the source text, with no LLM call:
+key sentences are picked with TextRank, then laid out as a numbered thread,
+a paragraphed LinkedIn post and 2-line carousel slides. Serves the "instant"
+generation mode and stands in for platforms the LLM fails on during outages.
+"""
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from text_compressor import STOPWORDS, WORD_RE, split_sentences, strip_noise, textrank_scores
+from utils import clean_linkedin_post
+
+OFFLINE_FALLBACK_ENABLED = os.getenv("OFFLINE_FALLBACK_ENABLED", "true").lower() == "true"
+
+THREAD_LENGTH = 10
+CAROUSEL_LENGTH = 8
+TWEET_MAX_CHARS = 240
+MAX_RANKED_SENTENCES = 80
+
+SLIDE_EMOJIS = ["🚀", "🤔", "💡", "🏆", "⭐", "🔥", "🧠", "👉"]
+TWEET_EMOJIS = {0: "🧵", THREAD_LENGTH - 1: "👉"}
+
+# Frequent but uninformative as hashtags or slide titles
+GENERIC_WORDS = frozenset("""
+after before being because could each even every first into just like made make many much
+only other over should still then very well would year years time
+""".split())
+
+counters = {"instant": 0, "fallback": 0}
+
+
+# ----------------------------------------------------
+# Text Analysis
+# ----------------------------------------------------
+def keywords(text: str, limit: int = 5) -> List[str]:
+    words = [
+        w for w in WORD_RE.findall(text.lower())
+        if w not in STOPWORDS and w not in GENERIC_WORDS and len(w) > 3 and not w.isdigit()
+    ]
+    return [w for w, _ in Counter(words).most_common(limit)]
+
+
+@lru_cache(maxsize=32)
+def analyze(content: str) -> Tuple[Tuple[str, ...], Tuple[float, ...]]:
+    """Sentences and their TextRank scores, shared by the three formats"""
+    # Headings and list items become their own sentences in strip_noise
+    sentences = [s for s in split_sentences(strip_noise(content)) if len(s.split()) >= 3] or [content.strip()]
+    if len(sentences) > MAX_RANKED_SENTENCES:
+        # Keep TextRank within a few ms: rank an even sample across the whole text
+        step = len(sentences) / MAX_RANKED_SENTENCES
+        sentences = [sentences[int(i * step)] for i in range(MAX_RANKED_SENTENCES)]
+    return tuple(sentences), tuple(textrank_scores(sentences))
+
+
+def key_sentences(content: str, limit: int) -> List[str]:
+    """Top-ranked sentences in their original order; the opening one always stays"""
+    sentences, scores = analyze(content)
+    if len(sentences) <= limit:
+        return list(sentences)
+    order = sorted(range(1, len(sentences)), key=lambda i: -scores[i])
+    chosen = sorted([0] + order[:limit - 1])
+    return [sentences[i] for i in chosen]
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """Cut at a word boundary with an ellipsis"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1].rsplit(" ", 1)[0].rstrip(",;:-")
+    return cut + "…"
+
+
+def hashtags(text: str, count: int) -> str:
+    return " ".join(f"#{w.capitalize()}" for w in keywords(text, count))
+
+
+def _as_sentence(text: str) -> str:
+    text = text.rstrip()
+    return text if text.endswith((".", "!", "?")) else text.rstrip(",;:-") + "."
+
+
+# ----------------------------------------------------
+# Formats
+# ----------------------------------------------------
+def offline_twitter_thread(content: str, context: Optional[Dict] = None) -> List[str]:
+    picked = key_sentences(content, THREAD_LENGTH - 1)
+
+    # Long sentences are split over several tweets if there's room
+    bodies = []
+    for sentence in picked:
+        while len(sentence) > TWEET_MAX_CHARS - 12 and len(bodies) + len(picked) < THREAD_LENGTH + 3:
+            head = shorten(sentence, TWEET_MAX_CHARS - 12)
+            bodies.append(head)
+            sentence = "…" + sentence[len(head) - 1:].lstrip()
+        bodies.append(sentence)
+    bodies = bodies[:THREAD_LENGTH - 1]
+
+    cta = (context or {}).get("cta") or "What's your take? Share it below."
+    bodies.append(f"{cta} {hashtags(content, 3)}".strip())
+
+    total = len(bodies)
+    tweets = []
+    for i, body in enumerate(bodies):
+        emoji = TWEET_EMOJIS.get(0 if i == 0 else THREAD_LENGTH - 1 if i == total - 1 else i, "")
+        prefix = f"{i + 1}/{total} {emoji + ' ' if emoji else ''}"
+        tweets.append(prefix + shorten(body, TWEET_MAX_CHARS - len(prefix)))
+    return tweets
+
+
+def offline_linkedin_post(content: str, context: Optional[Dict] = None) -> str:
+    picked = key_sentences(content, 6)
+    hook, rest = picked[0], picked[1:]
+
+    # clean_linkedin_post paragraphs flat text: an emoji opener, "•" bullets
+    # and hashtags each start a paragraph, other sentences are grouped.
+    # Whole sentences only, since it splits paragraphs on ". "
+    parts = [f"💡 {_as_sentence(hook)}"]
+    if rest:
+        parts.append(_as_sentence(rest[0]))
+    parts += [f"• {_as_sentence(s)}" for s in rest[1:-1]]
+    if len(rest) > 1:
+        parts.append(_as_sentence(rest[-1]))
+
+    topic = (keywords(content, 1) or ["this"])[0]
+    question = (context or {}).get("cta") or f"What has your experience with {topic} been?"
+    if not question.rstrip().endswith("?"):
+        question = question.rstrip(".! ") + "?"
+    parts.append(f"🚀 {question}")
+    parts.append(hashtags(content, 4))
+
+    return clean_linkedin_post(" ".join(parts))
+
+
+def _slide(emoji: str, title_source: str, description: str) -> str:
+    title_words = keywords(title_source, 3) or title_source.split()[:3]
+    title = " ".join(title_words[:3]).upper()
+    description = " ".join(description.split()[:6]).rstrip(",;:-")
+    return f"{emoji} {title}\n{description}"
+
+
+def offline_instagram_carousel(content: str, context: Optional[Dict] = None) -> List[str]:
+    picked = key_sentences(content, CAROUSEL_LENGTH - 1)
+
+    slides = [
+        _slide(SLIDE_EMOJIS[i % (len(SLIDE_EMOJIS) - 1)], sentence, sentence)
+        for i, sentence in enumerate(picked)
+    ]
+    cta = (context or {}).get("cta") or "Save this and share it"
+    slides.append(f"{SLIDE_EMOJIS[-1]} FOLLOW FOR MORE\n{' '.join(cta.split()[:6])}")
+    return slides
+
+
+OFFLINE_GENERATORS = {
+    "twitter": offline_twitter_thread,
+    "linkedin": offline_linkedin_post,
+    "instagram": offline_instagram_carousel,
+}
+
+
+def generate_offline(platform: str, content: str, context: Optional[Dict] = None, reason: str = "instant"):
+    counters[reason] += 1
+    return OFFLINE_GENERATORS[platform](content, context)
+
+
+def offline_stats() -> Dict:
+    return {**counters, "fallback_enabled": OFFLINE_FALLBACK_ENABLED}
@@ -0,0 +1,384 @@
+"""
+Structured Validation and Targeted Repair of LLM Output
+Checks a generated thread, carousel or post item by item (count, numbering,
+length, 2-line slide format, closing question/hashtags) and asks the model to
+rewrite only the items that are missing or invalid, with a short prompt,
+instead of padding with canned text or regenerating the whole platform.
+"""
+import os
+import re
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+Completion = Callable[..., Awaitable[Optional[str]]]
+
+THREAD_LENGTH = 10
+CAROUSEL_LENGTH = 8
+TWEET_MAX_CHARS = 240
+SLIDE_TITLE_MAX_WORDS = 5  # Prompt asks for 3; allow a little slack before repairing
+SLIDE_TEXT_MAX_WORDS = 10  # Prompt asks for 6
+
+REPAIR_ROUNDS = int(os.getenv("OUTPUT_REPAIR_ROUNDS", "1"))
+# Items per repair prompt; a fully failed platform is rebuilt in parallel batches
+REPAIR_BATCH_SIZE = int(os.getenv("OUTPUT_REPAIR_BATCH_SIZE", "5"))
+# Source excerpt included for grounding; the rest of the output carries the story
+REPAIR_SOURCE_CHARS = int(os.getenv("OUTPUT_REPAIR_SOURCE_CHARS", "2000"))
+
+TWEET_NUMBER_RE = re.compile(r'^\s*(\d{1,2})\s*/\s*10\b[\s:.)\-]*')
+SLIDE_LABEL_RE = re.compile(r'^\s*(slide\s*\d+\s*[:.\-]?|\d+[.)])\s*', re.IGNORECASE)
+HASHTAG_RE = re.compile(r'#\w+')
+HASHTAG_LINE_RE = re.compile(r'^(?:\s*#\w+[\s,]*)+$')
+
+TWEET_ROLES = [
+    "Hook (big attention grabber)",
+    "The problem or pain point",
+    "Why it matters (personal/professional)",
+    "What you built or achieved",
+    "Key highlight #1",
+    "Key highlight #2",
+    "Your role/contribution",
+    "Lesson learned",
+    "Bigger takeaway for others",
+    "Call-to-action + engagement question, with 2-3 hashtags",
+]
+
+SLIDE_ROLES = [
+    "Hook (big bold attention grabber)",
+    "Problem or pain point",
+    "Why it matters personally/professionally",
+    "The achievement or solution",
+    "Key highlight #1",
+    "Key highlight #2",
+    "Lesson or takeaway",
+    "Call-to-action + engagement prompt",
+]
+
+counters = {"validated": 0, "repairs": 0, "items_repaired": 0, "items_unrepaired": 0, "recovered_failures": 0}
+
+
+# ----------------------------------------------------
+# Validators
+# ----------------------------------------------------
+def validate_thread(lines: List[str]) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """Return ({position: tweet} for valid tweets, {position: problem} for the rest)"""
+    numbered: Dict[int, str] = {}
+    unnumbered = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = TWEET_NUMBER_RE.match(line)
+        position = int(match.group(1)) if match else None
+        if position and 1 <= position <= THREAD_LENGTH and position not in numbered:
+            numbered[position] = line
+        else:
+            unnumbered.append(line)
+
+    # The model dropped the numbering altogether: take the lines in order
+    if not numbered:
+        numbered = {i + 1: f"{i + 1}/10 {line}" for i, line in enumerate(unnumbered[:THREAD_LENGTH])}
+
+    valid, problems = {}, {}
+    for position in range(1, THREAD_LENGTH + 1):
+        tweet = numbered.get(position)
+        if tweet is None:
+            problems[position] = "missing"
+        elif len(TWEET_NUMBER_RE.sub("", tweet).strip()) < 10:
+            problems[position] = "empty"
+        elif len(tweet) > TWEET_MAX_CHARS:
+            problems[position] = f"too long ({len(tweet)} chars, max {TWEET_MAX_CHARS})"
+        else:
+            valid[position] = tweet
+    return valid, problems
+
+
+def _normalize_slides(blocks: List[str]) -> List[List[str]]:
+    slides = []
+    for block in blocks:
+        lines = [SLIDE_LABEL_RE.sub("", line).strip() for line in block.strip().split("\n")]
+        lines = [line for line in lines if line]
+        if len(lines) > 2 and len(lines) % 2 == 0:
+            # Slides separated by a single newline instead of a blank line
+            slides.extend(lines[i:i + 2] for i in range(0, len(lines), 2))
+        elif lines:
+            slides.append(lines)
+    return slides
+
+
+def slide_problem(lines: List[str]) -> Optional[str]:
+    if len(lines) != 2:
+        return f"has {len(lines)} lines, needs exactly 2"
+    title, text = lines
+    if len(title.split()) > SLIDE_TITLE_MAX_WORDS + 1:  # +1 for the emoji
+        return "title too long"
+    if len(text.split()) > SLIDE_TEXT_MAX_WORDS:
+        return "description too long"
+    if "#" in title or "#" in text:
+        return "contains hashtags"
+    return None
+
+
+def validate_carousel(blocks: List[str]) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """Return ({position: slide} for valid slides, {position: problem} for the rest)"""
+    slides = _normalize_slides(blocks)[:CAROUSEL_LENGTH]
+    valid, problems = {}, {}
+    for position in range(1, CAROUSEL_LENGTH + 1):
+        if position > len(slides):
+            problems[position] = "missing"
+            continue
+        problem = slide_problem(slides[position - 1])
+        if problem:
+            problems[position] = problem
+        else:
+            valid[position] = "\n".join(slides[position - 1])
+    return valid, problems
+
+
+def split_hashtag_block(post: str) -> Tuple[str, List[str]]:
+    """Split a post into its body and the hashtags on its closing hashtag-only lines;
+    hashtags used inline in the body stay where they are"""
+    lines = post.rstrip().split("\n")
+    end = len(lines)
+    while end > 0 and (not lines[end - 1].strip() or HASHTAG_LINE_RE.match(lines[end - 1])):
+        end -= 1
+    return "\n".join(lines[:end]).rstrip(), HASHTAG_RE.findall("\n".join(lines[end:]))
+
+
+def validate_post(post: str) -> List[str]:
+    """Missing closing parts of a LinkedIn post: 'question' and/or 'hashtags'"""
+    missing = []
+    body, tags = split_hashtag_block(post)
+    paragraphs = [p for p in body.split("\n\n") if p.strip()]
+    if not paragraphs or "?" not in paragraphs[-1]:
+        missing.append("question")
+    if len(tags) < 3:
+        missing.append("hashtags")
+    return missing
+
+
+# ----------------------------------------------------
+# Repair Prompts
+# ----------------------------------------------------
+def _context_lines(context: Optional[Dict]) -> str:
+    if not context:
+        return ""
+    keys = ("audience", "tone", "mood", "goal", "cta")
+    lines = [f"- {k.title()}: {context[k]}" for k in keys if context.get(k)]
+    return "\nPersonalization Context:\n" + "\n".join(lines) + "\n" if lines else ""
+
+
+def build_thread_repair_messages(
+    content: str, valid: Dict[int, str], problems: Dict[int, str], context: Optional[Dict]
+) -> List[Dict]:
+    wanted = "\n".join(
+        f"{p}/10 ({TWEET_ROLES[p - 1]}) - {'write it' if problems[p] == 'missing' else 'rewrite: ' + problems[p]}"
+        for p in sorted(problems)
+    )
+    existing = "\n".join(valid[p] for p in sorted(valid)) or "(none yet)"
+
+    system_prompt = f"""
+You are an expert X (Twitter) thread writer fixing specific tweets in a 10-tweet thread.
+
+Write ONLY these tweets:
+{wanted}
+
+Rules:
+- Each tweet under {TWEET_MAX_CHARS} characters and starts with its number ("3/10 ...")
+- Fit naturally between the existing tweets
+- Max 1 emoji per tweet; hashtags only in 10/10
+- Return ONLY the requested tweets, one per line
+- Do NOT invent fake details
+{_context_lines(context)}"""
+
+    user_prompt = f"""
+Existing tweets:
+{existing}
+
+Source (excerpt):
+{content[:REPAIR_SOURCE_CHARS]}
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def build_carousel_repair_messages(
+    content: str, valid: Dict[int, str], problems: Dict[int, str], context: Optional[Dict]
+) -> List[Dict]:
+    wanted = "\n".join(
+        f"Slide {p} ({SLIDE_ROLES[p - 1]}) - {'write it' if problems[p] == 'missing' else 'rewrite: ' + problems[p]}"
+        for p in sorted(problems)
+    )
+    existing = "\n\n".join(f"Slide {p}:\n{valid[p]}" for p in sorted(valid)) or "(none yet)"
+
+    system_prompt = f"""
+You are an Instagram carousel content strategist fixing specific slides of an 8-slide carousel.
+
+Write ONLY these slides, in this order:
+{wanted}
+
+Formatting Rules:
+- Each slide MUST have EXACTLY 2 lines:
+  Line 1: Emoji + TITLE (uppercase, max 3 words)
+  Line 2: Short description (max 6 words)
+- Separate slides with ONE blank line
+- No numbering, no "Slide N" labels, no hashtags
+- Return ONLY the requested slides
+- Do NOT invent fake details
+{_context_lines(context)}"""
+
+    user_prompt = f"""
+Existing slides:
+{existing}
+
+Source (excerpt):
+{content[:REPAIR_SOURCE_CHARS]}
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def build_post_repair_messages(post: str, missing: List[str], context: Optional[Dict]) -> List[Dict]:
+    parts = []
+    if "question" in missing:
+        parts.append("QUESTION: one engagement question for the end of the post (must end with ?)")
+    if "hashtags" in missing:
+        parts.append("HASHTAGS: 3-5 relevant hashtags on one line")
+
+    system_prompt = f"""
+You are a LinkedIn content strategist finishing a post.
+
+Return ONLY these lines:
+{chr(10).join(parts)}
+{_context_lines(context)}"""
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": post},
+    ]
+
+
+# ----------------------------------------------------
+# Repair Loops
+# ----------------------------------------------------
+def _batches(problems: Dict[int, str]) -> List[Dict[int, str]]:
+    positions = sorted(problems)
+    return [
+        {p: problems[p] for p in positions[i:i + REPAIR_BATCH_SIZE]}
+        for i in range(0, len(positions), REPAIR_BATCH_SIZE)
+    ]
+
+
+async def repair_thread(
+    result: Optional[str], content: str, context: Optional[Dict], complete: Completion
+) -> Tuple[Dict[int, str], List[int]]:
+    """Return ({position: tweet} for valid tweets, positions still invalid after repair)"""
+    counters["validated"] += 1
+    valid, problems = validate_thread(result.split("\n") if result else [])
+    initially_broken = len(problems)
+
+    for _ in range(REPAIR_ROUNDS):
+        if not problems:
+            break
+        counters["repairs"] += 1
+        print(f"🩹 Repairing tweets {sorted(problems)}")
+        batches = _batches(problems)
+        replies = await asyncio.gather(*(
+            complete(build_thread_repair_messages(content, valid, batch, context), max_tokens=120 * len(batch) + 100)
+            for batch in batches
+        ))
+        for batch, reply in zip(batches, replies):
+            if not reply:
+                continue
+            fixed, _ = validate_thread(reply.split("\n"))
+            for position in batch:
+                if position in fixed:
+                    valid[position] = fixed[position]
+                    problems.pop(position, None)
+
+    counters["items_repaired"] += initially_broken - len(problems)
+    counters["items_unrepaired"] += len(problems)
+    if not result and valid:
+        counters["recovered_failures"] += 1
+    return valid, sorted(problems)
+
+
+async def repair_carousel(
+    result: Optional[str], content: str, context: Optional[Dict], complete: Completion
+) -> Tuple[Dict[int, str], List[int]]:
+    """Return ({position: slide} for valid slides, positions still invalid after repair)"""
+    counters["validated"] += 1
+    valid, problems = validate_carousel(result.split("\n\n") if result else [])
+    initially_broken = len(problems)
+
+    for _ in range(REPAIR_ROUNDS):
+        if not problems:
+            break
+        counters["repairs"] += 1
+        print(f"🩹 Repairing slides {sorted(problems)}")
+        batches = _batches(problems)
+        replies = await asyncio.gather(*(
+            complete(build_carousel_repair_messages(content, valid, batch, context), max_tokens=40 * len(batch) + 100)
+            for batch in batches
+        ))
+        for batch, reply in zip(batches, replies):
+            if not reply:
+                continue
+            slides = _normalize_slides(reply.split("\n\n"))
+            # Replies come back in the requested order
+            for position, lines in zip(sorted(batch), slides):
+                if slide_problem(lines) is None:
+                    valid[position] = "\n".join(lines)
+                    problems.pop(position, None)
+
+    counters["items_repaired"] += initially_broken - len(problems)
+    counters["items_unrepaired"] += len(problems)
+    if not result and valid:
+        counters["recovered_failures"] += 1
+    return valid, sorted(problems)
+
+
+async def repair_post(post: str, context: Optional[Dict], complete: Completion) -> str:
+    """Add a missing closing question and/or hashtags to a LinkedIn post"""
+    counters["validated"] += 1
+    missing = validate_post(post)
+    if not missing or REPAIR_ROUNDS < 1:
+        return post
+
+    counters["repairs"] += 1
+    print(f"🩹 Repairing LinkedIn post ({', '.join(missing)})")
+    reply = await complete(build_post_repair_messages(post, missing, context), max_tokens=120)
+    if not reply:
+        counters["items_unrepaired"] += len(missing)
+        return post
+
+    question = re.search(r'QUESTION:\s*(.+\?)', reply)
+    hashtags = HASHTAG_RE.findall(reply.split("HASHTAGS:", 1)[-1]) if "HASHTAGS:" in reply else []
+
+    # Keep hashtags as the final line; inline ones in the body are left alone
+    body, existing_tags = split_hashtag_block(post)
+    fixed = 0
+    if "question" in missing and question:
+        body = f"{body}\n\n{question.group(1).strip()}"
+        fixed += 1
+    tags = existing_tags
+    if "hashtags" in missing and hashtags:
+        tags = existing_tags + [t for t in hashtags if t not in existing_tags]
+        fixed += 1
+    if tags:
+        body = f"{body}\n\n{' '.join(tags[:5])}"
+
+    counters["items_repaired"] += fixed
+    counters["items_unrepaired"] += len(missing) - fixed
+    return body
+
+
+def repair_stats() -> Dict:
+    return {
+        **counters,
+        "rounds": REPAIR_ROUNDS,
+        "batch_size": REPAIR_BATCH_SIZE,
+    }
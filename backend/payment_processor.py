@@ -8,6 +8,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from models import User, Subscription, PaymentHistory
+from subscription_manager import subscription_manager
 import logging
 
 # Set up logging
@@ -134,9 +135,6 @@ class PaymentProcessor:
             # Link payment to subscription
             payment_record.subscription_id = subscription.id
             
-            # Upgrade user to premium
-            user.is_premium = True
-            
             # Mark verification as completed
             payment_record.verification_completed_at = datetime.now(timezone.utc)
             
@@ -211,6 +209,7 @@ class PaymentProcessor:
             existing_subscription.extra_metadata = json.dumps(dodo_payment_data or {})
             existing_subscription.updated_at = datetime.now(timezone.utc)
             
+            self._sync_entitlement(user_id, existing_subscription)
             return existing_subscription
         
         else:
@@ -240,8 +239,15 @@ class PaymentProcessor:
             self.db.add(subscription)
             self.db.flush()  # Get the ID without committing
             
+            self._sync_entitlement(user_id, subscription)
             return subscription
     
+    def _sync_entitlement(self, user_id: int, subscription: Subscription):
+        """Keep the user's materialized premium_until in step with the subscription"""
+        user = self.db.get(User, user_id)
+        if user:
+            subscription_manager.sync_entitlement(user, subscription)
+    
     def cancel_subscription(self, user_id: int) -> Dict[str, Any]:
         """Cancel user subscription and downgrade to free plan"""
         
@@ -270,7 +276,7 @@ class PaymentProcessor:
             subscription.updated_at = datetime.now(timezone.utc)
             
             # Downgrade user
-            user.is_premium = False
+            subscription_manager.sync_entitlement(user, subscription)
             
             # Create payment record for cancellation
             cancellation_record = PaymentHistory(
@@ -0,0 +1,184 @@
+"""
+Authenticated Principal Cache
+Keeps a short-lived snapshot of each signed-in user, keyed on the token
+subject (email), so get_current_user skips the user lookup and the
+subscription check on most requests. A hit is attached to the request's
+session without a query, so routes still get a regular User.
+
+Entries are dropped whenever a User row is updated or deleted, and
+explicitly by the payment webhooks and the expiry sweep. With
+PRINCIPAL_CACHE_CROSS_WORKER=true every invalidation is also written to
+principal_invalidations, and each worker replays new rows every
+PRINCIPAL_CACHE_SYNC_SECONDS.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models import PrincipalInvalidation, User
+
+# Never kept in memory; loaded from the DB on the rare access
+UNCACHED_COLUMNS = {"hashed_password", "verification_token"}
+CACHED_COLUMNS = [c.key for c in User.__table__.columns if c.key not in UNCACHED_COLUMNS]
+
+
+class PrincipalCache:
+    def __init__(self):
+        self.enabled = os.getenv("PRINCIPAL_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl_seconds = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+        self.max_entries = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+        self.cross_worker = os.getenv("PRINCIPAL_CACHE_CROSS_WORKER", "false").lower() == "true"
+        self.sync_seconds = float(os.getenv("PRINCIPAL_CACHE_SYNC_SECONDS", "2"))
+        self.invalidation_retention = timedelta(hours=1)
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_seen_id: Optional[int] = None
+        self._next_sync = 0.0
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0, "remote_invalidations": 0}
+
+    # ----------------------------------------------------
+    # Lookup
+    # ----------------------------------------------------
+    def get(self, db: Session, email: str) -> Optional[User]:
+        """Return the cached user attached to db, or None on a miss"""
+        if not self.enabled:
+            return None
+        if self.cross_worker:
+            self._sync(db)
+
+        user = self._lookup(email)
+        return db.merge(user, load=False) if user is not None else None
+
+    async def get_async(self, db: AsyncSession, email: str) -> Optional[User]:
+        """get() for an AsyncSession"""
+        if not self.enabled:
+            return None
+        if self.cross_worker:
+            await db.run_sync(self._sync)
+
+        user = self._lookup(email)
+        return await db.merge(user, load=False) if user is not None else None
+
+    def _lookup(self, email: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[email]
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(email)
+            self.counters["hits"] += 1
+            values = entry[1]
+
+        # Rebuild a detached User with the cached identity so it can be merged
+        # in without loading; columns left out are fetched on first access
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, user: User):
+        """Snapshot a user whose subscription status was just checked"""
+        if not self.enabled:
+            return
+        values = {key: getattr(user, key) for key in CACHED_COLUMNS}
+        with self._lock:
+            self._entries[user.email] = (time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end(user.email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ----------------------------------------------------
+    # Invalidation
+    # ----------------------------------------------------
+    def drop(self, emails: Iterable[str]):
+        """Forget entries in this worker only"""
+        with self._lock:
+            for email in emails:
+                if self._entries.pop(email, None) is not None:
+                    self.counters["invalidations"] += 1
+
+    def invalidate(self, email: str, db: Optional[Session] = None):
+        """Forget a user here and, in cross-worker mode, in every other worker"""
+        self.drop([email])
+        if self.cross_worker and db is not None:
+            try:
+                db.add(PrincipalInvalidation(email=email))
+                db.commit()
+            except Exception as e:
+                print(f"⚠️ Could not publish principal invalidation: {e}")
+                db.rollback()
+
+    def _sync(self, db: Session):
+        """Replay invalidations published by other workers since the last sync"""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_seconds
+        try:
+            if self._last_seen_id is None:
+                # Fresh worker: its cache is empty, only later rows matter
+                self._last_seen_id = db.query(func.max(PrincipalInvalidation.id)).scalar() or 0
+                cutoff = datetime.now(timezone.utc) - self.invalidation_retention
+                db.query(PrincipalInvalidation).filter(
+                    PrincipalInvalidation.created_at < cutoff
+                ).delete(synchronize_session=False)
+                db.commit()
+                return
+            rows = db.query(PrincipalInvalidation.id, PrincipalInvalidation.email).filter(
+                PrincipalInvalidation.id > self._last_seen_id
+            ).order_by(PrincipalInvalidation.id).all()
+            if rows:
+                self._last_seen_id = rows[-1].id
+                self.counters["remote_invalidations"] += len(rows)
+                self.drop(row.email for row in rows)
+        except Exception as e:
+            print(f"⚠️ Principal cache sync failed: {e}")
+            db.rollback()
+            # Can't tell what changed elsewhere, so start over
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "cross_worker": self.cross_worker,
+        }
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache()
+
+
+# Any change to a User row (profile edits, premium flips, deactivation)
+# invalidates its entry; the old address too when the email itself changed
+def _invalidate_user(mapper, connection, target: User):
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    principal_cache.drop(emails)
+    if principal_cache.cross_worker:
+        # Part of the flush's transaction, so a rolled-back change publishes nothing
+        connection.execute(
+            PrincipalInvalidation.__table__.insert(),
+            [{"email": email} for email in emails if email],
+        )
+
+
+event.listen(User, "after_update", _invalidate_user)
+event.listen(User, "after_delete", _invalidate_user)
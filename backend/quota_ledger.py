@@ -0,0 +1,402 @@
+"""
+Generation Quota Ledger
+Per-user 24h sliding-window usage kept as a handful of time buckets in one
+row, so quota checks read a single row instead of counting usage_stats.
+Generations reserve a unit up front (atomically, so concurrent requests
+can't both pass the last slot), commit it together with the usage record
+when they are charged, and release it otherwise. Reservations left behind
+by a crashed process expire on their own, and a periodic reconciliation
+rebuilds the buckets from usage_stats.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, SessionLocal
+from models import QuotaLedger, UsageStats
+
+WINDOW_SECONDS = 24 * 3600
+MAX_ATTEMPTS = 5
+# Session.info key for reservations charged in a transaction that hasn't committed yet
+PENDING_SETTLE_KEY = "quota_pending_settle"
+
+
+class QuotaReservation:
+    """One reserved generation; commit or release it exactly once"""
+
+    __slots__ = ("token", "user_id", "settled")
+
+    def __init__(self, token: str, user_id: int):
+        self.token = token
+        self.user_id = user_id
+        self.settled = False
+
+
+class QuotaLedgerManager:
+    def __init__(self):
+        # A bucket leaves the window once all of it is older than 24h, so the
+        # window is effectively 24h plus up to one bucket
+        self.bucket_seconds = int(os.getenv("QUOTA_BUCKET_MINUTES", "15")) * 60
+        # Longer than any generation; an unsettled reservation is refunded after this
+        self.reservation_ttl_seconds = int(os.getenv("QUOTA_RESERVATION_TTL_SECONDS", "900"))
+        self.cache_ttl_seconds = float(os.getenv("QUOTA_CACHE_SECONDS", "5"))
+        self.reconcile_interval_minutes = int(os.getenv("QUOTA_RECONCILE_INTERVAL_MINUTES", "30"))
+        # Ledgers read per reconciliation query
+        self.reconcile_batch_size = int(os.getenv("QUOTA_RECONCILE_BATCH_SIZE", "500"))
+
+        self._cache: Dict[int, Tuple[float, int]] = {}
+        self._releasing = set()  # Refunds that outlive a cancelled caller
+        self._lock = threading.Lock()
+        self.counters = {
+            "reserved": 0,
+            "rejected": 0,
+            "committed": 0,
+            "released": 0,
+            "conflicts": 0,
+            "cache_hits": 0,
+            "reconciled_users": 0,
+        }
+
+    # ----------------------------------------------------
+    # Row state
+    # ----------------------------------------------------
+    def _bucket(self, at: float) -> str:
+        return str(int(at // self.bucket_seconds * self.bucket_seconds))
+
+    def _load(self, row: QuotaLedger, now: float) -> Tuple[Dict[str, int], Dict[str, float]]:
+        """Parse a row, dropping buckets out of the window and expired reservations"""
+        window_start = now - WINDOW_SECONDS
+        buckets = {
+            start: count for start, count in json.loads(row.buckets or "{}").items()
+            if int(start) + self.bucket_seconds > window_start
+        }
+        reservations = {
+            token: at for token, at in json.loads(row.reservations or "{}").items()
+            if at + self.reservation_ttl_seconds > now
+        }
+        return buckets, reservations
+
+    @staticmethod
+    def _used(buckets: Dict[str, int], reservations: Dict[str, float]) -> int:
+        return sum(buckets.values()) + len(reservations)
+
+    def _get_row(self, db: Session, user_id: int) -> QuotaLedger:
+        row = db.query(QuotaLedger).filter(QuotaLedger.user_id == user_id).populate_existing().first()
+        if row is None:
+            try:
+                db.add(QuotaLedger(user_id=user_id, buckets="{}", reservations="{}", version=0))
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Created concurrently
+            row = db.query(QuotaLedger).filter(QuotaLedger.user_id == user_id).populate_existing().first()
+        return row
+
+    def _write(self, db: Session, row: QuotaLedger, buckets: Dict, reservations: Dict) -> bool:
+        """Compare-and-set on the version; False if another request got there first"""
+        updated = db.query(QuotaLedger).filter(
+            QuotaLedger.id == row.id,
+            QuotaLedger.version == row.version,
+        ).update({
+            QuotaLedger.buckets: json.dumps(buckets, separators=(",", ":")),
+            QuotaLedger.reservations: json.dumps(reservations, separators=(",", ":")),
+            QuotaLedger.version: row.version + 1,
+        }, synchronize_session=False)
+        if not updated:
+            self.counters["conflicts"] += 1
+        return bool(updated)
+
+    def _remember(self, user_id: int, used: Optional[int]):
+        with self._lock:
+            if used is None:
+                self._cache.pop(user_id, None)
+            else:
+                self._cache[user_id] = (time.monotonic() + self.cache_ttl_seconds, used)
+
+    # ----------------------------------------------------
+    # Reads
+    # ----------------------------------------------------
+    def used(self, db: Session, user_id: int) -> int:
+        """Generations charged or in flight in the last 24h; one row read, briefly cached"""
+        with self._lock:
+            entry = self._cache.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.counters["cache_hits"] += 1
+            return entry[1]
+
+        row = db.query(QuotaLedger).filter(QuotaLedger.user_id == user_id).first()
+        used = self._used(*self._load(row, time.time())) if row else 0
+        self._remember(user_id, used)
+        return used
+
+    # ----------------------------------------------------
+    # Reserve / commit / release
+    # ----------------------------------------------------
+    def reserve(self, user_id: int, limit: Optional[int]) -> Optional[QuotaReservation]:
+        """Hold one generation for user_id; None when limit is reached (no limit if None)"""
+        db = SessionLocal()
+        try:
+            return self._reserve(db, user_id, limit)
+        finally:
+            db.close()
+
+    async def reserve_async(self, user_id: int, limit: Optional[int]) -> Optional[QuotaReservation]:
+        """reserve on the async engine"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(self._reserve, user_id, limit)
+
+    def _reserve(self, db: Session, user_id: int, limit: Optional[int]) -> Optional[QuotaReservation]:
+        for _ in range(MAX_ATTEMPTS):
+            row = self._get_row(db, user_id)
+            now = time.time()
+            buckets, reservations = self._load(row, now)
+            used = self._used(buckets, reservations)
+            if limit is not None and used >= limit:
+                db.rollback()
+                self.counters["rejected"] += 1
+                self._remember(user_id, used)
+                return None
+
+            token = uuid.uuid4().hex[:12]
+            reservations[token] = now
+            if self._write(db, row, buckets, reservations):
+                db.commit()
+                self.counters["reserved"] += 1
+                self._remember(user_id, used + 1)
+                return QuotaReservation(token, user_id)
+            db.rollback()
+        raise Exception(f"Could not reserve quota for user {user_id} (contention)")
+
+    def _settle_on_commit(self, db: Session, reservation: QuotaReservation):
+        """
+        Mark the reservation settled only once the caller's transaction
+        commits; if it rolls back instead, the charge is undone with it and
+        the reservation stays open for the caller's release()
+        """
+        db.info.setdefault(PENDING_SETTLE_KEY, []).append(reservation)
+
+    def _settled(self, reservation: QuotaReservation):
+        reservation.settled = True
+        self.counters["committed"] += 1
+        self._remember(reservation.user_id, None)
+
+    def commit(self, db: Session, reservation: QuotaReservation):
+        """
+        Charge a reservation inside the caller's transaction; the caller
+        commits, and the reservation only counts as settled once it has
+        """
+        if reservation.settled:
+            return
+        for _ in range(MAX_ATTEMPTS):
+            row = db.query(QuotaLedger).filter(
+                QuotaLedger.user_id == reservation.user_id
+            ).populate_existing().first()
+            if row is None:
+                break
+            now = time.time()
+            buckets, reservations = self._load(row, now)
+            # Charged even if the reservation already expired: the usage happened
+            reservations.pop(reservation.token, None)
+            bucket = self._bucket(now)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+            if self._write(db, row, buckets, reservations):
+                self._settle_on_commit(db, reservation)
+                return
+        print(f"⚠️ Could not commit quota for user {reservation.user_id}; reconciliation will catch up")
+
+    def release(self, reservation: Optional[QuotaReservation]):
+        """Refund a reservation that wasn't charged; no-op once committed or released"""
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        db = SessionLocal()
+        try:
+            self._release(db, reservation)
+        finally:
+            db.close()
+
+    async def release_async(self, reservation: Optional[QuotaReservation]):
+        """
+        release on the async engine. Usually awaited from a finally block of
+        a request that may be getting cancelled, so the refund is shielded.
+        """
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        task = asyncio.ensure_future(self._release_in_session(reservation))
+        self._releasing.add(task)
+        task.add_done_callback(self._releasing.discard)
+        await asyncio.shield(task)
+
+    async def _release_in_session(self, reservation: QuotaReservation):
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(self._release, reservation)
+
+    def _release(self, db: Session, reservation: QuotaReservation):
+        try:
+            for _ in range(MAX_ATTEMPTS):
+                row = db.query(QuotaLedger).filter(
+                    QuotaLedger.user_id == reservation.user_id
+                ).populate_existing().first()
+                if row is None:
+                    return
+                buckets, reservations = self._load(row, time.time())
+                reservations.pop(reservation.token, None)
+                if self._write(db, row, buckets, reservations):
+                    db.commit()
+                    self.counters["released"] += 1
+                    self._remember(reservation.user_id, self._used(buckets, reservations))
+                    return
+                db.rollback()
+        except Exception as e:
+            # The reservation expires on its own
+            print(f"⚠️ Could not release quota reservation: {e}")
+            db.rollback()
+
+    # ----------------------------------------------------
+    # Reconciliation
+    # ----------------------------------------------------
+    def _usage_cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=WINDOW_SECONDS + self.bucket_seconds)
+
+    def _usage_buckets(self, db: Session, now: float, user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """{user_id: buckets} built from the in-window generate rows of usage_stats"""
+        query = db.query(UsageStats.user_id, UsageStats.created_at).filter(
+            UsageStats.action == "generate",
+            UsageStats.created_at >= self._usage_cutoff(),
+            UsageStats.user_id.in_(user_ids),
+        )
+
+        window_start = now - WINDOW_SECONDS
+        expected: Dict[int, Dict[str, int]] = {}
+        for row_user_id, created_at in query:
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite drops tzinfo
+            bucket = self._bucket(created_at.timestamp())
+            if int(bucket) + self.bucket_seconds <= window_start:
+                continue
+            expected.setdefault(row_user_id, {})
+            expected[row_user_id][bucket] = expected[row_user_id].get(bucket, 0) + 1
+        return expected
+
+    def _reconcile_user(self, db: Session, user_id: int) -> Tuple[bool, Optional[Dict[str, int]]]:
+        """(settled, change) for one ledger; settled is False if it kept changing underneath"""
+        # The batch read only picks candidates. Each fix re-reads the row and
+        # then that user's usage, so a generation charged in between bumps
+        # the version and fails the compare-and-set instead of being lost
+        for _ in range(MAX_ATTEMPTS):
+            row = db.query(QuotaLedger).filter(QuotaLedger.user_id == user_id).populate_existing().first()
+            now = time.time()
+            buckets, reservations = self._load(row, now)
+            want = self._usage_buckets(db, now, [user_id]).get(user_id, {})
+            if buckets == want:
+                db.rollback()
+                return True, None
+            if self._write(db, row, want, reservations):
+                db.commit()
+                self._remember(user_id, None)
+                return True, {"user_id": user_id, "ledger": sum(buckets.values()), "usage_stats": sum(want.values())}
+            db.rollback()
+        return False, None
+
+    def reconcile(self, db: Session) -> Dict[str, Any]:
+        """Rebuild every ledger's buckets from the last 24h of usage_stats, a batch at a time"""
+        # Seed ledgers for usage recorded before they existed
+        missing = db.query(UsageStats.user_id).outerjoin(
+            QuotaLedger, QuotaLedger.user_id == UsageStats.user_id
+        ).filter(
+            UsageStats.action == "generate",
+            UsageStats.created_at >= self._usage_cutoff(),
+            QuotaLedger.id.is_(None),
+        ).distinct().all()
+        for (user_id,) in missing:
+            self._get_row(db, user_id)
+
+        checked, fixed, conflicts = 0, [], 0
+        last_id = 0
+        while True:
+            rows = db.query(QuotaLedger).filter(
+                QuotaLedger.id > last_id
+            ).order_by(QuotaLedger.id).limit(self.reconcile_batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            checked += len(rows)
+
+            now = time.time()
+            expected = self._usage_buckets(db, now, [row.user_id for row in rows])
+            candidates = [
+                row.user_id for row in rows
+                if self._load(row, now)[0] != expected.get(row.user_id, {})
+            ]
+            db.rollback()
+
+            for user_id in candidates:
+                settled, change = self._reconcile_user(db, user_id)
+                if not settled:
+                    conflicts += 1  # Kept changing; the next run re-checks it
+                elif change:
+                    fixed.append(change)
+
+        self.counters["reconciled_users"] += len(fixed)
+        return {"checked": checked, "fixed": len(fixed), "conflicts": conflicts, "changes": fixed[:100]}
+
+    def _reconcile_in_session(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return self.reconcile(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def reconcile_async(self) -> Dict[str, Any]:
+        """reconcile in a worker thread with its own session, keeping the event loop free"""
+        return await asyncio.to_thread(self._reconcile_in_session)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "cached_users": len(self._cache),
+            "bucket_minutes": self.bucket_seconds // 60,
+            "reservation_ttl_seconds": self.reservation_ttl_seconds,
+            "reconcile_interval_minutes": self.reconcile_interval_minutes,
+        }
+
+
+# Global quota ledger instance
+quota_ledger = QuotaLedgerManager()
+
+
+@event.listens_for(Session, "after_commit")
+def _settle_committed_reservations(session: Session):
+    for reservation in session.info.pop(PENDING_SETTLE_KEY, []):
+        quota_ledger._settled(reservation)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_reservations(session: Session):
+    session.info.pop(PENDING_SETTLE_KEY, None)
+
+
+async def quota_reconcile_background_task():
+    """Periodically rebuild ledgers from usage_stats"""
+    interval = quota_ledger.reconcile_interval_minutes * 60
+    while True:
+        # First run at startup also seeds ledgers for usage recorded before they existed
+        try:
+            result = await quota_ledger.reconcile_async()
+            if result["fixed"]:
+                print(f"🔧 Quota reconciliation corrected {result['fixed']} ledgers")
+        except Exception as e:
+            print(f"❌ Error in quota reconciliation: {e}")
+        await asyncio.sleep(interval)
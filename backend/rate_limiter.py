@@ -0,0 +1,288 @@
+"""
+Request Rate Limiter
+Sliding-window counter per key: each key keeps only the request counts of
+the current and previous fixed windows, and the previous one is weighted by
+how much of it still overlaps the sliding window. That's O(1) time and a
+few integers of state per key, however much traffic a key sends.
+
+Requests with a valid access token are limited per user, others per client
+IP, and an X-API-Key header adds a per-key limit. Counters live in this
+process by default (idle keys are collected and the key count is capped,
+so scanner traffic can't grow memory without bound) or, to share limits
+between workers, in the database or a Redis-compatible server.
+"""
+import os
+import math
+import time
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import RateLimitCounter
+
+try:
+    import redis.asyncio as aioredis  # optional; only for RATE_LIMIT_BACKEND=redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Atomic check-and-increment; denied requests aren't counted
+REDIS_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[1]) + current + 1 > tonumber(ARGV[2]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+
+class RateLimitDecision:
+    __slots__ = ("allowed", "limit", "remaining", "reset_seconds", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_seconds: int, retry_after: int = 0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_seconds = reset_seconds
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_seconds),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+# ----------------------------------------------------
+# Counter Backends
+# ----------------------------------------------------
+class MemoryBackend:
+    """Per-process counters: key -> (window, previous count, current count)"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._counters: Dict[str, Tuple[int, int, int]] = {}
+        self._last_gc_window = 0
+        self.collected = 0
+        self.evicted = 0
+
+    async def hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        if window > self._last_gc_window:
+            self._collect(window)
+
+        state = self._counters.pop(key, None)
+        if state is None:
+            previous, current = 0, 0
+        elif state[0] == window:
+            previous, current = state[1], state[2]
+        elif state[0] == window - 1:
+            previous, current = state[2], 0
+        else:
+            previous, current = 0, 0
+
+        allowed = previous * weight + current + 1 <= limit
+        if allowed:
+            current += 1
+        if len(self._counters) >= self.max_keys:
+            # Still full after collection: drop the least recently seen key
+            del self._counters[next(iter(self._counters))]
+            self.evicted += 1
+        self._counters[key] = (window, previous, current)  # Re-inserted, so dict order is recency
+        return allowed, current, previous
+
+    def _collect(self, window: int):
+        """Drop keys idle for a whole window; their counts no longer matter"""
+        self._last_gc_window = window
+        idle = [key for key, state in self._counters.items() if state[0] < window - 1]
+        for key in idle:
+            del self._counters[key]
+        self.collected += len(idle)
+
+    def stats(self) -> Dict:
+        return {"keys": len(self._counters), "max_keys": self.max_keys, "collected": self.collected, "evicted": self.evicted}
+
+
+class DatabaseBackend:
+    """Counters in rate_limit_counters, shared by every worker on the database"""
+
+    name = "db"
+
+    def __init__(self):
+        self._last_gc_window = 0
+        self.collected = 0
+
+    async def hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        return await asyncio.to_thread(self._hit, key, window, weight, limit)
+
+    def _hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        db = SessionLocal()
+        try:
+            if window > self._last_gc_window:
+                self._last_gc_window = window
+                self.collected += db.query(RateLimitCounter).filter(
+                    RateLimitCounter.window < window - 1
+                ).delete(synchronize_session=False)
+                db.commit()
+
+            # Increment first: the row lock serializes concurrent hits on a key
+            updated = db.query(RateLimitCounter).filter(
+                RateLimitCounter.key == key, RateLimitCounter.window == window
+            ).update({RateLimitCounter.count: RateLimitCounter.count + 1}, synchronize_session=False)
+            if not updated:
+                try:
+                    with db.begin_nested():
+                        db.add(RateLimitCounter(key=key, window=window, count=1))
+                except IntegrityError:
+                    db.query(RateLimitCounter).filter(
+                        RateLimitCounter.key == key, RateLimitCounter.window == window
+                    ).update({RateLimitCounter.count: RateLimitCounter.count + 1}, synchronize_session=False)
+
+            counts = dict(db.query(RateLimitCounter.window, RateLimitCounter.count).filter(
+                RateLimitCounter.key == key, RateLimitCounter.window.in_([window - 1, window])
+            ).all())
+            current, previous = counts.get(window, 1), counts.get(window - 1, 0)
+
+            if previous * weight + current > limit:
+                db.rollback()  # Denied requests aren't counted
+                return False, current - 1, previous
+            db.commit()
+            return True, current, previous
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        return {"collected": self.collected}
+
+
+class RedisBackend:
+    """Counters in a Redis-compatible server; keys expire on their own"""
+
+    name = "redis"
+
+    def __init__(self, url: str, window_seconds: int):
+        self.client = aioredis.from_url(url)
+        self.script = self.client.register_script(REDIS_HIT_SCRIPT)
+        self.ttl = window_seconds * 2
+
+    async def hit(self, key: str, window: int, weight: float, limit: int) -> Tuple[bool, int, int]:
+        allowed, current, previous = await self.script(
+            keys=[f"rl:{key}:{window}", f"rl:{key}:{window - 1}"],
+            args=[weight, limit, self.ttl],
+        )
+        return bool(allowed), int(current), int(previous)
+
+    def stats(self) -> Dict:
+        return {}
+
+
+# ----------------------------------------------------
+# Limiter
+# ----------------------------------------------------
+class RateLimiter:
+    def __init__(self):
+        self.window_seconds = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+        self.ip_limit = int(os.getenv("RATE_LIMIT_IP", "100"))
+        self.user_limit = int(os.getenv("RATE_LIMIT_USER", "200"))
+        self.api_key_limit = int(os.getenv("RATE_LIMIT_API_KEY", "100"))
+
+        self.local = MemoryBackend(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+        self.backend = self._create_backend(os.getenv("RATE_LIMIT_BACKEND", "memory").lower())
+        self.counters = {"allowed": 0, "limited": 0, "backend_errors": 0}
+
+    def _create_backend(self, name: str):
+        if name == "db":
+            return DatabaseBackend()
+        if name == "redis":
+            url = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+            if REDIS_AVAILABLE:
+                return RedisBackend(url, self.window_seconds)
+            print("⚠️ RATE_LIMIT_BACKEND=redis but the redis package isn't installed; limiting per process")
+        return self.local
+
+    def keys_for(self, request: Request) -> List[Tuple[str, int]]:
+        """(key, limit) pairs that apply to a request"""
+        keys = []
+        auth_header = request.headers.get("Authorization", "")
+        email = None
+        if auth_header.startswith("Bearer "):
+            from auth import verify_token
+            email = verify_token(auth_header[7:], "access")
+
+        if email:
+            keys.append((f"user:{email}", self.user_limit))
+        else:
+            keys.append((f"ip:{request.client.host if request.client else 'unknown'}", self.ip_limit))
+
+        api_key = request.headers.get("X-API-Key")
+        if api_key:
+            digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:24]
+            keys.append((f"apikey:{digest}", self.api_key_limit))
+        return keys
+
+    async def check(self, request: Request) -> RateLimitDecision:
+        """Count the request against each of its keys; the tightest one decides the headers"""
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        weight = 1 - elapsed / self.window_seconds
+        reset_seconds = math.ceil(self.window_seconds - elapsed)
+
+        decision = None
+        for key, limit in self.keys_for(request):
+            try:
+                allowed, current, previous = await self.backend.hit(key, window, weight, limit)
+            except Exception as e:
+                # A shared backend outage shouldn't take the API down with it
+                self.counters["backend_errors"] += 1
+                print(f"⚠️ Rate limit backend error, limiting per process: {e}")
+                allowed, current, previous = await self.local.hit(key, window, weight, limit)
+
+            remaining = max(0, int(limit - previous * weight - current))
+            retry_after = 0 if allowed else self._retry_after(current, previous, limit, elapsed)
+            if decision is None or not allowed or (decision.allowed and remaining < decision.remaining):
+                decision = RateLimitDecision(allowed, limit, remaining, reset_seconds, retry_after)
+            if not allowed:
+                break
+
+        self.counters["allowed" if decision.allowed else "limited"] += 1
+        return decision
+
+    def _retry_after(self, current: int, previous: int, limit: int, elapsed: float) -> int:
+        """Seconds until the weighted count leaves room for one more request"""
+        if current + 1 <= limit and previous:
+            # Room opens in this window as the previous one's weight fades
+            fade_to = (limit - 1 - current) / previous
+            return max(1, math.ceil((1 - fade_to) * self.window_seconds - elapsed))
+        # Next window: this window's count becomes the fading one
+        fade_to = (limit - 1) / current if current else 1
+        return max(1, math.ceil(self.window_seconds - elapsed + max(0.0, 1 - fade_to) * self.window_seconds))
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "backend": self.backend.name,
+            "window_seconds": self.window_seconds,
+            "limits": {"ip": self.ip_limit, "user": self.user_limit, "api_key": self.api_key_limit},
+            "local": self.local.stats(),
+            "shared": self.backend.stats() if self.backend is not self.local else None,
+        }
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
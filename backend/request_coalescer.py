@@ -0,0 +1,194 @@
+"""
+Single-flight Request Coalescing for /repurpose
+Identical requests (same user, input, context and platforms) that arrive while
+one is still generating wait for that generation instead of starting their
+own. Optionally extends across workers with a lock row: the worker that
+holds the row generates, the others poll for it and read the stored result.
+Every lock and result query is a short statement on the async engine, so
+no connection is held while generating or waiting.
+"""
+import os
+import json
+import time
+import asyncio
+import uuid
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import AsyncSessionLocal
+from models import CoalesceLock, CoalescedResult
+from generation_cache import normalize_content
+
+
+def make_request_key(
+    user_id: int,
+    content: Optional[str],
+    url: Optional[str],
+    context: Optional[Dict],
+    platforms: List[str],
+    options: Optional[Dict] = None,
+) -> str:
+    key = {
+        "user_id": user_id,
+        "content": normalize_content(content) if content else None,
+        "url": url,
+        "context": context or {},
+        "platforms": sorted(platforms),
+    }
+    if options:
+        # Only when set, so keys of plain requests don't change
+        key["options"] = options
+    payload = json.dumps(
+        key,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RequestCoalescer:
+    def __init__(self):
+        self.cross_worker = os.getenv("COALESCE_CROSS_WORKER", "false").lower() == "true"
+        # How long a finished result stays readable for workers that waited on it
+        self.result_ttl_seconds = int(os.getenv("COALESCE_RESULT_TTL_SECONDS", "60"))
+        self.lock_wait_seconds = float(os.getenv("COALESCE_LOCK_WAIT_SECONDS", "120"))
+        self.lock_poll_seconds = float(os.getenv("COALESCE_LOCK_POLL_SECONDS", "0.25"))
+        # A lock row older than this belongs to a worker that died mid-generation
+        self.lock_ttl_seconds = float(os.getenv("COALESCE_LOCK_TTL_SECONDS", str(self.lock_wait_seconds)))
+
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "cross_worker_hits": 0}
+
+    def _use_db_lock(self) -> bool:
+        return self.cross_worker
+
+    async def run(
+        self, key: str, produce: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Return (result, coalesced); coalesced is True when another request produced it"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            print(f"🔗 Coalescing duplicate request {key[:12]}")
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        self.counters["leaders"] += 1
+        runner = self._run_with_db_lock(key, produce) if self._use_db_lock() else self._run_local(produce)
+        # A separate task, so the leader's client disconnecting doesn't fail the waiters
+        task = asyncio.ensure_future(runner)
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved when every waiter has gone
+
+    async def _run_local(self, produce) -> Tuple[Dict[str, Any], bool]:
+        return await produce(), False
+
+    async def _run_with_db_lock(self, key: str, produce) -> Tuple[Dict[str, Any], bool]:
+        token = uuid.uuid4().hex
+        acquired = False
+        try:
+            deadline = time.monotonic() + self.lock_wait_seconds
+            waited = False
+            while True:
+                acquired = await self._try_lock(key, token)
+                if acquired or time.monotonic() >= deadline:
+                    break
+                waited = True
+                await asyncio.sleep(self.lock_poll_seconds)
+
+            if waited:
+                stored = await self._load_result(key)
+                if stored is not None:
+                    self.counters["cross_worker_hits"] += 1
+                    print(f"🔗 Reusing result from another worker for {key[:12]}")
+                    return stored, True
+
+            result = await produce()
+            await self._store_result(key, result)
+            return result, False
+        finally:
+            if acquired:
+                await self._unlock(key, token)
+
+    async def _try_lock(self, key: str, token: str) -> bool:
+        """Take the lock row for key, or an expired one; False while another worker holds it"""
+        now = datetime.now(timezone.utc)
+        locked_until = now + timedelta(seconds=self.lock_ttl_seconds)
+        async with AsyncSessionLocal() as db:
+            try:
+                db.add(CoalesceLock(request_key=key, locked_by=token, locked_until=locked_until))
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()
+
+            taken = await db.execute(
+                update(CoalesceLock)
+                .where(CoalesceLock.request_key == key, CoalesceLock.locked_until <= now)
+                .values(locked_by=token, locked_until=locked_until)
+            )
+            await db.commit()
+            return taken.rowcount == 1
+
+    async def _unlock(self, key: str, token: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(CoalesceLock).where(CoalesceLock.request_key == key, CoalesceLock.locked_by == token)
+                )
+                await db.commit()
+        except Exception as e:
+            # Expires on its own after lock_ttl_seconds
+            print(f"⚠️ Coalesce unlock failed for {key[:12]}: {e}")
+
+    async def _load_result(self, key: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            entry = (await db.execute(
+                select(CoalescedResult.response)
+                .where(
+                    CoalescedResult.request_key == key,
+                    CoalescedResult.expires_at > datetime.now(timezone.utc),
+                )
+                .order_by(CoalescedResult.id.desc())
+                .limit(1)
+            )).scalar()
+            return json.loads(entry) if entry else None
+
+    async def _store_result(self, key: str, result: Dict[str, Any]):
+        async with AsyncSessionLocal() as db:
+            try:
+                now = datetime.now(timezone.utc)
+                await db.execute(delete(CoalescedResult).where(CoalescedResult.expires_at <= now))
+                db.add(CoalescedResult(
+                    request_key=key,
+                    response=json.dumps(result),
+                    expires_at=now + timedelta(seconds=self.result_ttl_seconds),
+                ))
+                await db.commit()
+            except Exception as e:
+                print(f"⚠️ Could not store coalesced result: {e}")
+                await db.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": len(self._inflight),
+            "cross_worker": self._use_db_lock(),
+        }
+
+
+# Global request coalescer instance
+request_coalescer = RequestCoalescer()
@@ -8,6 +8,8 @@ from .admin_routes import router as admin_router
 from .dev_routes import dev_router
 from .export_routes import export_router
 from .support_routes import router as support_router
+from .bulk_routes import bulk_router
+from .job_routes import job_router
 
 def register_routes(app):
     app.include_router(auth_router, prefix="/api/v1/auth", tags=["Authentication"])
@@ -19,6 +21,8 @@ def register_routes(app):
     app.include_router(admin_router, tags=["Admin"])
     app.include_router(support_router)
     app.include_router(snippetstream_router, prefix="/api/v1", tags=["SnippetStream"])
+    app.include_router(bulk_router, prefix="/api/v1", tags=["Bulk Processing"])
+    app.include_router(job_router, prefix="/api/v1", tags=["Generation Jobs"])
     
     # Add development routes only in test mode
     if dev_router:
@@ -13,8 +13,23 @@ from pydantic import BaseModel
 from database import get_db
 from auth import get_current_user
 from models import User, Subscription
-from subscription_manager import SubscriptionManager
+from subscription_manager import SubscriptionManager, subscription_manager
 from background_tasks import manual_subscription_check
+from generation_cache import generation_cache
+from long_content import counters as long_content_counters
+from text_compressor import compression_stats
+from output_repair import repair_stats
+from combined_generation import combined_stats
+from offline_generator import offline_stats
+from model_health import model_health
+from job_queue import job_queue
+from llm_scheduler import llm_scheduler
+from request_coalescer import request_coalescer
+from url_fetcher import url_fetcher
+from llm_client import llm_client
+from principal_cache import principal_cache
+from quota_ledger import quota_ledger
+from rate_limiter import rate_limiter
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
 
@@ -269,4 +284,204 @@ async def get_user_subscription_history(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get user subscription history: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/entitlements/consistency")
+async def check_entitlement_consistency(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin_user)
+):
+    """List users whose premium_until or is_premium disagrees with their subscription"""
+    return {
+        **subscription_manager.check_entitlement_consistency(db),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.post("/entitlements/repair")
+async def repair_entitlements(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin_user)
+):
+    """Recompute premium_until and is_premium from subscriptions where they drifted"""
+    try:
+        return {
+            **subscription_manager.check_entitlement_consistency(db, fix=True),
+            "checked_at": datetime.now(timezone.utc)
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to repair entitlements: {str(e)}"
+        )
+
+@router.get("/quota-ledger")
+async def get_quota_ledger_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get reservation, commit and release counts of the generation quota ledger"""
+    return {
+        **quota_ledger.stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.post("/quota-ledger/reconcile")
+async def reconcile_quota_ledger(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Rebuild quota ledgers from the last 24h of usage_stats"""
+    try:
+        return {
+            **await quota_ledger.reconcile_async(),
+            "checked_at": datetime.now(timezone.utc)
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reconcile quota ledger: {str(e)}"
+        )
+
+@router.get("/generation-cache")
+async def get_generation_cache_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get hit/miss counters for the repurpose generation cache and long-input chunk digests"""
+    return {
+        **generation_cache.stats(),
+        "long_content": long_content_counters,
+        "compression": compression_stats(),
+    }
+
+@router.get("/output-repair")
+async def get_output_repair_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get validator and targeted-repair counters for generated threads, carousels and posts"""
+    return {
+        **repair_stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/combined-generation")
+async def get_combined_generation_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get parse/fallback counters for single-call multi-platform generation"""
+    return {
+        **combined_stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/offline-generation")
+async def get_offline_generation_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get how often platforms were built by the local generator (instant mode vs LLM outage fallback)"""
+    return {
+        **offline_stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/llm-client")
+async def get_llm_client_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get connection pool usage (in use / idle), pool wait times and settings of the LLM provider client"""
+    return {
+        **llm_client.stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/principal-cache")
+async def get_principal_cache_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get hit rate and invalidations of the authenticated-principal cache"""
+    return {
+        **principal_cache.stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/rate-limiter")
+async def get_rate_limiter_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get allowed/limited counts, backend and tracked keys of the request rate limiter"""
+    return {
+        **rate_limiter.stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/url-cache")
+async def get_url_cache_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get fresh-hit / 304-revalidation / refetch counters for the URL content cache"""
+    return url_fetcher.cache.stats()
+
+@router.post("/generation-cache/purge")
+async def purge_generation_cache(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin_user)
+):
+    """Drop the in-process tier and delete expired DB cache rows"""
+    try:
+        generation_cache.clear_memory()
+        deleted = generation_cache.purge_expired(db)
+        return {"purged_db_entries": deleted, "purged_at": datetime.now(timezone.utc)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to purge generation cache: {str(e)}"
+        )
+
+@router.get("/model-health")
+async def get_model_health(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get circuit breaker state, health score and latency percentiles per LLM model"""
+    return {
+        "models": model_health.snapshot(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.post("/model-health/{model_name}/reset")
+async def reset_model_circuit(
+    model_name: str,
+    admin_user: User = Depends(is_admin_user)
+):
+    """Force a model's circuit breaker back to closed"""
+    model_health.reset(model_name)
+    return {
+        "model": model_name,
+        "state": "closed",
+        "reset_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/job-queue")
+async def get_job_queue_stats(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get job counts per status and the age of the oldest queued job"""
+    return {
+        **job_queue.stats(db),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get per-model upstream concurrency, token bucket, queue depth and wait times"""
+    return {
+        **llm_scheduler.stats(),
+        "checked_at": datetime.now(timezone.utc)
+    }
+
+@router.get("/request-coalescing")
+async def get_request_coalescing_stats(
+    admin_user: User = Depends(is_admin_user)
+):
+    """Get how many /repurpose requests were served by an identical in-flight generation"""
+    return request_coalescer.stats()
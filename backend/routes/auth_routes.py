@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from pydantic import EmailStr
 from typing import Optional
@@ -9,11 +11,11 @@ import re
 import os
 import requests
 
-from database import get_db
+from database import get_db, get_async_db
 from auth import (
-    authenticate_user, create_access_token, create_refresh_token,
-    get_current_user, get_current_active_user, create_user,
-    get_user_by_email, get_user_by_username, verify_token,
+    authenticate_user, authenticate_user_async, create_access_token, create_refresh_token,
+    get_current_user, get_current_active_user, get_current_active_user_async, create_user,
+    get_user_by_email, get_user_by_email_async, get_user_by_username, verify_token,
     ACCESS_TOKEN_EXPIRE_MINUTES, verify_google_token, create_google_user,
     get_user_by_google_id, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET
 )
@@ -497,9 +499,9 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
         )
 
 @auth_router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Login user"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -546,7 +548,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     )
 
 @auth_router.post("/refresh", response_model=dict)
-async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db)):
+async def refresh_token(token_data: TokenRefresh, db: AsyncSession = Depends(get_async_db)):
     """Refresh access token"""
     email = verify_token(token_data.refresh_token, "refresh")
     if not email:
@@ -555,7 +557,7 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
             detail="Invalid refresh token"
         )
     
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email_async(db, email)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -573,7 +575,7 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
     }
 
 @auth_router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_active_user_async)):
     """Get current user information"""
     return UserResponse(
         id=current_user.id,
@@ -662,50 +664,38 @@ async def update_profile(
 
 @auth_router.get("/usage-stats")
 async def get_usage_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        from models import UsageStats, ContentGeneration
+        from models import ContentGeneration
         from datetime import datetime, timedelta, timezone
         import sqlalchemy
         
         # Get current time in UTC
         now_utc = datetime.now(timezone.utc)
         thirty_days_ago = now_utc - timedelta(days=30)
-        twenty_four_hours_ago = now_utc - timedelta(hours=24)
         
         # Helper to handle potential naive/aware comparison issues
-        def get_count_robust(query, date_limit):
+        async def get_count_robust(query, date_limit):
             try:
-                return query.filter(ContentGeneration.created_at >= date_limit).count()
+                return await db.scalar(query.where(ContentGeneration.created_at >= date_limit))
             except sqlalchemy.exc.StatementError:
                 # If it fails due to timezone mismatch, try naive
-                return query.filter(ContentGeneration.created_at >= date_limit.replace(tzinfo=None)).count()
-
-        def get_usage_robust(query, date_limit):
-            try:
-                return query.filter(UsageStats.created_at >= date_limit).count()
-            except sqlalchemy.exc.StatementError:
-                return query.filter(UsageStats.created_at >= date_limit.replace(tzinfo=None)).count()
+                await db.rollback()
+                return await db.scalar(query.where(ContentGeneration.created_at >= date_limit.replace(tzinfo=None)))
         
-        total_generations = db.query(ContentGeneration).filter(
-            ContentGeneration.user_id == current_user.id
-        ).count()
-        
-        recent_generations_query = db.query(ContentGeneration).filter(
+        generations_query = select(func.count(ContentGeneration.id)).where(
             ContentGeneration.user_id == current_user.id
         )
-        recent_generations = get_count_robust(recent_generations_query, thirty_days_ago)
+        total_generations = await db.scalar(generations_query)
+        recent_generations = await get_count_robust(generations_query, thirty_days_ago)
         
         # Rate limit info - 24 hour window
         rate_limit = 20 if current_user.is_premium else 2
         
-        recent_usage_query = db.query(UsageStats).filter(
-            UsageStats.user_id == current_user.id,
-            UsageStats.action == "generate"
-        )
-        recent_usage = get_usage_robust(recent_usage_query, twenty_four_hours_ago)
+        from quota_ledger import quota_ledger
+        recent_usage = await db.run_sync(quota_ledger.used, current_user.id)
         remaining_requests = max(0, rate_limit - recent_usage)
         
         return {
@@ -722,17 +712,17 @@ async def get_usage_stats(
 
 @auth_router.get("/feature-limits")
 async def get_feature_limits(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's feature limits and capabilities"""
     feature_gate = get_feature_gate(current_user)
-    return feature_gate.get_feature_limits(db)
+    return await db.run_sync(feature_gate.get_feature_limits)
 
 @auth_router.get("/upgrade-prompt/{feature}")
 async def get_upgrade_prompt(
     feature: str,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Get upgrade prompt for specific feature"""
     feature_gate = get_feature_gate(current_user)
@@ -740,7 +730,7 @@ async def get_upgrade_prompt(
 
 @auth_router.get("/preferences", response_model=UserPreferencesResponse)
 async def get_user_preferences(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Get user preferences"""
     return UserPreferencesResponse(
@@ -0,0 +1,479 @@
+"""
+Bulk Repurpose Routes
+Accepts up to 50 texts or URLs as one job, processes them in the background
+with bounded concurrency and exposes progress and partial results for polling.
+A job is leased by the process running it; if that process dies, another
+one resumes the job's unfinished items once the lease expires.
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, HttpUrl
+from typing import Optional, List, Dict
+from sqlalchemy import inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+
+from database import get_db, engine, AsyncSessionLocal
+from auth import get_current_active_user
+from models import User, BulkJob, BulkJobItem
+from feature_gates import get_feature_gate
+from quota_ledger import quota_ledger
+from combined_generation import resolve_generation_mode
+
+from routes.snippetstream_routes import (
+    ContentRequest,
+    prepare_content,
+    resolve_platforms,
+    generate_platforms,
+    save_generation,
+)
+
+bulk_router = APIRouter()
+
+# Items processed at once per job; each item fans out one LLM call per platform
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "3"))
+
+# A running job holds a lease that its heartbeat extends; once it lapses
+# (the process died), the recovery task resumes the job's unfinished items
+BULK_LEASE_SECONDS = int(os.getenv("BULK_LEASE_SECONDS", "180"))
+BULK_RECOVERY_INTERVAL_SECONDS = int(os.getenv("BULK_RECOVERY_INTERVAL_SECONDS", "60"))
+BULK_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Columns added to bulk_jobs after it was first created
+BULK_JOB_MIGRATIONS = {
+    "skipped_items": "INTEGER DEFAULT 0",
+    "bypass_cache": "BOOLEAN DEFAULT FALSE",
+    "generation_mode": "VARCHAR",
+    "locked_by": "VARCHAR",
+    "locked_until": "TIMESTAMP WITH TIME ZONE",
+}
+
+# Keep references so running jobs aren't garbage collected
+bulk_tasks = set()
+
+
+# ----------------------------------------------------
+# Request + Response Models
+# ----------------------------------------------------
+class BulkItemRequest(BaseModel):
+    content: Optional[str] = None
+    url: Optional[HttpUrl] = None
+
+
+class BulkRepurposeRequest(BaseModel):
+    items: List[BulkItemRequest]
+    context: Optional[Dict] = None
+    enabled_platforms: Optional[List[str]] = ["twitter", "linkedin", "instagram"]
+    bypass_cache: bool = False
+    generation_mode: Optional[str] = None  # "fanout" or "combined"; defaults per tier
+
+
+class BulkJobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
+    total_items: int
+
+
+# ----------------------------------------------------
+# Background Processing
+# ----------------------------------------------------
+async def load_bulk_item(item_pk: int, user_id: int):
+    """Mark an item running and return (item, user); the session is closed before generating"""
+    async with AsyncSessionLocal() as db:
+        item = await db.get(BulkJobItem, item_pk)
+        user = await db.get(User, user_id)
+        item.status = "running"
+        await db.commit()
+        return item, user
+
+
+def finish_bulk_item(
+    db: Session, item_pk: int, job_pk: int, counter, status: str,
+    error: Optional[str] = None, processing_time: Optional[float] = None, saved: Optional[Dict] = None,
+) -> bool:
+    """
+    Record an item's outcome, and its generation when saved is given, in one
+    transaction. False (and nothing written) if this process no longer holds
+    the job's lease, since whoever took it over redoes the item.
+    """
+    try:
+        generation_id = None
+        if saved is not None:
+            generation = save_generation(db, **saved, commit=False)
+            if generation is None:
+                raise Exception("Failed to save generation")
+            generation_id = generation.id
+
+        owned = db.query(BulkJob).filter(
+            BulkJob.id == job_pk,
+            BulkJob.locked_by == BULK_WORKER_ID,
+        ).update({counter: counter + 1}, synchronize_session=False)
+        if not owned:
+            db.rollback()
+            print(f"⚠️ Bulk job {job_pk} was taken over, discarding item {item_pk}")
+            return False
+
+        db.query(BulkJobItem).filter(BulkJobItem.id == item_pk).update(
+            {
+                BulkJobItem.status: status,
+                BulkJobItem.error: error,
+                BulkJobItem.generation_id: generation_id,
+                BulkJobItem.processing_time: processing_time,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+
+
+async def process_bulk_item(
+    item_pk: int, job_pk: int, job_id: str, user_id: int, platforms: List[str],
+    context: Optional[Dict], bypass_cache: bool, generation_mode: Optional[str] = None,
+):
+    """
+    Generate one item; quota is charged only when it finishes. Database work
+    goes through short AsyncSessions, none of them held across LLM calls.
+    """
+    item, user = await load_bulk_item(item_pk, user_id)
+
+    start_time = time.time()
+    request = ContentRequest(
+        content=item.input if item.source == "text" else None,
+        url=item.input if item.source == "url" else None,
+        context=context,
+        enabled_platforms=platforms,
+        bypass_cache=bypass_cache,
+    )
+
+    reservation = None
+    try:
+        try:
+            feature_gate = get_feature_gate(user)
+            content, source, reservation = await prepare_content(request, feature_gate)
+            metrics = {"bulk_job_id": job_id}
+            outputs, cached_platforms = await generate_platforms(
+                content, context, platforms, bypass_cache=bypass_cache, metrics=metrics,
+                mode=resolve_generation_mode(generation_mode, feature_gate.get_tier()),
+            )
+            processing_time = time.time() - start_time
+
+            saved = dict(
+                user_id=user_id, content=content, source=source, outputs=outputs, context=context,
+                processing_time=processing_time, cached_platforms=cached_platforms,
+                usage_extra=metrics, reservation=reservation,
+            )
+            outcome = ("completed", BulkJob.completed_items, None, processing_time, saved)
+
+        except HTTPException as e:
+            # 429 means the daily limit ran out mid-job; the rest are skipped, not failed
+            if e.status_code == 429:
+                outcome = ("skipped", BulkJob.skipped_items, str(e.detail), None, None)
+            else:
+                outcome = ("failed", BulkJob.failed_items, str(e.detail), None, None)
+        except Exception as e:
+            print(f"❌ Bulk item {item_pk} failed: {e}")
+            outcome = ("failed", BulkJob.failed_items, str(e) or type(e).__name__, None, None)
+
+        status, counter, error, processing_time, saved = outcome
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.run_sync(finish_bulk_item, item_pk, job_pk, counter, status, error, processing_time, saved)
+            except Exception as e:
+                print(f"❌ Bulk item {item_pk} failed: {e}")
+                await db.run_sync(finish_bulk_item, item_pk, job_pk, BulkJob.failed_items, "failed", str(e) or type(e).__name__)
+    finally:
+        # Failed items give their reserved generation back
+        await quota_ledger.release_async(reservation)
+
+
+async def extend_bulk_lease(job_pk: int) -> bool:
+    """Push the job's lease forward; False if another process has taken it over"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_pk, BulkJob.locked_by == BULK_WORKER_ID)
+            .values(locked_until=datetime.now(timezone.utc) + timedelta(seconds=BULK_LEASE_SECONDS))
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+async def bulk_lease_heartbeat(job_pk: int, job_task: asyncio.Task):
+    while True:
+        await asyncio.sleep(max(1, BULK_LEASE_SECONDS // 3))
+        try:
+            if not await extend_bulk_lease(job_pk):
+                print(f"⚠️ Lost lease on bulk job {job_pk}, cancelling it")
+                job_task.cancel()
+                return
+        except Exception as e:
+            print(f"⚠️ Bulk lease heartbeat failed for job {job_pk}: {e}")
+
+
+async def run_bulk_job(job_pk: int):
+    """Process every pending item of a job this process holds the lease on, with bounded concurrency"""
+    heartbeat = asyncio.create_task(bulk_lease_heartbeat(job_pk, asyncio.current_task()))
+    try:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BulkJob, job_pk)
+            job.status = "running"
+            item_ids = list((await db.execute(
+                select(BulkJobItem.id)
+                .where(BulkJobItem.bulk_job_id == job_pk, BulkJobItem.status == "pending")
+                .order_by(BulkJobItem.position)
+            )).scalars())
+            await db.commit()
+
+        platforms = json.loads(job.enabled_platforms)
+        context = json.loads(job.context) if job.context else None
+
+        print(f"📦 Running bulk job {job.job_id}: {len(item_ids)} items, concurrency {BULK_CONCURRENCY}")
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def bounded(item_pk: int):
+            async with semaphore:
+                await process_bulk_item(
+                    item_pk, job_pk, job.job_id, job.user_id, platforms, context,
+                    bool(job.bypass_cache), job.generation_mode,
+                )
+
+        await asyncio.gather(*(bounded(item_pk) for item_pk in item_ids))
+        await finish_bulk_job(job_pk, "completed")
+
+    except asyncio.CancelledError:
+        # Lease lost or shutting down; the lease expires and the job is resumed
+        print(f"🛑 Bulk job {job_pk} stopped before finishing")
+        raise
+    except Exception as e:
+        print(f"❌ Bulk job {job_pk} failed: {e}")
+        await finish_bulk_job(job_pk, "failed")
+    finally:
+        heartbeat.cancel()
+
+
+async def finish_bulk_job(job_pk: int, status: str):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_pk, BulkJob.locked_by == BULK_WORKER_ID)
+            .values(status=status, finished_at=datetime.now(timezone.utc), locked_by=None, locked_until=None)
+        )
+        await db.commit()
+        job = await db.get(BulkJob, job_pk)
+        if result.rowcount and status == "completed":
+            print(
+                f"✅ Bulk job {job.job_id} finished: {job.completed_items} completed, "
+                f"{job.failed_items} failed, {job.skipped_items or 0} skipped"
+            )
+
+
+def start_bulk_job(job_pk: int):
+    task = asyncio.create_task(run_bulk_job(job_pk))
+    bulk_tasks.add(task)
+    task.add_done_callback(bulk_tasks.discard)
+
+
+async def resume_stale_bulk_jobs() -> int:
+    """
+    Take over jobs whose process died (their lease expired while queued or
+    running) and run their unfinished items again. Items caught mid-generation
+    go back to pending; the ones already recorded are kept.
+    """
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        stale = list((await db.execute(
+            select(BulkJob.id).where(
+                BulkJob.status.in_(("queued", "running")),
+                or_(BulkJob.locked_until.is_(None), BulkJob.locked_until < now),
+            )
+        )).scalars())
+
+        resumed = []
+        for job_pk in stale:
+            # Conditional on the lease still being stale, so only one process wins
+            taken = await db.execute(
+                update(BulkJob)
+                .where(
+                    BulkJob.id == job_pk,
+                    BulkJob.status.in_(("queued", "running")),
+                    or_(BulkJob.locked_until.is_(None), BulkJob.locked_until < now),
+                )
+                .values(locked_by=BULK_WORKER_ID, locked_until=now + timedelta(seconds=BULK_LEASE_SECONDS))
+            )
+            if taken.rowcount:
+                await db.execute(
+                    update(BulkJobItem)
+                    .where(BulkJobItem.bulk_job_id == job_pk, BulkJobItem.status == "running")
+                    .values(status="pending")
+                )
+                resumed.append(job_pk)
+            await db.commit()
+
+    for job_pk in resumed:
+        print(f"♻️ Resuming bulk job {job_pk} after its lease expired")
+        start_bulk_job(job_pk)
+    return len(resumed)
+
+
+async def bulk_recovery_background_task():
+    """Periodically resume bulk jobs left behind by a restarted or crashed process"""
+    while True:
+        try:
+            await resume_stale_bulk_jobs()
+        except Exception as e:
+            print(f"❌ Error resuming bulk jobs: {e}")
+        await asyncio.sleep(BULK_RECOVERY_INTERVAL_SECONDS)
+
+
+def migrate_bulk_jobs():
+    """Add bulk_jobs columns that databases created before them are missing"""
+    existing = {c["name"] for c in inspect(engine).get_columns("bulk_jobs")}
+    for column, ddl in BULK_JOB_MIGRATIONS.items():
+        if column not in existing:
+            print(f"🚀 Adding '{column}' column to 'bulk_jobs'...")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE bulk_jobs ADD COLUMN {column} {ddl}"))
+
+
+# ----------------------------------------------------
+# Endpoints
+# ----------------------------------------------------
+@bulk_router.post("/bulk/repurpose", response_model=BulkJobCreatedResponse)
+async def create_bulk_job(
+    request: BulkRepurposeRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Queue a bulk repurpose job and return its id for polling"""
+    feature_gate = get_feature_gate(current_user)
+
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+
+    if not feature_gate.can_bulk_process(len(request.items)):
+        max_items = feature_gate.get_feature_limits(db)["max_bulk_items"]
+        raise HTTPException(
+            status_code=403,
+            detail=f"{feature_gate.get_upgrade_prompt('bulk_processing')['message']} (max {max_items} items)"
+        )
+
+    platforms = resolve_platforms(request.enabled_platforms)
+    if not platforms:
+        raise HTTPException(status_code=400, detail="At least one platform must be selected")
+
+    for index, item in enumerate(request.items):
+        if not item.content and not item.url:
+            raise HTTPException(status_code=400, detail=f"Item {index} needs content or a URL")
+        if item.url and not feature_gate.can_process_urls():
+            raise HTTPException(status_code=403, detail="URL processing is Pro feature")
+
+    if not feature_gate.can_generate_content(db):
+        raise HTTPException(status_code=429, detail="Daily generation limit reached")
+
+    job = BulkJob(
+        job_id=f"bulk_{uuid.uuid4().hex[:12]}",
+        user_id=current_user.id,
+        status="queued",
+        total_items=len(request.items),
+        enabled_platforms=json.dumps(platforms),
+        context=json.dumps(request.context) if request.context else None,
+        bypass_cache=request.bypass_cache,
+        generation_mode=request.generation_mode,
+        locked_by=BULK_WORKER_ID,
+        locked_until=datetime.now(timezone.utc) + timedelta(seconds=BULK_LEASE_SECONDS),
+    )
+    db.add(job)
+    db.flush()
+
+    for position, item in enumerate(request.items):
+        db.add(BulkJobItem(
+            bulk_job_id=job.id,
+            position=position,
+            source="url" if item.url else "text",
+            input=str(item.url) if item.url else item.content,
+            status="pending",
+        ))
+    db.commit()
+
+    start_bulk_job(job.id)
+
+    return BulkJobCreatedResponse(job_id=job.job_id, status=job.status, total_items=job.total_items)
+
+
+def serialize_bulk_job(job: BulkJob, include_items: bool = True) -> Dict:
+    finished = (job.completed_items or 0) + (job.failed_items or 0) + (job.skipped_items or 0)
+    result = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "completed_items": job.completed_items or 0,
+        "failed_items": job.failed_items or 0,
+        "skipped_items": job.skipped_items or 0,  # Daily limit ran out, not an error
+        "progress": round(finished / job.total_items, 3) if job.total_items else 1.0,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if not include_items:
+        return result
+
+    items = []
+    for item in job.items:
+        entry = {
+            "position": item.position,
+            "source": item.source,
+            "status": item.status,
+            "error": item.error,
+            "processing_time": item.processing_time,
+            "generation_id": item.generation_id,
+        }
+        # Partial results: completed items carry their output while the job runs
+        if item.status == "completed" and item.generation:
+            entry["result"] = {
+                "twitter_thread": json.loads(item.generation.twitter_thread or "[]"),
+                "linkedin_post": item.generation.linkedin_post or "",
+                "instagram_carousel": json.loads(item.generation.instagram_carousel or "[]"),
+            }
+        items.append(entry)
+    result["items"] = items
+    return result
+
+
+@bulk_router.get("/bulk/{job_id}")
+async def get_bulk_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Poll a bulk job for progress and the results finished so far"""
+    job = db.query(BulkJob).filter(
+        BulkJob.job_id == job_id,
+        BulkJob.user_id == current_user.id
+    ).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+
+    return serialize_bulk_job(job)
+
+
+@bulk_router.get("/bulk")
+async def list_bulk_jobs(
+    limit: int = 20,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """List the user's recent bulk jobs without item details"""
+    jobs = db.query(BulkJob).filter(
+        BulkJob.user_id == current_user.id
+    ).order_by(BulkJob.created_at.desc()).limit(min(limit, 100)).all()
+
+    return [serialize_bulk_job(job, include_items=False) for job in jobs]
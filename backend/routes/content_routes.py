@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import json
 
-from database import get_db
-from auth import get_current_active_user, check_rate_limit
+from database import get_db, get_async_db
+from auth import get_current_active_user, get_current_active_user_async, check_rate_limit
 from models import User, ContentGeneration, SavedContent, UsageStats
 
 content_router = APIRouter()
@@ -47,8 +49,8 @@ class UpdateSavedContentRequest(BaseModel):
 @content_router.post("/save", response_model=SavedContentResponse)
 async def save_content(
     request: SaveContentRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Save generated content for later use"""
     from feature_gates import get_feature_gate
@@ -71,8 +73,8 @@ async def save_content(
         )
         
         db.add(saved_content)
-        db.commit()
-        db.refresh(saved_content)
+        await db.commit()
+        await db.refresh(saved_content)
         
         # Track usage
         usage_stat = UsageStats(
@@ -82,7 +84,7 @@ async def save_content(
             extra_data=json.dumps({"title": request.title})
         )
         db.add(usage_stat)
-        db.commit()
+        await db.commit()
         
         return SavedContentResponse(
             id=saved_content.id,
@@ -107,8 +109,8 @@ async def get_saved_content(
     is_favorite: Optional[bool] = None,
     limit: int = 50,
     offset: int = 0,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's saved content"""
     from feature_gates import get_feature_gate
@@ -120,15 +122,16 @@ async def get_saved_content(
             status_code=403,
             detail="Saved content access is only available for premium users. Upgrade to Pro to save and access unlimited content."
         )
-    query = db.query(SavedContent).filter(SavedContent.user_id == current_user.id)
+    query = select(SavedContent).where(SavedContent.user_id == current_user.id)
     
     if content_type:
-        query = query.filter(SavedContent.content_type == content_type)
+        query = query.where(SavedContent.content_type == content_type)
     
     if is_favorite is not None:
-        query = query.filter(SavedContent.is_favorite == is_favorite)
+        query = query.where(SavedContent.is_favorite == is_favorite)
     
-    saved_content = query.order_by(SavedContent.created_at.desc()).offset(offset).limit(limit).all()
+    result = await db.execute(query.order_by(SavedContent.created_at.desc()).offset(offset).limit(limit))
+    saved_content = result.scalars().all()
     
     return [
         SavedContentResponse(
@@ -148,8 +151,8 @@ async def get_saved_content(
 async def update_saved_content(
     content_id: int,
     request: UpdateSavedContentRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update saved content"""
     from feature_gates import get_feature_gate
@@ -161,10 +164,11 @@ async def update_saved_content(
             status_code=403,
             detail="Content saving features are only available for premium users."
         )
-    saved_content = db.query(SavedContent).filter(
+    result = await db.execute(select(SavedContent).where(
         SavedContent.id == content_id,
         SavedContent.user_id == current_user.id
-    ).first()
+    ))
+    saved_content = result.scalars().first()
     
     if not saved_content:
         raise HTTPException(
@@ -181,8 +185,8 @@ async def update_saved_content(
     
     saved_content.updated_at = datetime.now(timezone.utc)
     
-    db.commit()
-    db.refresh(saved_content)
+    await db.commit()
+    await db.refresh(saved_content)
     
     return SavedContentResponse(
         id=saved_content.id,
@@ -198,8 +202,8 @@ async def update_saved_content(
 @content_router.delete("/saved/{content_id}")
 async def delete_saved_content(
     content_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete saved content"""
     from feature_gates import get_feature_gate
@@ -211,10 +215,11 @@ async def delete_saved_content(
             status_code=403,
             detail="Content saving features are only available for premium users."
         )
-    saved_content = db.query(SavedContent).filter(
+    result = await db.execute(select(SavedContent).where(
         SavedContent.id == content_id,
         SavedContent.user_id == current_user.id
-    ).first()
+    ))
+    saved_content = result.scalars().first()
     
     if not saved_content:
         raise HTTPException(
@@ -222,8 +227,8 @@ async def delete_saved_content(
             detail="Saved content not found"
         )
     
-    db.delete(saved_content)
-    db.commit()
+    await db.delete(saved_content)
+    await db.commit()
     
     return {"message": "Content deleted successfully"}
 
@@ -231,8 +236,8 @@ async def delete_saved_content(
 async def get_content_history(
     limit: int = 20,
     offset: int = 0,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's content generation history"""
     from feature_gates import get_feature_gate
@@ -242,9 +247,10 @@ async def get_content_history(
     # Use the smaller of requested limit and tier limit
     effective_limit = min(limit, tier_limit)
     
-    history = db.query(ContentGeneration).filter(
+    result = await db.execute(select(ContentGeneration).where(
         ContentGeneration.user_id == current_user.id
-    ).order_by(ContentGeneration.created_at.desc()).offset(offset).limit(effective_limit).all()
+    ).order_by(ContentGeneration.created_at.desc()).offset(offset).limit(effective_limit))
+    history = result.scalars().all()
     
     return [
         ContentHistoryResponse(
@@ -264,14 +270,15 @@ async def get_content_history(
 @content_router.get("/history/{generation_id}", response_model=ContentHistoryResponse)
 async def get_content_generation(
     generation_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get specific content generation"""
-    generation = db.query(ContentGeneration).filter(
+    result = await db.execute(select(ContentGeneration).where(
         ContentGeneration.id == generation_id,
         ContentGeneration.user_id == current_user.id
-    ).first()
+    ))
+    generation = result.scalars().first()
     
     if not generation:
         raise HTTPException(
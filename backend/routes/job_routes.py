@@ -0,0 +1,101 @@
+"""
+Generation Job Routes
+Enqueue repurpose requests onto the durable job queue and poll for results.
+Jobs are processed by start-worker.py (or the inline worker), so a web
+process restart never loses an accepted request.
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import Dict
+
+import json
+
+from database import get_db
+from auth import get_current_active_user
+from models import User, GenerationJob
+from feature_gates import get_feature_gate
+from job_queue import job_queue
+
+from routes.snippetstream_routes import ContentRequest, resolve_platforms
+
+job_router = APIRouter()
+
+
+def serialize_job(job: GenerationJob, include_result: bool = True) -> Dict:
+    result = {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts or 0,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if include_result and job.result:
+        result["generation_id"] = job.result.generation_id
+        result["processing_time"] = job.result.processing_time
+        result["result"] = json.loads(job.result.response)
+    return result
+
+
+@job_router.post("/jobs/repurpose", status_code=202)
+async def enqueue_repurpose_job(
+    request: ContentRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Queue a repurpose request; quota is checked now and charged when the job completes"""
+    feature_gate = get_feature_gate(current_user)
+
+    if not request.content and not request.url:
+        raise HTTPException(status_code=400, detail="Content or URL required")
+
+    if request.url and not feature_gate.can_process_urls():
+        raise HTTPException(status_code=403, detail="URL processing is Pro feature")
+
+    if not resolve_platforms(request.enabled_platforms):
+        raise HTTPException(status_code=400, detail="At least one platform must be selected")
+
+    if not feature_gate.can_generate_content(db):
+        raise HTTPException(status_code=429, detail="Daily generation limit reached")
+
+    payload = request.dict()
+    payload["url"] = str(request.url) if request.url else None
+
+    job = job_queue.enqueue(db, current_user.id, payload)
+    print(f"📥 Queued {job.job_id} for user {current_user.id}")
+
+    return serialize_job(job, include_result=False)
+
+
+@job_router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Poll a queued job; succeeded jobs include the full response"""
+    job = db.query(GenerationJob).filter(
+        GenerationJob.job_id == job_id,
+        GenerationJob.user_id == current_user.id
+    ).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return serialize_job(job)
+
+
+@job_router.get("/jobs")
+async def list_jobs(
+    limit: int = 20,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """List the user's recent jobs without results"""
+    jobs = db.query(GenerationJob).filter(
+        GenerationJob.user_id == current_user.id
+    ).order_by(GenerationJob.created_at.desc()).limit(min(limit, 100)).all()
+
+    return [serialize_job(job, include_result=False) for job in jobs]
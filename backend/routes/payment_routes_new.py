@@ -7,13 +7,15 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 
-from database import get_db
+from database import get_db, get_async_db
 from auth import get_current_active_user
 from models import User, Subscription, PaymentHistory
 from subscription_manager import subscription_manager
+from principal_cache import principal_cache
 
 payment_router = APIRouter()
 
@@ -533,7 +535,7 @@ async def cancel_subscription(
         subscription.updated_at = datetime.now(timezone.utc)
         
         # Downgrade user
-        current_user.is_premium = False
+        subscription_manager.sync_entitlement(current_user, subscription)
         
         # Create cancellation record
         cancellation_record = PaymentHistory(
@@ -679,7 +681,7 @@ async def get_payment_stats(
 
 # Webhook handler for Dodo Payments
 @payment_router.post("/webhook")
-async def handle_webhook(request: Request, db: Session = Depends(get_db)):
+async def handle_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Handle Dodo Payments webhooks - Primary method for subscription management"""
     
     try:
@@ -741,23 +743,11 @@ async def handle_webhook(request: Request, db: Session = Depends(get_db)):
         print(f"📦 Business ID: {business_id}")
         print(f"⏰ Timestamp: {timestamp}")
         
-        # Handle different webhook events according to Dodo documentation
-        if event_type == 'subscription.active':
-            await handle_subscription_active_webhook(event_data, db)
-        elif event_type == 'subscription.updated':
-            await handle_subscription_updated_webhook(event_data, db)
-        elif event_type == 'subscription.on_hold':
-            await handle_subscription_on_hold_webhook(event_data, db)
-        elif event_type == 'subscription.failed':
-            await handle_subscription_failed_webhook(event_data, db)
-        elif event_type == 'subscription.renewed':
-            await handle_subscription_renewed_webhook(event_data, db)
-        elif event_type == 'subscription.cancelled':
-            await handle_subscription_cancelled_webhook(event_data, db)
-        elif event_type == 'payment.succeeded':
-            await handle_payment_success_webhook(event_data, db)
-        elif event_type == 'payment.failed':
-            await handle_payment_failed_webhook(event_data, db)
+        # Handle different webhook events according to Dodo documentation;
+        # handlers run their ORM work on the async connection via run_sync
+        handler = WEBHOOK_HANDLERS.get(event_type)
+        if handler:
+            await db.run_sync(lambda session: handler(event_data, session))
         else:
             print(f"⚠️  Unhandled webhook event: {event_type}")
         
@@ -773,7 +763,7 @@ async def handle_webhook(request: Request, db: Session = Depends(get_db)):
             pass
         raise HTTPException(status_code=500, detail=f"Webhook processing failed: {str(e)}")
 
-async def handle_subscription_active_webhook(event_data: dict, db: Session):
+def handle_subscription_active_webhook(event_data: dict, db: Session):
     """
     Handle subscription.active webhook - PRIMARY method for upgrading users
     This is called when a subscription is successfully activated after payment
@@ -818,9 +808,6 @@ async def handle_subscription_active_webhook(event_data: dict, db: Session):
         
         print(f"👤 Found user: {user.username} (ID: {user.id})")
         
-        # Upgrade user to premium
-        user.is_premium = True
-        
         # Calculate period end based on normalized cycle
         period_days = 365 if billing_cycle == 'yearly' else 30
         
@@ -856,6 +843,9 @@ async def handle_subscription_active_webhook(event_data: dict, db: Session):
             db.add(subscription)
             db.flush()
         
+        # Upgrade user to premium until the period ends (plus grace)
+        subscription_manager.sync_entitlement(user, subscription)
+        
         # Create payment history record
         payment_record = PaymentHistory(
             user_id=user.id,
@@ -875,6 +865,7 @@ async def handle_subscription_active_webhook(event_data: dict, db: Session):
         
         db.add(payment_record)
         db.commit()
+        principal_cache.invalidate(user.email, db)
         db.refresh(user)
         
         print(f"✅ User {user.email} upgraded to premium via webhook!")
@@ -885,7 +876,7 @@ async def handle_subscription_active_webhook(event_data: dict, db: Session):
         print(f"❌ Error processing subscription.active webhook: {e}")
         db.rollback()
 
-async def handle_subscription_updated_webhook(event_data: dict, db: Session):
+def handle_subscription_updated_webhook(event_data: dict, db: Session):
     """Handle subscription.updated webhook"""
     
     try:
@@ -912,14 +903,16 @@ async def handle_subscription_updated_webhook(event_data: dict, db: Session):
             # Update subscription with new data - use custom serializer
             subscription.extra_metadata = json.dumps(serialize_webhook_data(event_data))
             subscription.updated_at = datetime.now(timezone.utc)
+            subscription_manager.sync_entitlement(user, subscription)
             db.commit()
+            principal_cache.invalidate(user.email, db)
             print(f"✅ Subscription updated for {user.email}")
         
     except Exception as e:
         print(f"❌ Error processing subscription.updated webhook: {e}")
         db.rollback()
 
-async def handle_subscription_on_hold_webhook(event_data: dict, db: Session):
+def handle_subscription_on_hold_webhook(event_data: dict, db: Session):
     """Handle subscription.on_hold webhook"""
     
     try:
@@ -945,17 +938,18 @@ async def handle_subscription_on_hold_webhook(event_data: dict, db: Session):
             subscription.status = "on_hold"
             subscription.updated_at = datetime.now(timezone.utc)
             
-            # Optionally downgrade user (or keep premium until resolved)
-            # user.is_premium = False  # Uncomment if you want to immediately revoke access
+            # Only active subscriptions grant access, so this revokes premium until resolved
+            subscription_manager.sync_entitlement(user, subscription)
             
             db.commit()
+            principal_cache.invalidate(user.email, db)
             print(f"⏸️  Subscription on hold for {user.email}")
         
     except Exception as e:
         print(f"❌ Error processing subscription.on_hold webhook: {e}")
         db.rollback()
 
-async def handle_subscription_failed_webhook(event_data: dict, db: Session):
+def handle_subscription_failed_webhook(event_data: dict, db: Session):
     """Handle subscription.failed webhook"""
     
     try:
@@ -982,16 +976,17 @@ async def handle_subscription_failed_webhook(event_data: dict, db: Session):
             subscription.updated_at = datetime.now(timezone.utc)
             
             # Downgrade user
-            user.is_premium = False
+            subscription_manager.sync_entitlement(user, subscription)
             
             db.commit()
+            principal_cache.invalidate(user.email, db)
             print(f"❌ Subscription failed for {user.email} - downgraded to free")
         
     except Exception as e:
         print(f"❌ Error processing subscription.failed webhook: {e}")
         db.rollback()
 
-async def handle_subscription_renewed_webhook(event_data: dict, db: Session):
+def handle_subscription_renewed_webhook(event_data: dict, db: Session):
     """Handle subscription.renewed webhook"""
     
     try:
@@ -1028,8 +1023,8 @@ async def handle_subscription_renewed_webhook(event_data: dict, db: Session):
             subscription.current_period_end = datetime.now(timezone.utc) + timedelta(days=30 if subscription.billing_cycle == "monthly" else 365)
             subscription.updated_at = datetime.now(timezone.utc)
             
-            # Ensure user is premium
-            user.is_premium = True
+            # Extend premium access to the new period
+            subscription_manager.sync_entitlement(user, subscription)
             
             # Create payment history record for renewal
             payment_record = PaymentHistory(
@@ -1050,13 +1045,14 @@ async def handle_subscription_renewed_webhook(event_data: dict, db: Session):
             
             db.add(payment_record)
             db.commit()
+            principal_cache.invalidate(user.email, db)
             print(f"🔄 Subscription renewed for {user.email}")
         
     except Exception as e:
         print(f"❌ Error processing subscription.renewed webhook: {e}")
         db.rollback()
 
-async def handle_subscription_cancelled_webhook(event_data: dict, db: Session):
+def handle_subscription_cancelled_webhook(event_data: dict, db: Session):
     """Handle subscription.cancelled webhook"""
     
     try:
@@ -1083,16 +1079,17 @@ async def handle_subscription_cancelled_webhook(event_data: dict, db: Session):
             subscription.updated_at = datetime.now(timezone.utc)
             
             # Downgrade user
-            user.is_premium = False
+            subscription_manager.sync_entitlement(user, subscription)
             
             db.commit()
+            principal_cache.invalidate(user.email, db)
             print(f"❌ Subscription cancelled for {user.email} - downgraded to free")
         
     except Exception as e:
         print(f"❌ Error processing subscription.cancelled webhook: {e}")
         db.rollback()
 
-async def handle_payment_failed_webhook(event_data: dict, db: Session):
+def handle_payment_failed_webhook(event_data: dict, db: Session):
     """Handle payment.failed webhook"""
     
     try:
@@ -1125,7 +1122,7 @@ async def handle_payment_failed_webhook(event_data: dict, db: Session):
         print(f"❌ Error processing payment.failed webhook: {e}")
         db.rollback()
 
-async def handle_payment_success_webhook(event_data: dict, db: Session):
+def handle_payment_success_webhook(event_data: dict, db: Session):
     """Handle payment.succeeded webhook - for individual payments"""
     
     try:
@@ -1170,4 +1167,16 @@ async def handle_payment_success_webhook(event_data: dict, db: Session):
         
     except Exception as e:
         print(f"❌ Payment success webhook error: {e}")
-        db.rollback()
\ No newline at end of file
+        db.rollback()
+
+# Webhook event type -> handler (sync; run on the request's AsyncSession via run_sync)
+WEBHOOK_HANDLERS = {
+    'subscription.active': handle_subscription_active_webhook,
+    'subscription.updated': handle_subscription_updated_webhook,
+    'subscription.on_hold': handle_subscription_on_hold_webhook,
+    'subscription.failed': handle_subscription_failed_webhook,
+    'subscription.renewed': handle_subscription_renewed_webhook,
+    'subscription.cancelled': handle_subscription_cancelled_webhook,
+    'payment.succeeded': handle_payment_success_webhook,
+    'payment.failed': handle_payment_failed_webhook,
+}
@@ -1,23 +1,37 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import os
 import re
 import json
 import time
-import requests
-import httpx
+from datetime import datetime, timezone
 
 from dotenv import load_dotenv
-from openai import OpenAI, AsyncOpenAI
 import asyncio
 
-from database import get_db
-from auth import get_current_active_user
-from models import User, ContentGeneration, UsageStats
+from database import get_db, get_async_db, AsyncSessionLocal
+from auth import get_current_active_user, get_current_active_user_async
+from models import User, ContentGeneration, UsageStats, GenerationPlatformStatus, GenerationSource, GenerationVariant
 from feature_gates import get_feature_gate
+from quota_ledger import QuotaReservation, quota_ledger
+from generation_cache import generation_cache, make_cache_key
+from model_health import model_health
+from llm_scheduler import llm_scheduler, bind_llm_principal
+from llm_client import llm_client
+from request_coalescer import request_coalescer, make_request_key
+from url_fetcher import url_fetcher
+from content_extractor import extract_main_text_async, get_executor
+from long_content import LONG_CONTENT_THRESHOLD, condense_long_content, truncate_at_boundary
+from text_compressor import COMPRESSION_ENABLED, COMPRESSION_TOKEN_BUDGET, compress_text, record_compression
+from output_repair import repair_thread, repair_carousel, repair_post
+from offline_generator import OFFLINE_FALLBACK_ENABLED, generate_offline
+from combined_generation import COMBINED_MAX_TOKENS, build_combined_messages, parse_combined_reply, resolve_generation_mode
 
 from utils import (
     clean_twitter_thread,
@@ -45,6 +59,9 @@ class ContentRequest(BaseModel):
     screen_resolution: Optional[str] = None
     context: Optional[Dict] = None
     enabled_platforms: Optional[List[str]] = ["twitter", "linkedin", "instagram"]
+    bypass_cache: bool = False
+    generation_mode: Optional[str] = None  # "fanout", "combined" or "instant"; defaults per tier
+    variants: Optional[Dict[str, int]] = None  # Alternatives per platform, e.g. {"twitter": 3}
 
 
 class SocialMediaResponse(BaseModel):
@@ -52,112 +69,259 @@ class SocialMediaResponse(BaseModel):
     linkedin_post: str
     instagram_carousel: List[str]
     original_content_preview: str
+    cached_platforms: List[str] = []
+    coalesced: bool = False  # Served from an identical request already in flight
+    pending_platforms: List[str] = []  # Still generating; fetch later via GET /repurpose/{generation_id}
+    generation_id: Optional[int] = None
+    offline_platforms: List[str] = []  # Built by the local generator (instant mode or LLM outage)
+    variants: Dict[str, list] = {}  # {platform: [output, ...]} when alternatives were requested; [0] is the main output
+
+
+# Bump whenever a system prompt changes so cached generations are not reused
+PROMPT_VERSION = "2"
 
 
 # ----------------------------------------------------
-# Pollinations Client Setup
+# Async Safe Completion Wrapper
 # ----------------------------------------------------
-client = None
+# Preferred order on cold start; at runtime models are ranked by health score
+# and models behind an open circuit breaker are skipped
+MODELS_TO_TRY = ["mistral", "openai", "searchgpt"]
 
+# Hedging: "off" tries models one after another, "delayed" launches the next
+# model once the running one exceeds its observed p95 (or the default delay),
+# "eager" races the first two models from the start.
+LLM_HEDGE_MODE = os.getenv("LLM_HEDGE_MODE", "delayed").lower()
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "8"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
 
-async_client = None
 
+class SlotGrant:
+    """Set by attempt_completion once the scheduler hands its call a slot"""
 
-def initialize_client():
-    global client, async_client
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.at: Optional[float] = None
 
-    if client is None:
-        print("🔧 Initializing Pollinations Client...")
-        api_key = os.getenv("POLLINATIONS_API_KEY")
-        if not api_key:
-            raise Exception("❌ POLLINATIONS_API_KEY missing in environment")
+    def set(self):
+        self.at = time.monotonic()
+        self.event.set()
 
-        http_client = httpx.Client(timeout=60, verify=False)
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://gen.pollinations.ai/v1",
-            http_client=http_client
-        )
-        
-        # Async client for parallel requests
-        async_http_client = httpx.AsyncClient(timeout=60, verify=False)
-        async_client = AsyncOpenAI(
-            api_key=api_key,
-            base_url="https://gen.pollinations.ai/v1",
-            http_client=async_http_client
-        )
 
-        print("✅ Connected to Pollinations API (Sync + Async)")
+async def attempt_completion(model_name, messages, max_tokens=2000, granted: Optional[SlotGrant] = None) -> Optional[str]:
+    """Single call against one model; returns stripped content or None"""
+    started = None
+    try:
+        async with llm_scheduler.slot(model_name, max_tokens):
+            # Time spent queued for a slot isn't the model's latency
+            started = time.monotonic()
+            if granted is not None:
+                granted.set()
+            response = await llm_client.get().chat.completions.create(
+                model=model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.7,
+            )
 
+        content = response.choices[0].message.content if response.choices else None
+        if not content:
+            print(f"⚠️ Model {model_name} returned EMPTY content.")
+            model_health.record_failure(model_name, time.monotonic() - started)
+            return None
 
-# ----------------------------------------------------
-# Async Safe Completion Wrapper
-# ----------------------------------------------------
-async def safe_completion_async(messages, max_tokens=2000):
-    global async_client
-    if async_client is None:
-        initialize_client()
-
-    # Prioritize Mistral for speed and reliability
-    models_to_try = ["mistral", "openai", "searchgpt"]
-    
-    for model_name in models_to_try:
-        for attempt in range(2): 
-            try:
-                response = await async_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                )
+        model_health.record_success(model_name, time.monotonic() - started)
+        print(f"✅ Generated content using {model_name}")
+        return content.strip()
 
-                if not response.choices:
-                    continue
+    except asyncio.CancelledError:
+        # Only time after the slot was granted says anything about the model
+        model_health.record_cancelled(model_name, time.monotonic() - started if started is not None else None)
+        raise
+    except Exception as e:
+        print(f"❌ Pollinations {model_name} failed: {str(e)}")
+        model_health.record_failure(model_name, time.monotonic() - started if started is not None else None)
+        return None
+
+
+def hedge_delay_for(model_name) -> float:
+    """Wait this long on a model before racing the next one"""
+    p95 = model_health.latency_percentile(model_name, 0.95)
+    if p95 is None:
+        return LLM_HEDGE_DELAY_SECONDS
+    return max(LLM_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+async def sequential_completion(messages, max_tokens=2000) -> Optional[str]:
+    for model_name in model_health.rank_models(MODELS_TO_TRY):
+        for attempt in range(2):
+            if not model_health.allow_request(model_name):
+                break
+            result = await attempt_completion(model_name, messages, max_tokens)
+            if result:
+                return result
+            await asyncio.sleep(0.5)
+    return None
 
-                content = response.choices[0].message.content
 
-                if not content:
-                    print(f"⚠️ Model {model_name} (attempt {attempt+1}) returned EMPTY content.")
-                    continue
+async def hedged_completion(messages, max_tokens=2000) -> Optional[str]:
+    """Race models, launching the next one whenever the current one is slow or fails"""
+    # Same two-attempts-per-model budget as sequential
+    candidates = model_health.rank_models(MODELS_TO_TRY) * 2
+    in_flight = {}
+    grants = {}
+    next_index = 0
+    last_launched = None
+    last_task = None
+
+    def launch():
+        """Start the next candidate whose circuit lets a call through"""
+        nonlocal next_index, last_launched, last_task
+        while next_index < len(candidates):
+            model_name = candidates[next_index]
+            next_index += 1
+            if not model_health.allow_request(model_name):
+                continue
+            grant = SlotGrant()
+            task = asyncio.create_task(attempt_completion(model_name, messages, max_tokens, granted=grant))
+            in_flight[task] = model_name
+            grants[task] = grant
+            last_launched, last_task = model_name, task
+            return model_name
+        return None
 
-                print(f"✅ Generated content using {model_name}")
-                return content.strip()
+    try:
+        launch()
+        if LLM_HEDGE_MODE == "eager":
+            launch()
+
+        while in_flight:
+            # The hedge clock for the latest call starts when the scheduler
+            # grants its slot: hedging on queue wait would add load exactly
+            # when the lanes are saturated
+            waiters = set(in_flight)
+            grant_waiter = None
+            timeout = None
+            if next_index < len(candidates) and last_task in in_flight:
+                grant = grants[last_task]
+                if grant.at is not None:
+                    timeout = max(0.0, grant.at + hedge_delay_for(last_launched) - time.monotonic())
+                else:
+                    grant_waiter = asyncio.create_task(grant.event.wait())
+                    waiters.add(grant_waiter)
+            try:
+                done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if grant_waiter is not None:
+                    grant_waiter.cancel()
+
+            finished = [task for task in done if task in in_flight]
+            if grant_waiter in done and not finished:
+                continue  # Slot granted; now start its hedge clock
+
+            for task in finished:
+                model_name = in_flight.pop(task)
+                result = task.result()
+                if result:
+                    if in_flight:
+                        print(f"🏁 {model_name} won the hedge; cancelling {list(in_flight.values())}")
+                    return result
+
+            # Either the running model is slow (no task finished) or one failed:
+            # bring in the next candidate right away in both cases
+            if next_index < len(candidates) and launch():
+                print(f"⏱️ Hedging with {last_launched}")
+
+        return None
+    finally:
+        for task in in_flight:
+            task.cancel()
 
-            except Exception as e:
-                print(f"❌ Pollinations {model_name} attempt {attempt+1} failed: {str(e)}")
-                await asyncio.sleep(0.5)
 
-    return None
+async def safe_completion_async(messages, max_tokens=2000):
+    completion = sequential_completion if LLM_HEDGE_MODE == "off" else hedged_completion
+    try:
+        return await asyncio.wait_for(completion(messages, max_tokens), timeout=LLM_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        print(f"⏰ LLM completion exceeded {LLM_DEADLINE_SECONDS}s deadline")
+        return None
 
 
 # ----------------------------------------------------
-# URL Content Fetcher (Advanced)
+# Async Streaming Completion
 # ----------------------------------------------------
-def fetch_content_from_url(url: str) -> str:
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, timeout=10, headers=headers)
-        response.raise_for_status()
-
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(response.text, "html.parser")
+async def stream_completion_async(messages, max_tokens=2000):
+    """
+    Yield text deltas from the first model that starts streaming.
+    Falls through to the next model only if nothing has been emitted yet.
+    """
+    for model_name in model_health.rank_models(MODELS_TO_TRY):
+        if not model_health.allow_request(model_name):
+            continue
+        started = False
+        began = time.monotonic()
+        try:
+            # The slot is held until the stream ends, like any other call
+            async with llm_scheduler.slot(model_name, max_tokens):
+                began = time.monotonic()
+                stream = await llm_client.get().chat.completions.create(
+                    model=model_name,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    stream=True,
+                )
 
-        # Remove junk
-        for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-            tag.decompose()
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        started = True
+                        yield delta
+
+            if started:
+                model_health.record_success(model_name, time.monotonic() - began)
+                print(f"✅ Streamed content using {model_name}")
+                return
+
+            print(f"⚠️ Model {model_name} streamed EMPTY content.")
+            model_health.record_failure(model_name, time.monotonic() - began)
+
+        except asyncio.CancelledError:
+            model_health.record_cancelled(model_name)
+            raise
+        except Exception as e:
+            model_health.record_failure(model_name, time.monotonic() - began)
+            if started:
+                # Output already reached the client, switching models would garble it
+                raise
+            print(f"❌ Pollinations {model_name} stream failed: {str(e)}")
+
+
+async def split_stream_blocks(deltas, separator: str):
+    """Re-chunk a delta stream into complete blocks closed by separator"""
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        while separator in buffer:
+            block, buffer = buffer.split(separator, 1)
+            if block.strip():
+                yield block.strip()
+    if buffer.strip():
+        yield buffer.strip()
 
-        # Extract main content
-        main = soup.find("article") or soup.find("main") or soup.find("div", class_="content")
 
-        text = main.get_text(" ", strip=True) if main else soup.get_text(" ", strip=True)
+# ----------------------------------------------------
+# URL Content Fetcher (Advanced)
+# ----------------------------------------------------
+URL_TEXT_LIMIT = 15000
 
-        return text[:15000]
 
-    except ImportError:
-        # Fallback if bs4 is missing
-        content = re.sub(r'<[^>]+>', ' ', response.text)
-        content = re.sub(r'\s+', ' ', content).strip()
-        return content[:15000]
+async def fetch_content_from_url(url: str) -> str:
+    try:
+        return await url_fetcher.fetch_text(url, extract_main_text_async, max_chars=URL_TEXT_LIMIT)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch content: {str(e)}")
 
@@ -165,7 +329,7 @@ def fetch_content_from_url(url: str) -> str:
 # ----------------------------------------------------
 # Twitter Thread Generator (Async)
 # ----------------------------------------------------
-async def create_twitter_thread_async(content: str, context: Optional[Dict] = None) -> List[str]:
+def build_twitter_messages(content: str, context: Optional[Dict] = None) -> List[Dict]:
 
     system_prompt = """
 You are an expert X (Twitter) thread writer.
@@ -212,19 +376,26 @@ Do NOT invent fake details.
         if context.get('goal'): system_prompt += f"- Main Goal: {context['goal']}\n"
         if context.get('cta'): system_prompt += f"- Call to Action: {context['cta']}\n"
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": content}
     ]
 
+
+async def create_twitter_thread_async(content: str, context: Optional[Dict] = None) -> List[str]:
+    messages = build_twitter_messages(content, context)
+
     result = await safe_completion_async(messages, max_tokens=2000)
+    return await finish_twitter_thread(result, content, context)
 
-    if not result:
-        return ["❌ Twitter generation failed"]
 
-    posts = [line.strip() for line in result.split("\n") if line.strip()]
+async def finish_twitter_thread(result: Optional[str], content: str, context: Optional[Dict] = None) -> List[str]:
+    # Rewrite only missing or invalid tweets; a failed call is rebuilt in batches
+    tweets, missing = await repair_thread(result, content, context, safe_completion_async)
+    if not tweets:
+        return ["❌ Twitter generation failed"]
 
-    # Ensure exactly 10 posts
+    # Last resort for tweets the repair prompts could not fix
     default_posts = [
         "💡 Small habits create big success. #Growth #Success",
         "🚀 Focus on what matters most daily. #Productivity #Mindset",
@@ -238,16 +409,16 @@ Do NOT invent fake details.
         "👉 Take action today, not someday. #Action #Motivation"
     ]
 
-    while len(posts) < 10:
-        posts.append(f"{len(posts)+1}/10 {default_posts[len(posts)]}")
+    for position in missing:
+        tweets[position] = f"{position}/10 {default_posts[position - 1]}"
 
-    return posts[:10]
+    return [tweets[p] for p in sorted(tweets)]
 
 
 # ----------------------------------------------------
 # LinkedIn Post Generator (Async)
 # ----------------------------------------------------
-async def create_linkedin_post_async(content: str, context: Optional[Dict] = None) -> str:
+def build_linkedin_messages(content: str, context: Optional[Dict] = None) -> List[Dict]:
 
     system_prompt = """
 You are a LinkedIn content strategist.
@@ -318,23 +489,30 @@ Context Rules:
         if story_pts:
             system_prompt += "\nSpecific Story Points to incorporate:\n" + "\n".join(f"- {p}" for p in story_pts)
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": content}
     ]
 
+
+async def create_linkedin_post_async(content: str, context: Optional[Dict] = None) -> str:
+    messages = build_linkedin_messages(content, context)
+
     result = await safe_completion_async(messages, max_tokens=1500)
+    return await finish_linkedin_post(result, content, context)
+
 
+async def finish_linkedin_post(result: Optional[str], content: str, context: Optional[Dict] = None) -> str:
     if not result:
         return "❌ LinkedIn generation failed"
 
-    return result
+    return await repair_post(result, context, safe_completion_async)
 
 
 # ----------------------------------------------------
 # Instagram Carousel Generator (Async)
 # ----------------------------------------------------
-async def create_instagram_carousel_async(content: str, context: Optional[Dict] = None) -> List[str]:
+def build_instagram_messages(content: str, context: Optional[Dict] = None) -> List[Dict]:
 
     system_prompt = """
 You are an Instagram carousel content strategist.
@@ -378,25 +556,26 @@ Do NOT invent fake details.
         if context.get('highlights'): system_prompt += f"- Key wins to feature on slides: {context['highlights']}\n"
         if context.get('goal'): system_prompt += f"- Content Goal: {context['goal']}\n"
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": content}
     ]
 
-    result = await safe_completion_async(messages, max_tokens=1500)
 
-    if not result:
-        return ["❌ Carousel generation failed"]
+async def create_instagram_carousel_async(content: str, context: Optional[Dict] = None) -> List[str]:
+    messages = build_instagram_messages(content, context)
 
-    raw_slides = result.split("\n\n")
+    result = await safe_completion_async(messages, max_tokens=1500)
+    return await finish_instagram_carousel(result, content, context)
 
-    slides = []
-    for slide in raw_slides:
-        lines = slide.strip().split("\n")
-        if len(lines) == 2:
-            slides.append(slide.strip())
 
-    # Default backup slides
+async def finish_instagram_carousel(result: Optional[str], content: str, context: Optional[Dict] = None) -> List[str]:
+    # Rewrite only missing or malformed slides; a failed call is rebuilt in batches
+    slides, missing = await repair_carousel(result, content, context, safe_completion_async)
+    if not slides:
+        return ["❌ Carousel generation failed"]
+
+    # Last resort for slides the repair prompts could not fix
     default_slides = [
         "💡 KEY INSIGHT\nFocus drives success",
         "🚀 TAKE ACTION\nStart implementing today",
@@ -408,142 +587,670 @@ Do NOT invent fake details.
         "👉 FOLLOW FOR MORE\nDaily content tips"
     ]
 
-    while len(slides) < 6:
-        slides.append(default_slides[len(slides)])
+    # A short carousel is fine; only pad gaps up to the 6-slide minimum
+    for position in missing:
+        if len(slides) >= 6:
+            break
+        slides[position] = default_slides[position - 1]
 
-    return slides[:8]
+    return [slides[p] for p in sorted(slides)]
 
 
 # ----------------------------------------------------
-# Main Repurpose Endpoint (Full)
+# Platform Fan-out (with Generation Cache)
 # ----------------------------------------------------
-@snippetstream_router.post("/repurpose", response_model=SocialMediaResponse)
-async def repurpose_content(
-    request: ContentRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+PLATFORM_GENERATORS = {
+    "twitter": create_twitter_thread_async,
+    "linkedin": create_linkedin_post_async,
+    "instagram": create_instagram_carousel_async,
+}
+
+# Validate/repair raw model text; shared by the per-platform and combined calls
+PLATFORM_FINISHERS = {
+    "twitter": finish_twitter_thread,
+    "linkedin": finish_linkedin_post,
+    "instagram": finish_instagram_carousel,
+}
+
+MAX_VARIANTS = 3
+VARIANT_SEPARATOR = "=== VARIANT ==="
+VARIANT_SPLIT_RE = re.compile(r'^\s*=+\s*VARIANT\s*\d*\s*=+\s*$', re.IGNORECASE | re.MULTILINE)
+
+
+def resolve_variants(variants: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """Map requested {platform: count} onto generator keys, keeping counts above one"""
+    resolved = {}
+    for name, count in (variants or {}).items():
+        platforms = resolve_platforms([str(name).lower()])
+        if platforms and count and int(count) > 1:
+            resolved[platforms[0]] = int(count)
+    return resolved
+
+
+async def create_platform_variants_async(
+    platform: str, content: str, context: Optional[Dict], count: int, collected: Dict
 ):
+    """
+    Ask for count alternatives in one call, finish each like a single output
+    and put them all in collected[platform]. Returns the first, so callers
+    treat it as the platform's main output.
+    """
+    build_messages, max_tokens = PLATFORM_MESSAGE_BUILDERS[platform]
+    messages = build_messages(content, context)
+    messages[0] = {
+        "role": "system",
+        "content": messages[0]["content"] + f"""
+
+Write {count} DIFFERENT alternative versions, each following every rule above.
+Separate versions with a line containing only: {VARIANT_SEPARATOR}
+""",
+    }
+
+    result = await safe_completion_async(messages, max_tokens=min(max_tokens * count, 6000))
+    parts = [part.strip() for part in VARIANT_SPLIT_RE.split(result or "") if part.strip()][:count]
+    if not parts:
+        # One plain output beats none
+        output = await PLATFORM_GENERATORS[platform](content, context)
+        collected[platform] = [output]
+        return output
+
+    print(f"🎲 {platform}: {len(parts)}/{count} variants from one call")
+    finished = await asyncio.gather(*(PLATFORM_FINISHERS[platform](part, content, context) for part in parts))
+    collected[platform] = list(finished)
+    return finished[0]
+
+PLATFORM_CLEANERS = {
+    "twitter": clean_twitter_thread,
+    "linkedin": clean_linkedin_post,
+    "instagram": clean_instagram_slides,
+}
+
+PLATFORM_ERRORS = {
+    "twitter": ["❌ Twitter error"],
+    "linkedin": "❌ LinkedIn error",
+    "instagram": ["❌ Instagram error"],
+}
+
+
+def resolve_platforms(enabled_platforms: Optional[List[str]]) -> List[str]:
+    """Map requested platform names onto generator keys, in a stable order"""
+    enabled = enabled_platforms or ["twitter", "linkedin", "instagram"]
+    platforms = []
+    if "twitter" in enabled or "x" in enabled:
+        platforms.append("twitter")
+    if "linkedin" in enabled:
+        platforms.append("linkedin")
+    if "instagram" in enabled:
+        platforms.append("instagram")
+    return platforms
+
+
+def is_failed_output(raw) -> bool:
+    """Generators signal failure with a ❌ marker instead of raising"""
+    if isinstance(raw, list):
+        return not raw or any(str(item).startswith("❌") for item in raw)
+    return not raw or str(raw).startswith("❌")
+
+
+def failed_platforms(outputs: Dict) -> List[str]:
+    """Platforms whose cleaned output still carries the generator's ❌ error marker"""
+    return [name for name, output in outputs.items() if "❌" in json.dumps(output, ensure_ascii=False)]
+
+
+async def lookup_cached_outputs(
+    content: str,
+    context: Optional[Dict],
+    platforms: List[str],
+    bypass_cache: bool = False,
+    fresh: Optional[List[str]] = None,
+):
+    """Return ({platform: cached output}, {platform: cache key}); fresh platforms skip the lookup"""
+    cache_keys = {
+        platform: make_cache_key(content, context, platform, PROMPT_VERSION)
+        for platform in platforms
+    }
+
+    if bypass_cache:
+        generation_cache.counters["bypassed"] += 1
+        return {}, cache_keys
+
+    wanted = [platform for platform in platforms if not (fresh and platform in fresh)]
+    hits = await generation_cache.get_many_async([cache_keys[platform] for platform in wanted])
+    outputs = {platform: hits[cache_keys[platform]] for platform in wanted if cache_keys[platform] in hits}
+    return outputs, cache_keys
+
+
+async def prepare_llm_input(content: str, metrics: Optional[Dict] = None) -> str:
+    """
+    Shrink the text the platform generators see: long inputs are condensed
+    by map-reduce, then anything over the token budget goes through
+    extractive compression.
+    Compression stats are added to metrics for the usage row.
+    """
+    llm_content = await condense_long_content(content, safe_completion_async)
+    if metrics is not None and llm_content != content:
+        metrics["condensed_from_chars"] = len(content)
+
+    if not COMPRESSION_ENABLED:
+        return llm_content
+
+    loop = asyncio.get_running_loop()
+    compressed, stats = await loop.run_in_executor(
+        get_executor(), compress_text, llm_content, COMPRESSION_TOKEN_BUDGET
+    )
+    if len(compressed.strip()) < 10:
+        # Nothing but code/markup; let the model see the original
+        return llm_content
+
+    record_compression(stats)
+    if metrics is not None:
+        metrics["compression"] = stats
+    print(f"🗜️ Prompt input {stats['original_tokens']} -> {stats['compressed_tokens']} tokens ({stats['elapsed_ms']}ms)")
+    return compressed
+
+
+# ----------------------------------------------------
+# Platform Deadlines
+# ----------------------------------------------------
+# Overall budget for /repurpose, measured from when the request starts
+REPURPOSE_DEADLINE_SECONDS = float(os.getenv("REPURPOSE_DEADLINE_SECONDS", "45"))
+PLATFORM_DEADLINE_SECONDS = os.getenv("PLATFORM_DEADLINE_SECONDS", "40")
+# Per-platform overrides, e.g. INSTAGRAM_DEADLINE_SECONDS=30
+PLATFORM_DEADLINES = {
+    platform: float(os.getenv(f"{platform.upper()}_DEADLINE_SECONDS", PLATFORM_DEADLINE_SECONDS))
+    for platform in PLATFORM_GENERATORS
+}
+# A platform still pending after this was lost (e.g. the process restarted)
+PENDING_STALE_SECONDS = REPURPOSE_DEADLINE_SECONDS + LLM_DEADLINE_SECONDS + 60
+
+PLATFORM_COLUMNS = {
+    "twitter": "twitter_thread",
+    "linkedin": "linkedin_post",
+    "instagram": "instagram_carousel",
+}
+
+# Keep references so background platform tasks aren't garbage collected
+pending_platform_tasks = set()
+
+
+def offline_output(platform: str, content: str, context: Optional[Dict], reason: str):
+    """Cleaned output from the local generator; never cached"""
+    print(f"📴 {platform} built offline ({reason})")
+    return PLATFORM_CLEANERS[platform](generate_offline(platform, content, context, reason))
+
+
+def clean_platform_result(name: str, res):
+    """Return (cleaned output, ok); ok means a real result worth caching"""
+    if isinstance(res, BaseException):
+        print(f"❌ {name} generation error: {res}")
+        return PLATFORM_CLEANERS[name](PLATFORM_ERRORS[name]), False
+    return PLATFORM_CLEANERS[name](res), not is_failed_output(res)
+
+
+async def wait_with_deadlines(tasks: Dict, deadline: float, pending: Dict) -> Dict:
+    """
+    Collect results of {task: platform} until each platform's deadline.
+    Platforms still running then are moved into pending as {platform: task}.
+    """
+    started = time.monotonic()
+    due = {task: min(deadline, started + PLATFORM_DEADLINES[name]) for task, name in tasks.items()}
+    remaining = set(tasks)
+    results = {}
 
     try:
-        feature_gate = get_feature_gate(current_user)
-
-        # Generation limit check
-        if not feature_gate.can_generate_content(db):
-            raise HTTPException(status_code=429, detail="Daily generation limit reached")
-
-        # URL is Pro-only
-        if request.url and not feature_gate.can_process_urls():
-            raise HTTPException(status_code=403, detail="URL processing is Pro feature")
-
-        # Content input
-        if request.url:
-            content = fetch_content_from_url(str(request.url))
-            source = "url"
-        elif request.content:
-            content = request.content
-            source = "text"
+        while remaining:
+            timeout = max(0.0, min(due[task] for task in remaining) - time.monotonic())
+            done, _ = await asyncio.wait(remaining, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                remaining.discard(task)
+                if task.cancelled():
+                    # Counts as a failed platform rather than aborting the rest
+                    results[tasks[task]] = asyncio.CancelledError(f"{tasks[task]} generation was cancelled")
+                else:
+                    results[tasks[task]] = task.exception() or task.result()
+
+            now = time.monotonic()
+            for task in [t for t in remaining if due[t] <= now]:
+                remaining.discard(task)
+                pending[tasks[task]] = task
+                print(f"⏳ {tasks[task]} missed its deadline, finishing in background")
+    except asyncio.CancelledError:
+        for task in remaining:
+            task.cancel()
+        raise
+
+    return results
+
+
+async def generate_combined_async(content: str, context: Optional[Dict], platforms: List[str]) -> Dict:
+    """One LLM call for all platforms; returns {platform: raw text or None}"""
+    print(f"🧬 Combined generation for {platforms}")
+    reply = await safe_completion_async(
+        build_combined_messages(content, context, platforms), max_tokens=COMBINED_MAX_TOKENS
+    )
+    return parse_combined_reply(reply, platforms)
+
+
+async def finish_combined_platform(combined: asyncio.Future, platform: str, content: str, context: Optional[Dict]):
+    # Shielded: one platform hitting its deadline must not cancel the shared call
+    texts = await asyncio.shield(combined)
+    if texts.get(platform) is None:
+        print(f"↩️ {platform} missing from combined reply, falling back to its own call")
+        return await PLATFORM_GENERATORS[platform](content, context)
+    return await PLATFORM_FINISHERS[platform](texts[platform], content, context)
+
+
+async def generate_platforms(
+    content: str,
+    context: Optional[Dict],
+    platforms: List[str],
+    bypass_cache: bool = False,
+    metrics: Optional[Dict] = None,
+    deadline: Optional[float] = None,
+    pending: Optional[Dict] = None,
+    mode: str = "fanout",
+    variants: Optional[Dict[str, int]] = None,
+    variant_outputs: Optional[Dict] = None,
+    raw_variants: Optional[Dict] = None,
+):
+    """
+    Generate cleaned output for each platform, serving cache hits without
+    touching the LLM. Returns (outputs, cached_platforms).
+
+    With a deadline (a time.monotonic() value) and a pending dict, platforms
+    still running at their deadline are left out of outputs and handed back
+    in pending as {platform: task}, still running.
+
+    mode "combined" asks for all uncached platforms in one JSON call and
+    falls back to per-platform calls for any platform it doesn't return.
+
+    variants ({platform: count}) asks for alternatives in one call per
+    platform, skipping the cache; all cleaned alternatives are put into
+    variant_outputs as {platform: [output, ...]}. raw_variants, when given,
+    collects the uncleaned alternatives as each variant platform finishes,
+    including platforms left in pending, for the background write.
+    """
+    variants = {p: min(n, MAX_VARIANTS) for p, n in (variants or {}).items() if p in platforms and n > 1}
+    outputs, cache_keys = await lookup_cached_outputs(content, context, platforms, bypass_cache, fresh=list(variants))
+    cached_platforms = list(outputs.keys())
+
+    missing = [p for p in platforms if p not in outputs]
+    if cached_platforms:
+        print(f"⚡ Cache hit for {cached_platforms}")
+
+    offline = []
+    if missing and (mode == "instant" or (OFFLINE_FALLBACK_ENABLED and not model_health.rank_models(MODELS_TO_TRY))):
+        # No LLM: instant mode, or every model is behind an open circuit
+        reason = "instant" if mode == "instant" else "fallback"
+        for name in missing:
+            outputs[name] = offline_output(name, content, context, reason)
+        offline, missing = missing, []
+
+    if missing:
+        # Input is condensed/compressed once and shared by all platforms
+        llm_content = await prepare_llm_input(content, metrics)
+
+        if raw_variants is None:
+            raw_variants = {}
+        tasks = {
+            asyncio.ensure_future(create_platform_variants_async(p, llm_content, context, variants[p], raw_variants)): p
+            for p in missing if p in variants
+        }
+        single = [p for p in missing if p not in variants]
+        if mode == "combined" and len(single) > 1:
+            combined = asyncio.ensure_future(generate_combined_async(llm_content, context, single))
+            tasks.update({
+                asyncio.ensure_future(finish_combined_platform(combined, p, llm_content, context)): p
+                for p in single
+            })
         else:
-            raise HTTPException(status_code=400, detail="Content or URL required")
+            print(f"⚡ Triggering parallel generation for {missing}...")
+            tasks.update({
+                asyncio.ensure_future(PLATFORM_GENERATORS[p](llm_content, context)): p
+                for p in single
+            })
+        if deadline is None or pending is None:
+            results = dict(zip(tasks.values(), await asyncio.gather(*tasks, return_exceptions=True)))
+        else:
+            results = await wait_with_deadlines(tasks, deadline, pending)
+
+        for name, res in results.items():
+            outputs[name], ok = clean_platform_result(name, res)
+            if ok:
+                await generation_cache.set_async(cache_keys[name], name, PROMPT_VERSION, outputs[name])
+            elif OFFLINE_FALLBACK_ENABLED:
+                outputs[name] = offline_output(name, llm_content, context, "fallback")
+                offline.append(name)
+                continue
+            if name in raw_variants and variant_outputs is not None:
+                cleaned = [clean_platform_result(name, raw) for raw in raw_variants[name]]
+                variant_outputs[name] = [output for output, variant_ok in cleaned if variant_ok] or [outputs[name]]
+
+    if metrics is not None:
+        metrics["generation_mode"] = mode
+        if offline:
+            metrics["offline_platforms"] = offline
+    return outputs, cached_platforms
+
+
+async def finish_pending_platforms(
+    generation_id: Optional[int],
+    content: str,
+    context: Optional[Dict],
+    pending: Dict,
+    raw_variants: Optional[Dict] = None,
+):
+    """
+    Wait for platforms that missed the deadline and fill them into the saved
+    generation, with their alternatives if they were asked for variants.
+    """
+    names = list(pending.keys())
+    results = await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(store_pending_platforms, generation_id, content, context, names, results, raw_variants)
+
+
+def store_pending_platforms(
+    db: Session,
+    generation_id: Optional[int],
+    content: str,
+    context: Optional[Dict],
+    names: List[str],
+    results: list,
+    raw_variants: Optional[Dict] = None,
+):
+    try:
+        generation = None
+        if generation_id is not None:
+            generation = db.query(ContentGeneration).filter(ContentGeneration.id == generation_id).first()
+
+        for name, res in zip(names, results):
+            output, ok = clean_platform_result(name, res)
+            offline = False
+            if ok:
+                key = make_cache_key(content, context, name, PROMPT_VERSION)
+                generation_cache.set(db, key, name, PROMPT_VERSION, output)
+            elif OFFLINE_FALLBACK_ENABLED:
+                output, ok, offline = offline_output(name, content, context, "fallback"), True, True
+            if generation is None:
+                continue
+
+            if not offline and raw_variants and name in raw_variants:
+                cleaned = [clean_platform_result(name, raw) for raw in raw_variants[name]]
+                alternatives = [alt for alt, variant_ok in cleaned if variant_ok] or [output]
+                for position, alt in enumerate(alternatives):
+                    db.add(GenerationVariant(
+                        generation_id=generation_id, platform=name, position=position,
+                        content=alt if isinstance(alt, str) else json.dumps(alt),
+                    ))
+
+            setattr(generation, PLATFORM_COLUMNS[name], output if isinstance(output, str) else json.dumps(output))
+            db.query(GenerationPlatformStatus).filter(
+                GenerationPlatformStatus.generation_id == generation_id,
+                GenerationPlatformStatus.platform == name,
+            ).update(
+                {"status": "completed" if ok else "failed", "error": None if ok else "Generation failed"},
+                synchronize_session=False,
+            )
 
-        if not content or len(content.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Content is too short or empty")
+        db.commit()
+        print(f"✅ Background platforms {names} finished for generation {generation_id}")
+    except Exception as e:
+        print(f"❌ Could not store background platforms for generation {generation_id}: {e}")
+        db.rollback()
 
-        # Content length limit
-        max_length = feature_gate.get_feature_limits(db)["max_content_length"]
-        if len(content) > max_length:
-            print(f"✂️ Truncating content from {len(content)} to {max_length}")
-            content = content[:max_length] + "..."
 
-        preview = content[:200] + "..." if len(content) > 200 else content
+def schedule_pending_platforms(
+    generation_id: Optional[int],
+    content: str,
+    context: Optional[Dict],
+    pending: Dict,
+    raw_variants: Optional[Dict] = None,
+):
+    task = asyncio.create_task(finish_pending_platforms(generation_id, content, context, pending, raw_variants))
+    pending_platform_tasks.add(task)
+    task.add_done_callback(pending_platform_tasks.discard)
+
+
+def save_generation(
+    db: Session,
+    user_id: int,
+    content: str,
+    source: str,
+    outputs: Dict,
+    context: Optional[Dict],
+    processing_time: float,
+    cached_platforms: List[str],
+    usage_extra: Optional[Dict] = None,
+    pending_platforms: Optional[List[str]] = None,
+    variants: Optional[Dict[str, list]] = None,
+    reservation: Optional[QuotaReservation] = None,
+    commit: bool = True,
+) -> Optional[ContentGeneration]:
+    """
+    Persist a generation and its usage row. Fully cached generations made no
+    LLM calls and are logged as generate_cached so they don't count against quota.
+    Otherwise the quota reservation is charged in the same transaction.
+    Platforms still generating in the background get a pending status row.
+    With commit=False the rows are only flushed and the caller commits.
+    """
+    fully_cached = bool(outputs) and len(cached_platforms) == len(outputs) and not pending_platforms
+    try:
+        generation = ContentGeneration(
+            user_id=user_id,
+            original_content=content[:1000],
+            content_source=source,
+            twitter_thread=json.dumps(outputs.get("twitter", [])),
+            linkedin_post=outputs.get("linkedin", ""),
+            instagram_carousel=json.dumps(outputs.get("instagram", [])),
+            context=json.dumps(context) if context else None,
+            processing_time=processing_time,
+        )
+        db.add(generation)
+        db.flush()
+
+        # Full source, so single platforms can be regenerated later
+        db.add(GenerationSource(generation_id=generation.id, content=content))
+
+        for platform, alternatives in (variants or {}).items():
+            for position, output in enumerate(alternatives):
+                db.add(GenerationVariant(
+                    generation_id=generation.id,
+                    platform=platform,
+                    position=position,
+                    content=output if isinstance(output, str) else json.dumps(output),
+                ))
+
+        if pending_platforms:
+            for platform in pending_platforms:
+                db.add(GenerationPlatformStatus(generation_id=generation.id, platform=platform, status="pending"))
+
+        usage = UsageStats(
+            user_id=user_id,
+            action="generate_cached" if fully_cached else "generate",
+            extra_data=json.dumps(
+                {
+                    "source": source,
+                    "processing_time": processing_time,
+                    "cached_platforms": cached_platforms,
+                    **(usage_extra or {}),
+                }
+            ),
+        )
+        db.add(usage)
+        if reservation is not None and not fully_cached:
+            quota_ledger.commit(db, reservation)
 
-        print(f"🚀 Processing repurpose request for user {current_user.id} (Source: {source}, Length: {len(content)})")
-        start_time = time.time()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return generation
 
-        # Generate all outputs in parallel for maximum speed
-        print("⚡ Triggering parallel generation for all platforms...")
-        
-        # Determine which tasks to run based on enabled_platforms
-        enabled = request.enabled_platforms or ["twitter", "linkedin", "instagram"]
-        
-        tasks = []
-        task_names = []
-        
-        if "twitter" in enabled or "x" in enabled:
-            tasks.append(create_twitter_thread_async(content, request.context))
-            task_names.append("twitter")
-        
-        if "linkedin" in enabled:
-            tasks.append(create_linkedin_post_async(content, request.context))
-            task_names.append("linkedin")
-            
-        if "instagram" in enabled:
-            tasks.append(create_instagram_carousel_async(content, request.context))
-            task_names.append("instagram")
-        
-        if not tasks:
+    except Exception as db_error:
+        print("⚠️ Database save failed:", db_error)
+        db.rollback()
+        return None
+
+
+async def save_generation_async(*args, **kwargs) -> Optional[ContentGeneration]:
+    """save_generation on the async engine, so persisting never blocks the event loop"""
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(lambda session: save_generation(session, *args, **kwargs))
+
+
+# ----------------------------------------------------
+# Request Input Preparation
+# ----------------------------------------------------
+async def prepare_content(request: ContentRequest, feature_gate):
+    """
+    Run quota/tier checks and resolve the request into (content, source, reservation).
+    The reservation holds one generation of the daily quota: save_generation
+    charges it, and callers release it when nothing gets charged.
+    """
+
+    # LLM calls made for this request are queued under this user and tier
+    bind_llm_principal(feature_gate.user.id, feature_gate.get_tier())
+
+    # Generation limit check; reserving makes check-and-use atomic
+    reservation = await feature_gate.reserve_generation_async()
+    if reservation is None:
+        raise HTTPException(status_code=429, detail="Daily generation limit reached")
+
+    try:
+        content, source = await resolve_content(request, feature_gate)
+    except BaseException:
+        await quota_ledger.release_async(reservation)
+        raise
+    return content, source, reservation
+
+
+async def resolve_content(request: ContentRequest, feature_gate):
+    """Tier checks on the request, then its text (or fetched URL) within the length limit"""
+
+    # URL is Pro-only
+    if request.url and not feature_gate.can_process_urls():
+        raise HTTPException(status_code=403, detail="URL processing is Pro feature")
+
+    requested_variants = max(resolve_variants(request.variants).values(), default=1)
+    if requested_variants > feature_gate.get_variant_limit():
+        if feature_gate.get_variant_limit() <= 1:
+            raise HTTPException(status_code=403, detail="Multiple variants is Pro feature")
+        raise HTTPException(status_code=400, detail=f"At most {feature_gate.get_variant_limit()} variants per platform")
+
+    # Content input
+    if request.url:
+        content = await fetch_content_from_url(str(request.url))
+        source = "url"
+    elif request.content:
+        content = request.content
+        source = "text"
+    else:
+        raise HTTPException(status_code=400, detail="Content or URL required")
+
+    if not content or len(content.strip()) < 10:
+        raise HTTPException(status_code=400, detail="Content is too short or empty")
+
+    # Content length limit
+    max_length = feature_gate.get_max_content_length()
+    if len(content) > max_length:
+        print(f"✂️ Truncating content from {len(content)} to {max_length}")
+        content = truncate_at_boundary(content, max_length)
+
+    return content, source
+
+
+# ----------------------------------------------------
+# Main Repurpose Endpoint (Full)
+# ----------------------------------------------------
+@snippetstream_router.post("/repurpose", response_model=SocialMediaResponse)
+async def repurpose_content(
+    request: ContentRequest,
+    current_user: User = Depends(get_current_active_user_async),
+):
+
+    try:
+        platforms = resolve_platforms(request.enabled_platforms)
+        if not platforms:
             raise HTTPException(status_code=400, detail="At least one platform must be selected")
-            
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Unpack results and handle potential errors
-        raw_twitter = []
-        raw_linkedin = ""
-        raw_instagram = []
-        
-        for i, name in enumerate(task_names):
-            res = results[i]
-            if isinstance(res, Exception):
-                print(f"❌ {name} generation error: {res}")
-                if name == "twitter": raw_twitter = ["❌ Twitter error"]
-                elif name == "linkedin": raw_linkedin = "❌ LinkedIn error"
-                elif name == "instagram": raw_instagram = ["❌ Instagram error"]
-            else:
-                if name == "twitter": raw_twitter = res
-                elif name == "linkedin": raw_linkedin = res
-                elif name == "instagram": raw_instagram = res
-        
-        # Clean results
-        twitter_thread = clean_twitter_thread(raw_twitter)
-        linkedin_post = clean_linkedin_post(raw_linkedin)
-        instagram_carousel = clean_instagram_slides(raw_instagram)
 
-        processing_time = time.time() - start_time
+        user_id = current_user.id
+        variants = resolve_variants(request.variants)
 
-        # Save generation
-        try:
-            generation = ContentGeneration(
-                user_id=current_user.id,
-                original_content=content[:1000],
-                content_source=source,
-                twitter_thread=json.dumps(twitter_thread),
-                linkedin_post=linkedin_post,
-                instagram_carousel=json.dumps(instagram_carousel),
-                context=json.dumps(request.context) if request.context else None,
-                processing_time=processing_time,
-            )
-            db.add(generation)
-
-            usage = UsageStats(
-                user_id=current_user.id,
-                action="generate",
-                extra_data=json.dumps(
-                    {"source": source, "processing_time": processing_time}
-                ),
-            )
-            db.add(usage)
+        async def produce():
+            # Runs once per set of identical in-flight requests, on its own
+            # session since it may outlive the request that started it
+            request_deadline = time.monotonic() + REPURPOSE_DEADLINE_SECONDS
+            reservation = None
+            try:
+                async with AsyncSessionLocal() as gen_db:
+                    feature_gate = get_feature_gate(await gen_db.get(User, user_id))
+                content, source, reservation = await prepare_content(request, feature_gate)
+
+                preview = content[:200] + "..." if len(content) > 200 else content
+
+                print(f"🚀 Processing repurpose request for user {user_id} (Source: {source}, Length: {len(content)})")
+                start_time = time.time()
+
+                metrics = {}
+                pending = {}
+                variant_outputs = {}
+                raw_variants = {}
+                outputs, cached_platforms = await generate_platforms(
+                    content, request.context, platforms,
+                    bypass_cache=request.bypass_cache, metrics=metrics,
+                    deadline=request_deadline, pending=pending,
+                    mode=resolve_generation_mode(request.generation_mode, feature_gate.get_tier()),
+                    variants=variants, variant_outputs=variant_outputs, raw_variants=raw_variants,
+                )
 
-            db.commit()
+                processing_time = time.time() - start_time
 
-        except Exception as db_error:
-            print("⚠️ Database save failed:", db_error)
-            db.rollback()
+                generation = await save_generation_async(
+                    user_id, content, source, outputs,
+                    request.context, processing_time, cached_platforms,
+                    usage_extra=metrics, pending_platforms=list(pending),
+                    variants=variant_outputs, reservation=reservation,
+                )
+                generation_id = generation.id if generation else None
+
+                if pending:
+                    schedule_pending_platforms(generation_id, content, request.context, pending, raw_variants)
+
+                return SocialMediaResponse(
+                    twitter_thread=outputs.get("twitter", []),
+                    linkedin_post=outputs.get("linkedin", ""),
+                    instagram_carousel=outputs.get("instagram", []),
+                    original_content_preview=preview,
+                    cached_platforms=cached_platforms,
+                    pending_platforms=list(pending),
+                    generation_id=generation_id,
+                    offline_platforms=metrics.get("offline_platforms", []),
+                    variants=variant_outputs,
+                ).dict()
+            finally:
+                # Refunds the quota unless save_generation charged it
+                await quota_ledger.release_async(reservation)
+
+        if request.bypass_cache:
+            # Asked for a fresh generation, so don't hand it someone else's
+            result, coalesced = await produce(), False
+        else:
+            # Everything else in the request that changes the output
+            options = {
+                "variants": variants,
+                "generation_mode": request.generation_mode,
+                "content_type": request.content_type,
+            }
+            key = make_request_key(
+                user_id, request.content, str(request.url) if request.url else None,
+                request.context, platforms, options,
+            )
+            result, coalesced = await request_coalescer.run(key, produce)
 
-        return SocialMediaResponse(
-            twitter_thread=twitter_thread,
-            linkedin_post=linkedin_post,
-            instagram_carousel=instagram_carousel,
-            original_content_preview=preview,
-        )
+        return SocialMediaResponse(**{**result, "coalesced": coalesced})
 
     except HTTPException:
         # Re-raise HTTP exceptions (429, 403, etc)
@@ -555,6 +1262,383 @@ async def repurpose_content(
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e) or type(e).__name__}")
 
 
+@snippetstream_router.get("/repurpose/{generation_id}")
+async def get_repurpose_result(
+    generation_id: int,
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Fetch a generation, including platforms that finished after the response was sent"""
+    generation = await get_owned_generation(db, generation_id, current_user.id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+
+    return await db.run_sync(generation_result, generation)
+
+
+async def get_owned_generation(db: AsyncSession, generation_id: int, user_id: int) -> Optional[ContentGeneration]:
+    result = await db.execute(select(ContentGeneration).where(
+        ContentGeneration.id == generation_id,
+        ContentGeneration.user_id == user_id,
+    ))
+    return result.scalar_one_or_none()
+
+
+def load_variants(db: Session, generation_id: int) -> Dict[str, list]:
+    rows = db.query(GenerationVariant).filter(
+        GenerationVariant.generation_id == generation_id
+    ).order_by(GenerationVariant.platform, GenerationVariant.position).all()
+
+    variants = {}
+    for row in rows:
+        variants.setdefault(row.platform, []).append(row.content if row.platform == "linkedin" else json.loads(row.content))
+    return variants
+
+
+def generation_result(db: Session, generation: ContentGeneration) -> Dict:
+    """Serialize a stored generation with per-platform status"""
+    statuses = db.query(GenerationPlatformStatus).filter(
+        GenerationPlatformStatus.generation_id == generation.id
+    ).all()
+
+    now = datetime.now(timezone.utc)
+    platform_status = {}
+    for row in statuses:
+        created_at = row.created_at
+        if created_at is not None and created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite drops tzinfo
+        if row.status == "pending" and created_at and (now - created_at).total_seconds() > PENDING_STALE_SECONDS:
+            row.status = "failed"
+            row.error = "Background generation did not finish"
+            db.commit()
+        platform_status[row.platform] = row.status
+
+    original = generation.original_content or ""
+    response = SocialMediaResponse(
+        twitter_thread=json.loads(generation.twitter_thread or "[]"),
+        linkedin_post=generation.linkedin_post or "",
+        instagram_carousel=json.loads(generation.instagram_carousel or "[]"),
+        original_content_preview=original[:200] + "..." if len(original) > 200 else original,
+        pending_platforms=[p for p, status in platform_status.items() if status == "pending"],
+        generation_id=generation.id,
+        variants=load_variants(db, generation.id),
+    )
+    return {**response.dict(), "platform_status": platform_status}
+
+
+class RegenerateRequest(BaseModel):
+    platform: str
+
+
+@snippetstream_router.post("/repurpose/{generation_id}/regenerate")
+async def regenerate_platform(
+    generation_id: int,
+    request: RegenerateRequest,
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Regenerate one platform of an existing generation from its stored source
+    and context, replacing only that platform's output. Doesn't use up a
+    daily generation; capped per generation by tier instead.
+    """
+    generation = await get_owned_generation(db, generation_id, current_user.id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+
+    platforms = resolve_platforms([request.platform.lower()])
+    if not platforms:
+        raise HTTPException(status_code=400, detail="Platform must be twitter, linkedin or instagram")
+    platform = platforms[0]
+
+    source = (await db.execute(
+        select(GenerationSource).where(GenerationSource.generation_id == generation.id)
+    )).scalar_one_or_none()
+    if source is None:
+        # Older generations only kept a 1000-char preview; that is the full source only if shorter
+        if len(generation.original_content or "") >= 1000:
+            raise HTTPException(status_code=409, detail="Source content was not stored for this generation")
+        source = GenerationSource(generation_id=generation.id, content=generation.original_content, regenerations=0)
+        db.add(source)
+
+    feature_gate = get_feature_gate(current_user)
+    limit = feature_gate.get_regeneration_limit()
+    if (source.regenerations or 0) >= limit:
+        raise HTTPException(status_code=429, detail=f"Regeneration limit reached for this generation ({limit})")
+
+    bind_llm_principal(current_user.id, feature_gate.get_tier())
+    context = json.loads(generation.context) if generation.context else None
+    start_time = time.time()
+
+    metrics = {"generation_id": generation.id}
+    llm_content = await prepare_llm_input(source.content, metrics)
+    print(f"🔁 Regenerating {platform} for generation {generation.id}")
+    try:
+        raw = await PLATFORM_GENERATORS[platform](llm_content, context)
+    except Exception as e:
+        raw = e
+    output, ok = clean_platform_result(platform, raw)
+    if not ok:
+        raise HTTPException(status_code=502, detail=f"{platform} regeneration failed, previous output kept")
+
+    processing_time = time.time() - start_time
+
+    def persist(session: Session):
+        setattr(generation, PLATFORM_COLUMNS[platform], output if isinstance(output, str) else json.dumps(output))
+        source.regenerations = (source.regenerations or 0) + 1
+        session.query(GenerationPlatformStatus).filter(
+            GenerationPlatformStatus.generation_id == generation.id,
+            GenerationPlatformStatus.platform == platform,
+        ).update({"status": "completed", "error": None}, synchronize_session=False)
+        session.add(UsageStats(
+            user_id=current_user.id,
+            action="regenerate",
+            platform=platform,
+            extra_data=json.dumps({"processing_time": processing_time, **metrics}),
+        ))
+        session.commit()
+
+    try:
+        await db.run_sync(persist)
+    except Exception as db_error:
+        print("⚠️ Database save failed:", db_error)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to save regenerated content")
+
+    # Latest output wins for identical future requests
+    key = make_cache_key(source.content, context, platform, PROMPT_VERSION)
+    await generation_cache.set_async(key, platform, PROMPT_VERSION, output)
+
+    return {
+        **await db.run_sync(generation_result, generation),
+        "regenerated_platform": platform,
+        "regenerations_remaining": max(0, limit - source.regenerations),
+    }
+
+
+# ----------------------------------------------------
+# Streaming Repurpose Endpoint (Server-Sent Events)
+# ----------------------------------------------------
+PLATFORM_MESSAGE_BUILDERS = {
+    "twitter": (build_twitter_messages, 2000),
+    "linkedin": (build_linkedin_messages, 1500),
+    "instagram": (build_instagram_messages, 1500),
+}
+
+# Tweets close on each line, LinkedIn paragraphs and slides on a blank line
+PLATFORM_STREAM_SEPARATORS = {
+    "twitter": "\n",
+    "linkedin": "\n\n",
+    "instagram": "\n\n",
+}
+
+PLATFORM_STREAM_LIMITS = {
+    "twitter": 10,
+    "linkedin": None,
+    "instagram": 8,
+}
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def clean_stream_block(platform: str, block: str, index: int) -> Optional[str]:
+    """Clean a single completed block with the platform's utils cleaner"""
+    if platform == "twitter":
+        return clean_twitter_thread([block], start_index=index)[0]
+    if platform == "linkedin":
+        return clean_linkedin_post(block) or None
+    if platform == "instagram":
+        if len(block.split("\n")) != 2:
+            return None
+        slides = clean_instagram_slides([block])
+        return slides[0] if slides else None
+    return None
+
+
+def assemble_platform_output(platform: str, items: List[str]):
+    """Turn streamed items into the same shape /repurpose returns"""
+    if not items:
+        return PLATFORM_CLEANERS[platform](PLATFORM_ERRORS[platform])
+    if platform == "linkedin":
+        return "\n\n".join(items)
+    return items
+
+
+async def stream_platform(platform: str, content: str, context: Optional[Dict], queue: asyncio.Queue):
+    """Stream one platform's completion, pushing cleaned items onto the queue"""
+    build_messages, max_tokens = PLATFORM_MESSAGE_BUILDERS[platform]
+    limit = PLATFORM_STREAM_LIMITS[platform]
+    items = []
+
+    try:
+        deltas = stream_completion_async(build_messages(content, context), max_tokens=max_tokens)
+        async for block in split_stream_blocks(deltas, PLATFORM_STREAM_SEPARATORS[platform]):
+            cleaned = clean_stream_block(platform, block, len(items))
+            if not cleaned:
+                continue
+            items.append(cleaned)
+            await queue.put((platform, "chunk", {"index": len(items) - 1, "text": cleaned}))
+            if limit and len(items) >= limit:
+                break
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"❌ {platform} streaming error: {e}")
+        await queue.put((platform, "error", {"platform": platform, "detail": str(e)}))
+
+    await queue.put((platform, "done", items))
+
+
+class ReservedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that releases a quota reservation however the response
+    ends. The body generator's own finally never runs if the client leaves
+    before the first chunk is sent; release is a no-op once it was charged.
+    """
+
+    def __init__(self, *args, reservation: Optional[QuotaReservation] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reservation = reservation
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await quota_ledger.release_async(self.reservation)
+
+
+@snippetstream_router.post("/repurpose/stream")
+async def repurpose_content_stream(
+    request: ContentRequest,
+    current_user: User = Depends(get_current_active_user_async),
+):
+    """
+    Streaming variant of /repurpose. Emits one SSE event per tweet, LinkedIn
+    paragraph and Instagram slide as they complete, then a final "done" event
+    carrying the full response once the generation has been saved.
+    """
+    platforms = resolve_platforms(request.enabled_platforms)
+    if not platforms:
+        raise HTTPException(status_code=400, detail="At least one platform must be selected")
+
+    feature_gate = get_feature_gate(current_user)
+    content, source, reservation = await prepare_content(request, feature_gate)
+
+    try:
+        outputs, cache_keys = await lookup_cached_outputs(
+            content, request.context, platforms, request.bypass_cache
+        )
+    except BaseException:
+        await quota_ledger.release_async(reservation)
+        raise
+    cached_platforms = list(outputs.keys())
+    missing = [p for p in platforms if p not in outputs]
+
+    user_id = current_user.id
+    preview = content[:200] + "..." if len(content) > 200 else content
+
+    tier = feature_gate.get_tier()
+    instant = resolve_generation_mode(request.generation_mode, tier) == "instant"
+
+    async def event_stream():
+        # The response body may run outside the endpoint's context
+        bind_llm_principal(user_id, tier)
+        start_time = time.time()
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks = []
+
+        try:
+            for platform in cached_platforms:
+                yield format_sse("platform_done", {
+                    "platform": platform, "output": outputs[platform], "cached": True
+                })
+
+            llm_content = content
+            metrics = {"streamed": True}
+            offline = []
+            if missing and (instant or (OFFLINE_FALLBACK_ENABLED and not model_health.rank_models(MODELS_TO_TRY))):
+                reason = "instant" if instant else "fallback"
+                for platform in missing:
+                    outputs[platform] = offline_output(platform, content, request.context, reason)
+                    yield format_sse("platform_done", {
+                        "platform": platform, "output": outputs[platform], "cached": False, "offline": True
+                    })
+                offline = list(missing)
+
+            if missing and not offline:
+                if len(content) > LONG_CONTENT_THRESHOLD:
+                    yield format_sse("status", {"stage": "condensing", "length": len(content)})
+                llm_content = await prepare_llm_input(content, metrics)
+
+            tasks = [
+                asyncio.create_task(stream_platform(p, llm_content, request.context, queue))
+                for p in missing if p not in offline
+            ]
+
+            pending = len(tasks)
+            while pending:
+                platform, kind, payload = await queue.get()
+                if kind == "chunk":
+                    yield format_sse(platform, payload)
+                elif kind == "error":
+                    yield format_sse("error", payload)
+                else:
+                    pending -= 1
+                    if not payload and OFFLINE_FALLBACK_ENABLED:
+                        outputs[platform] = offline_output(platform, llm_content, request.context, "fallback")
+                        offline.append(platform)
+                    else:
+                        outputs[platform] = assemble_platform_output(platform, payload)
+                    yield format_sse("platform_done", {
+                        "platform": platform, "output": outputs[platform], "cached": False,
+                        "offline": platform in offline,
+                    })
+
+            processing_time = time.time() - start_time
+            if offline:
+                metrics["offline_platforms"] = offline
+
+            def persist(save_db: Session):
+                for platform in missing:
+                    if platform not in offline and not is_failed_output(outputs[platform]):
+                        generation_cache.set(save_db, cache_keys[platform], platform, PROMPT_VERSION, outputs[platform])
+
+                return save_generation(
+                    save_db, user_id, content, source, outputs,
+                    request.context, processing_time, cached_platforms,
+                    usage_extra=metrics, reservation=reservation,
+                )
+
+            async with AsyncSessionLocal() as save_db:
+                generation = await save_db.run_sync(persist)
+            generation_id = generation.id if generation else None
+
+            response = SocialMediaResponse(
+                twitter_thread=outputs.get("twitter", []),
+                linkedin_post=outputs.get("linkedin", ""),
+                instagram_carousel=outputs.get("instagram", []),
+                original_content_preview=preview,
+                cached_platforms=cached_platforms,
+                offline_platforms=offline,
+            )
+            yield format_sse("done", {**response.dict(), "generation_id": generation_id})
+
+        finally:
+            # Client went away or we finished: stop any platform still streaming
+            for task in tasks:
+                task.cancel()
+            await quota_ledger.release_async(reservation)
+
+    return ReservedStreamingResponse(
+        event_stream(),
+        reservation=reservation,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ----------------------------------------------------
 # Analytics Endpoint
 # ----------------------------------------------------
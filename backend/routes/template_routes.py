@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
-from database import get_db
-from auth import get_current_active_user
+from database import get_db, get_async_db
+from auth import get_current_active_user_async
 from models import User, CustomTemplate
 from db_utils import db_retry
 import json
@@ -49,7 +51,7 @@ class CustomTemplateResponse(BaseModel):
         from_attributes = True
 
 @db_retry(max_retries=3, delay=0.5)
-def create_custom_template_db(db: Session, user_id: int, template_data: CustomTemplateCreate):
+async def create_custom_template_db(db: AsyncSession, user_id: int, template_data: CustomTemplateCreate):
     """Create a new custom template"""
     db_template = CustomTemplate(
         user_id=user_id,
@@ -61,76 +63,80 @@ def create_custom_template_db(db: Session, user_id: int, template_data: CustomTe
         is_public=template_data.is_public
     )
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 @db_retry(max_retries=3, delay=0.5)
-def get_user_templates_db(db: Session, user_id: int, category: Optional[str] = None):
+async def get_user_templates_db(db: AsyncSession, user_id: int, category: Optional[str] = None):
     """Get all templates for a user"""
-    query = db.query(CustomTemplate).filter(CustomTemplate.user_id == user_id)
+    query = select(CustomTemplate).where(CustomTemplate.user_id == user_id)
     if category:
-        query = query.filter(CustomTemplate.category == category)
-    return query.order_by(CustomTemplate.created_at.desc()).all()
+        query = query.where(CustomTemplate.category == category)
+    result = await db.execute(query.order_by(CustomTemplate.created_at.desc()))
+    return result.scalars().all()
 
 @db_retry(max_retries=3, delay=0.5)
-def get_public_templates_db(db: Session, category: Optional[str] = None, exclude_user_id: Optional[int] = None):
+async def get_public_templates_db(db: AsyncSession, category: Optional[str] = None, exclude_user_id: Optional[int] = None):
     """Get all public templates from other users"""
-    query = db.query(CustomTemplate).filter(CustomTemplate.is_public == True)
+    query = select(CustomTemplate).where(CustomTemplate.is_public == True)
     if category:
-        query = query.filter(CustomTemplate.category == category)
+        query = query.where(CustomTemplate.category == category)
     if exclude_user_id:
-        query = query.filter(CustomTemplate.user_id != exclude_user_id)
-    return query.order_by(CustomTemplate.usage_count.desc(), CustomTemplate.created_at.desc()).all()
+        query = query.where(CustomTemplate.user_id != exclude_user_id)
+    result = await db.execute(query.order_by(CustomTemplate.usage_count.desc(), CustomTemplate.created_at.desc()))
+    return result.scalars().all()
 
 @db_retry(max_retries=3, delay=0.5)
-def get_all_accessible_templates_db(db: Session, user_id: int, category: Optional[str] = None):
+async def get_all_accessible_templates_db(db: AsyncSession, user_id: int, category: Optional[str] = None):
     """Get all templates accessible to a user (their own + public templates from others)"""
     # Get user's own templates
-    user_query = db.query(CustomTemplate).filter(CustomTemplate.user_id == user_id)
+    user_query = select(CustomTemplate).where(CustomTemplate.user_id == user_id)
     if category:
-        user_query = user_query.filter(CustomTemplate.category == category)
+        user_query = user_query.where(CustomTemplate.category == category)
     
     # Get public templates from other users
-    public_query = db.query(CustomTemplate).filter(
+    public_query = select(CustomTemplate).where(
         CustomTemplate.is_public == True,
         CustomTemplate.user_id != user_id
     )
     if category:
-        public_query = public_query.filter(CustomTemplate.category == category)
+        public_query = public_query.where(CustomTemplate.category == category)
     
     # Combine results - user templates first, then public templates by popularity
-    user_templates = user_query.order_by(CustomTemplate.created_at.desc()).all()
-    public_templates = public_query.order_by(CustomTemplate.usage_count.desc(), CustomTemplate.created_at.desc()).all()
+    user_templates = (await db.execute(user_query.order_by(CustomTemplate.created_at.desc()))).scalars().all()
+    public_templates = (await db.execute(
+        public_query.order_by(CustomTemplate.usage_count.desc(), CustomTemplate.created_at.desc())
+    )).scalars().all()
     
-    return user_templates + public_templates
+    return list(user_templates) + list(public_templates)
 
 @db_retry(max_retries=3, delay=0.5)
-def get_template_by_id_db(db: Session, template_id: int, user_id: int):
+async def get_template_by_id_db(db: AsyncSession, template_id: int, user_id: int):
     """Get a specific template by ID (user's own or public template)"""
     # First try to get user's own template
-    template = db.query(CustomTemplate).filter(
+    template = (await db.execute(select(CustomTemplate).where(
         CustomTemplate.id == template_id,
         CustomTemplate.user_id == user_id
-    ).first()
+    ))).scalars().first()
     
     # If not found, try to get public template from other users
     if not template:
-        template = db.query(CustomTemplate).filter(
+        template = (await db.execute(select(CustomTemplate).where(
             CustomTemplate.id == template_id,
             CustomTemplate.is_public == True,
             CustomTemplate.user_id != user_id
-        ).first()
+        ))).scalars().first()
     
     return template
 
 @db_retry(max_retries=3, delay=0.5)
-def update_template_db(db: Session, template_id: int, user_id: int, template_data: CustomTemplateUpdate):
+async def update_template_db(db: AsyncSession, template_id: int, user_id: int, template_data: CustomTemplateUpdate):
     """Update a custom template"""
-    db_template = db.query(CustomTemplate).filter(
+    db_template = (await db.execute(select(CustomTemplate).where(
         CustomTemplate.id == template_id,
         CustomTemplate.user_id == user_id
-    ).first()
+    ))).scalars().first()
     
     if not db_template:
         return None
@@ -151,46 +157,46 @@ def update_template_db(db: Session, template_id: int, user_id: int, template_dat
     if template_data.is_favorite is not None:
         db_template.is_favorite = template_data.is_favorite
     
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 @db_retry(max_retries=3, delay=0.5)
-def delete_template_db(db: Session, template_id: int, user_id: int):
+async def delete_template_db(db: AsyncSession, template_id: int, user_id: int):
     """Delete a custom template"""
-    db_template = db.query(CustomTemplate).filter(
+    db_template = (await db.execute(select(CustomTemplate).where(
         CustomTemplate.id == template_id,
         CustomTemplate.user_id == user_id
-    ).first()
+    ))).scalars().first()
     
     if not db_template:
         return False
     
-    db.delete(db_template)
-    db.commit()
+    await db.delete(db_template)
+    await db.commit()
     return True
 
 @db_retry(max_retries=3, delay=0.5)
-def increment_template_usage_db(db: Session, template_id: int, user_id: int):
+async def increment_template_usage_db(db: AsyncSession, template_id: int, user_id: int):
     """Increment the usage count for a template (user's own or public template)"""
     # First try user's own template
-    db_template = db.query(CustomTemplate).filter(
+    db_template = (await db.execute(select(CustomTemplate).where(
         CustomTemplate.id == template_id,
         CustomTemplate.user_id == user_id
-    ).first()
+    ))).scalars().first()
     
     # If not found, try public template from other users
     if not db_template:
-        db_template = db.query(CustomTemplate).filter(
+        db_template = (await db.execute(select(CustomTemplate).where(
             CustomTemplate.id == template_id,
             CustomTemplate.is_public == True,
             CustomTemplate.user_id != user_id
-        ).first()
+        ))).scalars().first()
     
     if db_template:
         db_template.usage_count += 1
-        db.commit()
-        db.refresh(db_template)
+        await db.commit()
+        await db.refresh(db_template)
     
     return db_template
 
@@ -199,8 +205,8 @@ def increment_template_usage_db(db: Session, template_id: int, user_id: int):
 @router.post("/", response_model=CustomTemplateResponse)
 async def create_custom_template(
     template_data: CustomTemplateCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new custom template - Pro feature"""
     from feature_gates import get_feature_gate
@@ -221,10 +227,10 @@ async def create_custom_template(
             )
         
         # Check if user already has a template with this name
-        existing = db.query(CustomTemplate).filter(
+        existing = (await db.execute(select(CustomTemplate).where(
             CustomTemplate.user_id == current_user.id,
             CustomTemplate.name == template_data.name
-        ).first()
+        ))).scalars().first()
         
         if existing:
             raise HTTPException(
@@ -232,7 +238,7 @@ async def create_custom_template(
                 detail="You already have a template with this name"
             )
         
-        db_template = create_custom_template_db(db, current_user.id, template_data)
+        db_template = await create_custom_template_db(db, current_user.id, template_data)
         return db_template
         
     except HTTPException:
@@ -248,8 +254,8 @@ async def create_custom_template(
 async def get_user_templates(
     category: Optional[str] = None,
     include_public: bool = True,  # New parameter to include public templates
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all custom templates accessible to the current user (own + public) - Premium feature"""
     from feature_gates import get_feature_gate
@@ -269,9 +275,9 @@ async def get_user_templates(
     
     try:
         if include_public:
-            templates = get_all_accessible_templates_db(db, current_user.id, category)
+            templates = await get_all_accessible_templates_db(db, current_user.id, category)
         else:
-            templates = get_user_templates_db(db, current_user.id, category)
+            templates = await get_user_templates_db(db, current_user.id, category)
         
         # Add is_own_template flag to distinguish user's templates from public ones
         for template in templates:
@@ -289,8 +295,8 @@ async def get_user_templates(
 @router.get("/{template_id}", response_model=CustomTemplateResponse)
 async def get_template(
     template_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific custom template - Premium feature"""
     from feature_gates import get_feature_gate
@@ -309,7 +315,7 @@ async def get_template(
         )
     
     try:
-        template = get_template_by_id_db(db, template_id, current_user.id)
+        template = await get_template_by_id_db(db, template_id, current_user.id)
         if not template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -330,8 +336,8 @@ async def get_template(
 async def update_template(
     template_id: int,
     template_data: CustomTemplateUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a custom template"""
     try:
@@ -346,11 +352,11 @@ async def update_template(
         
         # Check if name conflicts with existing template (if name is being updated)
         if template_data.name:
-            existing = db.query(CustomTemplate).filter(
+            existing = (await db.execute(select(CustomTemplate).where(
                 CustomTemplate.user_id == current_user.id,
                 CustomTemplate.name == template_data.name,
                 CustomTemplate.id != template_id
-            ).first()
+            ))).scalars().first()
             
             if existing:
                 raise HTTPException(
@@ -358,7 +364,7 @@ async def update_template(
                     detail="You already have a template with this name"
                 )
         
-        updated_template = update_template_db(db, template_id, current_user.id, template_data)
+        updated_template = await update_template_db(db, template_id, current_user.id, template_data)
         if not updated_template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -379,12 +385,12 @@ async def update_template(
 @router.delete("/{template_id}")
 async def delete_template(
     template_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a custom template"""
     try:
-        success = delete_template_db(db, template_id, current_user.id)
+        success = await delete_template_db(db, template_id, current_user.id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -405,12 +411,12 @@ async def delete_template(
 @router.post("/{template_id}/use", response_model=CustomTemplateResponse)
 async def use_template(
     template_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Use a template (increments usage count and returns template content)"""
     try:
-        template = increment_template_usage_db(db, template_id, current_user.id)
+        template = await increment_template_usage_db(db, template_id, current_user.id)
         if not template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -520,8 +526,8 @@ async def test_public_templates_endpoint():
 @router.get("/public", response_model=List[CustomTemplateResponse])
 async def get_public_templates(
     category: Optional[str] = None,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all public templates from other users - Pro feature"""
     from feature_gates import get_feature_gate
@@ -536,11 +542,7 @@ async def get_public_templates(
         print(f"🌐 Public templates endpoint called - category: {category}")
         
         # Get all public templates
-        query = db.query(CustomTemplate).filter(CustomTemplate.is_public == True)
-        if category:
-            query = query.filter(CustomTemplate.category == category)
-        
-        templates = query.order_by(CustomTemplate.usage_count.desc(), CustomTemplate.created_at.desc()).all()
+        templates = await get_public_templates_db(db, category)
         
         print(f"📊 Found {len(templates)} public templates")
         
@@ -588,7 +590,7 @@ async def get_public_templates(
 
 @router.get("/categories/list")
 async def get_template_categories(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Get list of available template categories"""
     return {
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Standalone generation worker - claims repurpose jobs from the database queue
+Run as many of these as needed next to the API; they coordinate via the DB.
+"""
+import sys
+import signal
+import asyncio
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+
+# Load env from root directory, same as main.py
+load_dotenv(dotenv_path=backend_dir.resolve().parent / '.env')
+
+
+def initialize_database():
+    """Make sure the queue tables exist"""
+    try:
+        from database import create_tables
+        from subscription_manager import migrate_premium_until
+        create_tables()
+        migrate_premium_until()
+        print("✅ Database tables initialized successfully")
+        return True
+    except Exception as e:
+        print(f"❌ Database initialization failed: {e}")
+        return False
+
+
+async def run_worker():
+    from generation_worker import GenerationWorker
+    from url_fetcher import url_fetcher
+    from llm_client import llm_client
+    from content_extractor import shutdown_executor
+
+    worker = GenerationWorker()
+
+    # Stop claiming on SIGINT/SIGTERM and let in-flight jobs finish;
+    # anything cut off is re-claimed once its visibility timeout expires
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            pass  # Windows
+
+    try:
+        await llm_client.start()
+    except Exception as e:
+        print(f"⚠️ Could not start LLM client: {e}")
+
+    try:
+        await worker.run()
+    finally:
+        await url_fetcher.aclose()
+        await llm_client.aclose()
+        shutdown_executor()
+
+
+if __name__ == "__main__":
+    print("🗄️  Initializing database...")
+    if not initialize_database():
+        sys.exit(1)
+
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        print("\n👋 Worker stopped by user")
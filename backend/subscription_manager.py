@@ -6,11 +6,13 @@ import os
 import asyncio
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
 from database import get_db
 from models import User, Subscription, PaymentHistory
+from principal_cache import principal_cache
 import json
 import uuid
+from typing import Any, Dict, Optional
 
 def get_utc_now():
     """Get current UTC time with timezone awareness"""
@@ -47,6 +49,7 @@ class SubscriptionManager:
             ).all()
             
             expired_count = 0
+            expired_emails = []
             for subscription in expired_subscriptions:
                 try:
                     user = db.query(User).filter(User.id == subscription.user_id).first()
@@ -59,6 +62,7 @@ class SubscriptionManager:
                         
                         # Downgrade user
                         user.is_premium = False
+                        user.premium_until = None
                         
                         # Update subscription status
                         subscription.status = "expired"
@@ -88,6 +92,7 @@ class SubscriptionManager:
                         
                         db.add(expiration_record)
                         expired_count += 1
+                        expired_emails.append(user.email)
                         
                         print(f"✅ User {user.email} downgraded due to expiration")
                         
@@ -97,10 +102,17 @@ class SubscriptionManager:
             
             if expired_count > 0:
                 db.commit()
+                for email in expired_emails:
+                    principal_cache.invalidate(email, db)
                 print(f"✅ Processed {expired_count} expired subscriptions")
             else:
                 print("✅ No expired subscriptions found")
                 
+            # Repair any premium_until that drifted from its subscription
+            consistency = self.check_entitlement_consistency(db, fix=True)
+            if consistency["mismatched"]:
+                print(f"🔧 Repaired premium_until for {consistency['mismatched']} users")
+                
             # Also check for subscriptions expiring soon (for notifications)
             self.check_expiring_soon(db, current_time)
             
@@ -136,6 +148,70 @@ class SubscriptionManager:
         except Exception as e:
             print(f"❌ Error checking expiring subscriptions: {e}")
     
+    # ----------------------------------------------------
+    # Materialized entitlement (User.premium_until)
+    # ----------------------------------------------------
+    def premium_until_for(self, subscription: Optional[Subscription]) -> Optional[datetime]:
+        """Premium access lasts until the active period ends plus the grace period"""
+        if not subscription or subscription.status != "active" or not subscription.current_period_end:
+            return None
+        return make_timezone_aware(subscription.current_period_end) + timedelta(days=self.grace_period_days)
+    
+    def sync_entitlement(self, user: User, subscription: Optional[Subscription]):
+        """Recompute a user's premium_until after their subscription changed (caller commits)"""
+        user.premium_until = self.premium_until_for(subscription)
+        user.is_premium = self.has_premium_access(user)
+    
+    def has_premium_access(self, user: User) -> bool:
+        """Request-path entitlement check: one column comparison, no queries"""
+        premium_until = make_timezone_aware(user.premium_until)
+        return premium_until is not None and premium_until > get_utc_now()
+    
+    def backfill_premium_until(self, db: Session) -> int:
+        """Set premium_until for every user from their active subscription; returns rows changed"""
+        return self.check_entitlement_consistency(db, fix=True)["mismatched"]
+    
+    def check_entitlement_consistency(self, db: Session, fix: bool = False) -> Dict[str, Any]:
+        """Compare each user's premium_until and is_premium with what their subscription implies"""
+        active = {
+            s.user_id: s for s in db.query(Subscription).filter(Subscription.status == "active")
+            .order_by(Subscription.current_period_end)
+        }  # Latest period wins if a user somehow has several
+        
+        users = db.query(User).filter(
+            or_(User.is_premium == True, User.premium_until.isnot(None), User.id.in_(list(active)))
+        ).all()
+        
+        mismatches = []
+        for user in users:
+            expected_until = self.premium_until_for(active.get(user.id))
+            expected_premium = expected_until is not None and expected_until > get_utc_now()
+            if make_timezone_aware(user.premium_until) == expected_until and user.is_premium == expected_premium:
+                continue
+            mismatches.append({
+                "user_id": user.id,
+                "email": user.email,
+                "premium_until": user.premium_until,
+                "expected_premium_until": expected_until,
+                "is_premium": user.is_premium,
+                "expected_is_premium": expected_premium,
+            })
+            if fix:
+                user.premium_until = expected_until
+                user.is_premium = expected_premium
+        
+        if fix and mismatches:
+            db.commit()
+            for mismatch in mismatches:
+                principal_cache.invalidate(mismatch["email"], db)
+        
+        return {
+            "checked": len(users),
+            "mismatched": len(mismatches),
+            "fixed": fix,
+            "mismatches": mismatches[:100],
+        }
+    
     def check_user_subscription_status(self, user_id: int, db: Session) -> bool:
         """Real-time check if user should have premium access"""
         
@@ -160,6 +236,7 @@ class SubscriptionManager:
                 # User marked as premium but no active subscription - downgrade
                 print(f"⚠️ User {user.email} marked premium but no active subscription - downgrading")
                 user.is_premium = False
+                user.premium_until = None
                 db.commit()
                 return False
             
@@ -174,6 +251,7 @@ class SubscriptionManager:
                 # Subscription expired beyond grace period - downgrade immediately
                 print(f"⚠️ User {user.email} subscription expired beyond grace period - downgrading")
                 user.is_premium = False
+                user.premium_until = None
                 active_subscription.status = "expired"
                 active_subscription.updated_at = current_time
                 
@@ -201,7 +279,11 @@ class SubscriptionManager:
                 db.commit()
                 return False
             
-            # User has valid premium access
+            # User has valid premium access; repair premium_until if it drifted
+            premium_until = self.premium_until_for(active_subscription)
+            if make_timezone_aware(user.premium_until) != premium_until:
+                user.premium_until = premium_until
+                db.commit()
             return True
             
         except Exception as e:
@@ -211,6 +293,25 @@ class SubscriptionManager:
 # Global subscription manager instance
 subscription_manager = SubscriptionManager()
 
+def migrate_premium_until():
+    """Add users.premium_until to databases created before it existed, then backfill it"""
+    from sqlalchemy import inspect, text
+    from database import engine, SessionLocal
+    
+    if "premium_until" in {c["name"] for c in inspect(engine).get_columns("users")}:
+        return
+    
+    print("🚀 Adding 'premium_until' column to 'users'...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN premium_until TIMESTAMP WITH TIME ZONE"))
+    
+    db = SessionLocal()
+    try:
+        updated = subscription_manager.backfill_premium_until(db)
+        print(f"✅ Backfilled premium_until for {updated} users")
+    finally:
+        db.close()
+
 def run_subscription_check():
     """Run subscription expiration check - called by background task"""
     try:
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline generator's thread numbering
+Every tweet is labelled position/total, so the last one reads n/n
+whether the source text fills the thread or not
+"""
+
+import re
+import sys
+from pathlib import Path
+
+from offline_generator import THREAD_LENGTH, offline_twitter_thread
+
+CORPUS_DIR = Path(__file__).resolve().parent / "benchmarks" / "text_corpus"
+
+SHORT_TEXT = (
+    "We moved our nightly reports to a queue last month. "
+    "Reports now finish before the team logs in. "
+    "The old cron box has been switched off for good."
+)
+
+
+def check_numbering(name: str, content: str) -> bool:
+    tweets = offline_twitter_thread(content)
+    labels = [re.match(r'^(\d+)/(\d+)', tweet) for tweet in tweets]
+    total = len(tweets)
+    expected = [(str(i + 1), str(total)) for i in range(total)]
+    if [m.groups() if m else None for m in labels] != expected or total > THREAD_LENGTH:
+        print(f"   ❌ {name}: labels {[m.group(0) if m else None for m in labels]}")
+        return False
+    print(f"   ✅ {name}: {total} tweets, last labelled {total}/{total}")
+    return True
+
+
+def test_offline_thread_numbering():
+    """The last tweet's label is n/n for short and full-length threads"""
+
+    print("🧵 Testing offline thread numbering")
+    print("=" * 50)
+
+    docs = {"short text": SHORT_TEXT}
+    docs.update({path.name: path.read_text() for path in sorted(CORPUS_DIR.glob("*.md"))})
+
+    results = [check_numbering(name, content) for name, content in docs.items()]
+    assert all(results), "offline thread numbering doesn't match its length"
+    return True
+
+if __name__ == "__main__":
+    try:
+        test_offline_thread_numbering()
+        print("\n🎉 Offline thread numbering is correct!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        sys.exit(1)
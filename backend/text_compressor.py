@@ -0,0 +1,182 @@
+"""
+Extractive Prompt Compression
+CPU-only stage that runs before the platform fan-out: text over the token
+budget is stripped of markdown and code noise, then the highest-ranked
+sentences (TextRank over word overlap) are kept in their original order
+until the budget is met. Text under the budget passes through unchanged.
+"""
+import os
+import re
+import math
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_TOKEN_BUDGET = int(os.getenv("COMPRESSION_TOKEN_BUDGET", "1500"))
+
+# TextRank is O(n^2) in sentences; beyond this the tail is ranked by position only
+MAX_RANKED_SENTENCES = 400
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-4
+
+FENCED_CODE_RE = re.compile(r'```.*?```|~~~.*?~~~', re.DOTALL)
+INLINE_CODE_RE = re.compile(r'`([^`\n]{1,80})`')
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+URL_RE = re.compile(r'https?://\S+')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+HEADING_RE = re.compile(r'^\s{0,3}#{1,6}\s*(.+)$', re.MULTILINE)
+LIST_MARKER_RE = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+', re.MULTILINE)
+TABLE_RULE_RE = re.compile(r'^\s*\|?[\s:-]+\|[\s|:-]*$', re.MULTILINE)
+TABLE_ROW_RE = re.compile(r'^\s*\|(.*)\|\s*$', re.MULTILINE)
+EMPHASIS_RE = re.compile(r'(\*{1,3}|_{1,3})(\S[^*_\n]*?\S|\S)\1')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])|\n{2,}')
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its
+me my of on or our she so that the their them they this to was we were what when
+which who will with you your not no can do does did just than then there these
+those also about more most some such very
+""".split())
+
+counters = {"runs": 0, "compressed": 0, "tokens_in": 0, "tokens_out": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate (~4 characters per token for English)"""
+    return math.ceil(len(text) / 4)
+
+
+def _url_host(match: re.Match) -> str:
+    return urlparse(match.group(0)).netloc or match.group(0)
+
+
+def strip_noise(text: str) -> str:
+    """Remove code blocks, markup and link targets, keeping the readable words"""
+    text = FENCED_CODE_RE.sub(' ', text)
+    text = IMAGE_RE.sub(' ', text)
+    text = LINK_RE.sub(r'\1', text)
+    # Bare URLs are often part of the sentence ("see example.com"), so keep the host
+    text = URL_RE.sub(_url_host, text)
+    text = HTML_TAG_RE.sub(' ', text)
+    text = INLINE_CODE_RE.sub(r'\1', text)
+    text = TABLE_RULE_RE.sub('', text)
+    # Headings, list items and table rows become their own units for sentence splitting
+    text = TABLE_ROW_RE.sub(r'\n\n\1\n\n', text)
+    text = HEADING_RE.sub(r'\n\n\1\n\n', text)
+    text = LIST_MARKER_RE.sub('\n\n', text)
+    text = EMPHASIS_RE.sub(r'\2', text)
+    text = text.replace('|', ' ')
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n\s*', '\n\n', text)
+    return text.strip()
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in SENTENCE_RE.split(text):
+        part = re.sub(r'\s+', ' ', part).strip()
+        if len(part) > 1:
+            sentences.append(part)
+    return sentences
+
+
+def _similarity(a: set, b: set) -> float:
+    """TextRank sentence similarity: shared words normalized by log lengths"""
+    if not a or not b:
+        return 0.0
+    overlap = len(a & b)
+    if not overlap:
+        return 0.0
+    denominator = math.log(len(a) + 1) + math.log(len(b) + 1)
+    return overlap / denominator if denominator else 0.0
+
+
+def textrank_scores(sentences: List[str]) -> List[float]:
+    words = [
+        {w for w in WORD_RE.findall(s.lower()) if w not in STOPWORDS and len(w) > 2}
+        for s in sentences
+    ]
+    n = len(sentences)
+    edges: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+    out_weight = [0.0] * n
+    for i in range(n):
+        for j in range(i + 1, n):
+            weight = _similarity(words[i], words[j])
+            if weight:
+                edges[i].append((j, weight))
+                edges[j].append((i, weight))
+                out_weight[i] += weight
+                out_weight[j] += weight
+
+    scores = [1.0] * n
+    for _ in range(MAX_ITERATIONS):
+        updated = [
+            (1 - DAMPING) + DAMPING * sum(scores[j] * w / out_weight[j] for j, w in edges[i])
+            for i in range(n)
+        ]
+        delta = max(abs(u - s) for u, s in zip(updated, scores))
+        scores = updated
+        if delta < TOLERANCE:
+            break
+    return scores
+
+
+def compress_text(text: str, token_budget: int = COMPRESSION_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """Return (compressed text, stats); text under budget is returned unchanged"""
+    started = time.perf_counter()
+    original_tokens = estimate_tokens(text)
+    cleaned = text if original_tokens <= token_budget else strip_noise(text)
+
+    sentences = split_sentences(cleaned)
+    kept = len(sentences)
+    if estimate_tokens(cleaned) > token_budget and len(sentences) > 1:
+        ranked = sentences[:MAX_RANKED_SENTENCES]
+        scores = textrank_scores(ranked)
+        # Unranked tail sentences score below every ranked one, earlier first
+        scores += [-i for i in range(1, len(sentences) - len(ranked) + 1)]
+
+        # The opening sentence usually carries the hook, so it always stays
+        order = [0] + sorted(range(1, len(sentences)), key=lambda i: -scores[i])
+        chosen = set()
+        used = 0
+        for i in order:
+            cost = estimate_tokens(sentences[i]) + 1
+            if used + cost > token_budget and chosen:
+                continue
+            chosen.add(i)
+            used += cost
+
+        kept = len(chosen)
+        cleaned = " ".join(sentences[i] for i in sorted(chosen))
+
+    compressed_tokens = estimate_tokens(cleaned)
+    stats = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "compression_ratio": round(compressed_tokens / original_tokens, 3) if original_tokens else 1.0,
+        "sentences_total": len(sentences),
+        "sentences_kept": kept,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    return cleaned, stats
+
+
+def record_compression(stats: Dict):
+    counters["runs"] += 1
+    counters["tokens_in"] += stats["original_tokens"]
+    counters["tokens_out"] += stats["compressed_tokens"]
+    if stats["compression_ratio"] < 1.0:
+        counters["compressed"] += 1
+
+
+def compression_stats() -> Dict:
+    return {
+        **counters,
+        "enabled": COMPRESSION_ENABLED,
+        "token_budget": COMPRESSION_TOKEN_BUDGET,
+        "overall_ratio": round(counters["tokens_out"] / counters["tokens_in"], 3) if counters["tokens_in"] else None,
+    }
@@ -14,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import get_db, engine
 from models import User, Subscription, PaymentHistory
+from subscription_manager import subscription_manager
 from datetime import datetime, timedelta, timezone
 import json
 import uuid
@@ -75,6 +76,9 @@ def upgrade_user_to_premium(email: str):
             db.add(subscription)
             db.flush()
         
+        # Grant premium until the period ends (plus grace)
+        subscription_manager.sync_entitlement(user, subscription)
+        
         # Create payment history record
         payment_record = PaymentHistory(
             user_id=user.id,
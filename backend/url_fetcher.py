@@ -0,0 +1,199 @@
+"""
+Async URL Fetcher for repurpose URL ingestion
+One long-lived pooled httpx.AsyncClient, per-host concurrency limits and
+streamed reads with a byte cap so a large page never blocks the event loop.
+Extracted text is cached per URL and revalidated with conditional GETs.
+"""
+import os
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# Rough "enough text" check on raw HTML before a real parse
+TAG_RE = re.compile(r'<[^>]+>')
+CLOSING_MAIN_RE = re.compile(r'</(article|main)\s*>', re.IGNORECASE)
+
+
+class UrlContentCache:
+    """Bounded LRU of extracted page text plus the validators to revalidate it"""
+
+    def __init__(self):
+        self.max_entries = int(os.getenv("URL_CACHE_MAX_ENTRIES", "256"))
+        # Reuse without any request for this long after the last validation
+        self.fresh_seconds = int(os.getenv("URL_CACHE_FRESH_SECONDS", "60"))
+        # After this, drop the entry and refetch unconditionally
+        self.max_age_seconds = int(os.getenv("URL_CACHE_MAX_AGE_SECONDS", str(24 * 3600)))
+
+        self._entries: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self.counters = {"fresh_hits": 0, "revalidated": 0, "refetched": 0, "misses": 0}
+
+    def get(self, key: Tuple[str, int]) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["fetched_at"] > self.max_age_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[str, int], text: str, etag: Optional[str], last_modified: Optional[str]):
+        now = time.monotonic()
+        self._entries[key] = {
+            "text": text,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": now,
+            "validated_at": now,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "fresh_seconds": self.fresh_seconds,
+            "max_age_seconds": self.max_age_seconds,
+        }
+
+
+class UrlFetcher:
+    def __init__(self):
+        self.max_bytes = int(os.getenv("URL_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.per_host_limit = int(os.getenv("URL_FETCH_PER_HOST_LIMIT", "4"))
+        self.connect_timeout = float(os.getenv("URL_FETCH_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("URL_FETCH_READ_TIMEOUT", "10"))
+
+        # Connection reuse policy: keep idle connections (and therefore their
+        # resolved addresses and TLS sessions) alive for a while, so repeat
+        # fetches from the same host skip DNS, TCP and TLS setup
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "50")),
+            max_keepalive_connections=int(os.getenv("URL_FETCH_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("URL_FETCH_KEEPALIVE_EXPIRY", "60")),
+        )
+
+        self._client: Optional[httpx.AsyncClient] = None
+        # host -> [semaphore, active users]; entries are dropped when idle so
+        # one-off hosts don't accumulate
+        self._host_slots: Dict[str, List] = {}
+        self.cache = UrlContentCache()
+
+    def get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=self.limits,
+                follow_redirects=True,
+                headers={"User-Agent": "Mozilla/5.0"},
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        """Limit concurrent fetches against a single host"""
+        host = (urlsplit(url).hostname or "").lower()
+        slot = self._host_slots.setdefault(host, [asyncio.Semaphore(self.per_host_limit), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._host_slots.pop(host, None)
+
+    async def fetch_html(
+        self, url: str, max_chars: int = 15000, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[str, httpx.Response]:
+        """
+        Stream the page body, stopping at the byte cap or once the main
+        content block has closed and there is clearly enough text.
+        """
+        enough_text = max_chars * 3  # Raw markup text includes nav/footer noise
+
+        async with self._host_slot(url):
+            async with self.get_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return "", response
+                response.raise_for_status()
+
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if received >= self.max_bytes:
+                        print(f"✂️ URL fetch hit {self.max_bytes} byte cap for {url}")
+                        break
+
+                    tail = chunk.decode("utf-8", errors="ignore")
+                    if CLOSING_MAIN_RE.search(tail):
+                        visible = len(TAG_RE.sub("", b"".join(chunks).decode("utf-8", errors="ignore")))
+                        if visible >= enough_text:
+                            break
+
+                body = b"".join(chunks)[:self.max_bytes]
+                encoding = response.encoding or "utf-8"
+                return body.decode(encoding, errors="replace"), response
+
+    async def fetch_text(
+        self,
+        url: str,
+        extract: Callable[[str, int], Awaitable[str]],
+        max_chars: int = 15000,
+    ) -> str:
+        """
+        Extracted text for a URL, served from the cache when the origin
+        confirms it is unchanged (304) and re-downloaded otherwise.
+        """
+        key = (url, max_chars)
+        entry = self.cache.get(key)
+
+        if entry and time.monotonic() - entry["validated_at"] < self.cache.fresh_seconds:
+            self.cache.counters["fresh_hits"] += 1
+            return entry["text"]
+
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        html, response = await self.fetch_html(url, max_chars=max_chars, headers=headers or None)
+
+        if entry and response.status_code == 304:
+            entry["validated_at"] = time.monotonic()
+            self.cache.counters["revalidated"] += 1
+            print(f"♻️ URL unchanged (304), reusing extracted text for {url}")
+            return entry["text"]
+
+        self.cache.counters["refetched" if entry else "misses"] += 1
+        text = await extract(html, max_chars)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if "no-store" not in cache_control and text:
+            self.cache.put(key, text, etag, last_modified)
+
+        return text
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Global URL fetcher instance
+url_fetcher = UrlFetcher()
@@ -20,10 +20,10 @@ def clean_text(text: str) -> str:
     
     return text
 
-def clean_twitter_thread(tweets: List[str]) -> List[str]:
-    """Clean and validate Twitter thread"""
+def clean_twitter_thread(tweets: List[str], start_index: int = 0) -> List[str]:
+    """Clean and validate Twitter thread (start_index numbers partial threads)"""
     cleaned_tweets = []
-    for i, tweet in enumerate(tweets):
+    for i, tweet in enumerate(tweets, start=start_index):
         cleaned = clean_text(tweet)
         
         # Ensure tweet starts with numbering if not present